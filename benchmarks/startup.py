@@ -0,0 +1,100 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# runs scx as its installed console script does: importing the module, so
+# that its cached bytecode is used, rather than compiling scx.py as a script
+SCX = ['-c', 'import scx; scx.scx()']
+# maximum time spent by 'scx profiles demon' on top of a bare interpreter
+TARGET_OVERHEAD_MS = 75
+# modules which must not be imported before a command actually needs them
+LAZY_MODULES = ['svgwrite', 'colorama', 'shutil', 'scox.catalog',
+                'scox.character', 'scox.export.cli', 'scox.export.render',
+                'scox.export.serialize', 'scox.export.svg']
+
+
+def measure_cold_start(args, runs):
+    """Measure the wall-clock time of fresh interpreter runs.
+
+    Args:
+        args: list of arguments passed to the interpreter.
+        runs: number of runs.
+
+    Returns: the list of measured times, in milliseconds.
+    """
+    times = []
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                           check=True, stdout=subprocess.DEVNULL)
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def measure_import_time():
+    """Import scx in a fresh interpreter with '-X importtime'.
+
+    Returns: a dictionary mapping each imported module to its cumulative
+    import time, in microseconds.
+    """
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                          'import scx'], cwd=ROOT, check=True,
+                         stderr=subprocess.PIPE, universal_newlines=True)
+    modules = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@click.command()
+@click.option('--runs', default=20, help='Number of cold starts to measure.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write the results to a JSON file.')
+def main(runs, output):
+    """Measure the cold-start time of the scx command line."""
+    modules = measure_import_time()
+    eager = [m for m in LAZY_MODULES if m in modules]
+    bare = statistics.median(measure_cold_start(['-c', 'pass'], runs))
+    scx = statistics.median(measure_cold_start(SCX + ['profiles', 'demon'],
+                                               runs))
+    results = {'import_scx_ms': modules['scx'] / 1000.0,
+               'bare_interpreter_ms': bare,
+               'profiles_ms': scx,
+               'overhead_ms': scx - bare,
+               'target_overhead_ms': TARGET_OVERHEAD_MS,
+               'eager_imports': eager}
+    heaviest = sorted(modules.items(), key=lambda m: m[1], reverse=True)
+    print('{:<40}{:>10}'.format('Heaviest imports', 'ms'))
+    for name, cumulative in heaviest[1:11]:
+        print('{:<40}{:>10.1f}'.format(name, cumulative / 1000.0))
+    print('')
+    for k in ['import_scx_ms', 'bare_interpreter_ms', 'profiles_ms',
+              'overhead_ms']:
+        print('{:<40}{:>10.1f}'.format(k, results[k]))
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if len(eager) > 0:
+        print('Modules imported at startup: ' + ', '.join(eager))
+    if len(eager) > 0 or results['overhead_ms'] > TARGET_OVERHEAD_MS:
+        print('Cold-start target of ' + str(TARGET_OVERHEAD_MS) +
+              ' ms missed.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCX = os.path.join(ROOT, 'scx.py')
+sys.path.insert(0, ROOT)
+
+import scox.export.serialize as srl  # noqa: E402
+import scox.team as tm  # noqa: E402
+
+
+def run_scx(home, args):
+    """Run an scx command in a fresh interpreter.
+
+    Args:
+        home: home folder of the command, holding its configuration.
+        args: list of arguments of the command.
+
+    Returns: a subprocess.CompletedProcess instance.
+    """
+    return subprocess.run([sys.executable, SCX] + args,
+                          env=dict(os.environ, HOME=home),
+                          stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def writer(home, w, count):
+    """Create characters in the selected team, one process per character.
+
+    Returns: the list of errors.
+    """
+    errors = []
+    for i in range(count):
+        res = run_scx(home, ['character', 'create', '--name',
+                             'W' + str(w) + '-' + str(i), '--nature', 'demon',
+                             '--superior', 'Baal', '--archetype', 'Beat'])
+        if res.returncode != 0 or res.stdout.strip():
+            errors.append('writer ' + str(w) + ': ' +
+                          (res.stderr or res.stdout).strip())
+    return errors
+
+
+def reader(home, r, count):
+    """Export and query the selected team while it is being written.
+
+    Returns: the list of errors.
+    """
+    errors = []
+    for _ in range(count):
+        res = run_scx(home, ['team', 'export', '--format', 'jsonl',
+                             '--output', '-'])
+        if res.returncode != 0:
+            errors.append('reader ' + str(r) + ': ' + res.stderr.strip())
+            continue
+        lines = [ln for ln in res.stdout.splitlines() if ln.startswith('{')]
+        try:
+            for ln in lines:
+                json.loads(ln)
+        except ValueError:
+            errors.append('reader ' + str(r) + ': invalid JSONL output.')
+        if 'could not be' in res.stdout:
+            errors.append('reader ' + str(r) + ': ' + res.stdout.strip())
+        res = run_scx(home, ['character', 'find', '--where', 'Force>=0'])
+        if res.returncode != 0 or 'could not be' in res.stdout:
+            errors.append('reader ' + str(r) + ': ' +
+                          (res.stderr or res.stdout).strip())
+    return errors
+
+
+@click.command()
+@click.option('--teams', default=8,
+              help='Number of teams created concurrently.')
+@click.option('--writers', default=8, help='Number of writing workers.')
+@click.option('--readers', default=4, help='Number of reading workers.')
+@click.option('--count', default=10,
+              help='Number of commands run by each worker.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='Write the results to a JSON file.')
+def main(teams, writers, readers, count, output):
+    """Run many scx processes at once against the same configuration and
+    team, then check that nothing was lost or corrupted."""
+    errors = []
+    with tempfile.TemporaryDirectory() as home:
+        location = os.path.join(home, 'teams')
+        os.makedirs(location)
+        start = time.perf_counter()
+        # concurrent changes of the configuration file
+        with concurrent.futures.ThreadPoolExecutor(teams) as pool:
+            results = list(pool.map(
+                lambda i: run_scx(home, ['team', 'create', '--name',
+                                         'T' + str(i), '--location',
+                                         location]),
+                range(teams)))
+        errors += [r.stderr.strip() for r in results if r.returncode != 0]
+        with open(os.path.join(home, '.scox-gen', 'config.json')) as f:
+            found = json.load(f)[1]
+        lost = ['T' + str(i) for i in range(teams)
+                if 'T' + str(i) not in found]
+        if len(lost) > 0:
+            errors.append('teams lost from the configuration: ' +
+                          ', '.join(lost))
+        config_phase = time.perf_counter() - start
+        print('{:<40}{:>10.1f}'.format('config phase (s)', config_phase))
+        # concurrent writers and readers of a team
+        run_scx(home, ['team', 'select', 'T0'])
+        folder = found.get('T0', os.path.join(location, 'T0'))
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(writers + readers) as pool:
+            jobs = [pool.submit(writer, home, w, count)
+                    for w in range(writers)]
+            jobs += [pool.submit(reader, home, r, count)
+                     for r in range(readers)]
+            for j in jobs:
+                errors += j.result()
+        elapsed = time.perf_counter() - start
+        failures = []
+        loaded = sum(1 for _ in srl.iter_from_folder(folder, failures))
+        if loaded != writers * count or len(failures) > 0:
+            errors.append(str(loaded) + ' character(s) loaded, ' +
+                          str(writers * count) + ' expected, ' +
+                          str(len(failures)) + ' unreadable.')
+        leftovers = [f for f in os.listdir(folder) if f.endswith('.tmp')]
+        if len(leftovers) > 0:
+            errors.append('temporary files left: ' + ', '.join(leftovers))
+        print('{:<40}{:>10.1f}'.format('team phase (s)', elapsed))
+        print('{:<40}{:>10.1f}'.format(
+            'commands per second',
+            (writers + 2 * readers) * count / elapsed))
+        print('{:<40}{:>10}'.format('characters in team', loaded))
+        print('{:<40}{:>10}'.format('layout', tm.get_layout(folder)))
+        results = {'teams': teams, 'writers': writers, 'readers': readers,
+                   'count': count, 'config_phase_s': config_phase,
+                   'team_phase_s': elapsed,
+                   'commands_per_second':
+                       (writers + 2 * readers) * count / elapsed,
+                   'characters': loaded, 'layout': tm.get_layout(folder),
+                   'errors': errors}
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    for e in errors:
+        print(e)
+    if len(errors) > 0:
+        print(str(len(errors)) + ' error(s) found.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import copy
+import datetime
+import io
+import itertools
+import json
+import os
+import pickle
+import platform
+import random
+import sys
+import tempfile
+import timeit
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import scox.catalog as catalog  # noqa: E402
+import scox.character as chc  # noqa: E402
+import scox.export.cli as cli  # noqa: E402
+import scox.export.render as rdr  # noqa: E402
+import scox.export.serialize as srl  # noqa: E402
+import scox.export.svg as svg  # noqa: E402
+import scox.export.txt as txt  # noqa: E402
+import scox.storage as storage  # noqa: E402
+
+BENCHMARKS = []
+# relative slowdown above which a benchmark is flagged as a regression
+DEFAULT_THRESHOLD = 0.2
+
+
+def benchmark(name, number=1):
+    """Register a benchmark.
+
+    The decorated function prepares the benchmark and returns the callable to
+    be timed.
+
+    Args:
+        name: name of the benchmark, as stored in the results.
+        number: number of calls per timed run.
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup, number))
+        return setup
+    return register
+
+
+def all_combinations():
+    """Return every (nature, superior, archetype) combination."""
+    combos = []
+    for nature in ['angel', 'demon']:
+        for s, a in itertools.product(catalog.get_profile_list(nature),
+                                      catalog.get_profile_list('arch')):
+            combos.append((nature, s, a))
+    return combos
+
+
+def new_character(nature='demon', superior='Baal', archetype='Beat'):
+    """Create a character from profile names."""
+    return chc.Character('Bench', nature,
+                         catalog.get_profile_path('arch', archetype),
+                         catalog.get_profile_path(nature, superior))
+
+
+def skeleton(nature):
+    """Return a character with initialized values and no profile applied."""
+    c = chc.Character.__new__(chc.Character)
+    chc.profile.Profile.__init__(c, nature.capitalize())
+    c.init_attributes()
+    c.init_skills()
+    c.init_values()
+    return c
+
+
+def profile_loader(cold):
+    """Return a callable loading every superior and archetype archive into
+    blank characters.
+
+    Args:
+        cold: True if the archive cache is cleared before each run.
+    """
+    archives = []
+    for category in ['angel', 'demon']:
+        for s in catalog.get_profile_list(category):
+            archives.append((category, catalog.get_profile_path(category, s),
+                             False))
+    for a in catalog.get_profile_list('arch'):
+        path = catalog.get_profile_path('arch', a)
+        archives.append(('angel', path, True))
+        archives.append(('demon', path, True))
+
+    def run():
+        if cold:
+            chc.profile.read_profile.cache_clear()
+            chc.profile.read_power_table.cache_clear()
+            chc.profile.load_compiled.cache_clear()
+        for nature, path, archetype in archives:
+            s = skeleton(nature)
+            s.superior = 'Baal'
+            s.load_profile(path, archetype)
+    return run
+
+
+@benchmark('load_profile')
+def bench_load_profile():
+    """Read, parse and apply every superior and archetype archive."""
+    return profile_loader(True)
+
+
+@benchmark('load_profile_warm')
+def bench_load_profile_warm():
+    """Apply every superior and archetype archive, already parsed."""
+    return profile_loader(False)
+
+
+@benchmark('character_init')
+def bench_character_init():
+    """Create one character per (nature, superior, archetype) combination,
+    merging the profiles of each combination."""
+    combos = all_combinations()
+
+    def run():
+        chc.DELTAS.clear()
+        for nature, s, a in combos:
+            new_character(nature, s, a)
+    return run
+
+
+@benchmark('character_skeleton', number=100)
+def bench_character_skeleton():
+    """Build the attributes, skills and side values of a blank character."""
+    return lambda: skeleton('demon')
+
+
+@benchmark('character_init_warm', number=100)
+def bench_character_init_warm():
+    """Create a character whose merged profiles are already cached."""
+    new_character()
+    return new_character
+
+
+@benchmark('draw_from_table', number=100)
+def bench_draw_from_table():
+    """Draw two powers from the table of a loaded archetype."""
+    base = skeleton('demon')
+    base.load_profile(catalog.get_profile_path('demon', 'Baal'))
+    base.load_profile(catalog.get_profile_path('arch', 'Beat'), True)
+
+    def run():
+        c = copy.copy(base)
+        c.powers = copy.copy(base.powers)
+        c.values = copy.deepcopy(base.values)
+        c.draw_from_table(2)
+    return run
+
+
+@benchmark('update_values', number=1000)
+def bench_update_values():
+    """Compute the base ranks of a character's skills and side values."""
+    return new_character().update_values
+
+
+@benchmark('pickle_dump', number=100)
+def bench_pickle_dump():
+    """Serialize a character in memory."""
+    c = new_character()
+    return lambda: pickle.dumps(c)
+
+
+@benchmark('pickle_load', number=100)
+def bench_pickle_load():
+    """Deserialize a character from memory."""
+    data = pickle.dumps(new_character())
+    return lambda: pickle.loads(data)
+
+
+@benchmark('pickle_file_roundtrip', number=50)
+def bench_pickle_file_roundtrip():
+    """Write a character to a pickle file and read it back."""
+    c = new_character()
+    path = os.path.join(tempfile.mkdtemp(), 'bench.pickle')
+
+    def run():
+        srl.export_as_pickle(c, path)
+        srl.load_from_pickle(path)
+    return run
+
+
+def team_writer(batched):
+    """Return a callable writing 100 characters to pickle files, durably.
+
+    Args:
+        batched: True if the files are flushed to disk together.
+    """
+    c = new_character()
+    folder = tempfile.mkdtemp()
+    paths = [os.path.join(folder, str(i) + '.pickle') for i in range(100)]
+
+    def run():
+        if batched:
+            with storage.Batch() as batch:
+                for p in paths:
+                    srl.export_as_pickle(c, p, batch)
+        else:
+            for p in paths:
+                srl.export_as_pickle(c, p)
+    return run
+
+
+@benchmark('team_write')
+def bench_team_write():
+    """Write 100 characters, each file flushed to disk on its own."""
+    return team_writer(False)
+
+
+@benchmark('team_write_batched')
+def bench_team_write_batched():
+    """Write 100 characters in a single batch."""
+    return team_writer(True)
+
+
+@benchmark('export_as_svg', number=5)
+def bench_export_as_svg():
+    """Export a character as an SVG file."""
+    c = new_character()
+    path = os.path.join(tempfile.mkdtemp(), 'bench.svg')
+    return lambda: svg.export_as_svg(c, path)
+
+
+@benchmark('export_archive', number=1)
+def bench_export_archive():
+    """Export 20 characters as SVG and TXT to a ZIP archive, in memory, with
+    linked character sheets."""
+    team = [new_character() for _ in range(20)]
+    for i, c in enumerate(team):
+        c.name = 'Bench' + str(i)
+    return lambda: rdr.export_archive(lambda: team, ['svg', 'txt'],
+                                      io.BytesIO(), 'bench', link_sheets=True)
+
+
+@benchmark('export_bundle', number=1)
+def bench_export_bundle():
+    """Export 20 characters as an HTML print bundle, in memory."""
+    team = [new_character() for _ in range(20)]
+    return lambda: rdr.stream_team(team, 'html', io.StringIO(), flush=False)
+
+
+@benchmark('export_as_txt', number=500)
+def bench_export_as_txt():
+    """Export a character as TXT, in memory."""
+    c = new_character()
+    return lambda: txt.export_as_txt(c, io.StringIO())
+
+
+@benchmark('print_cli', number=500)
+def bench_print_cli():
+    """Render a character's CLI tree, in memory."""
+    c = new_character()
+    return lambda: cli.print_cli(c, io.StringIO())
+
+
+def run_benchmarks(repeat, selected=None):
+    """Run the registered benchmarks.
+
+    Args:
+        repeat: number of timed runs per benchmark.
+        selected: optional list of benchmark names to run.
+
+    Returns: a dictionary of results, ready to be serialized as JSON.
+    """
+    random.seed(0)
+    results = {}
+    for name, setup, number in BENCHMARKS:
+        if selected and name not in selected:
+            continue
+        times = timeit.Timer(setup()).repeat(repeat=repeat, number=number)
+        times = [t / number for t in times]
+        results[name] = {'min': min(times),
+                         'mean': sum(times) / len(times),
+                         'runs': repeat,
+                         'number': number}
+    return {'meta': {'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'date': datetime.datetime.now().isoformat()},
+            'benchmarks': results}
+
+
+def compare_results(baseline, current, threshold):
+    """Compare benchmark results with a baseline.
+
+    The fastest run of each benchmark is compared, as it is the least
+    sensitive to noise.
+
+    Args:
+        baseline: results of a previous run.
+        current: results of the current run.
+        threshold: relative slowdown above which a benchmark is flagged.
+
+    Returns: a list of (name, baseline time, current time, relative change,
+    regression flag) tuples.
+    """
+    rows = []
+    for name, res in sorted(current['benchmarks'].items()):
+        if name not in baseline['benchmarks']:
+            continue
+        before = baseline['benchmarks'][name]['min']
+        change = (res['min'] - before) / before
+        rows.append((name, before, res['min'], change, change > threshold))
+    return rows
+
+
+@click.group()
+def main():
+    """Benchmarks for the generation and export hot paths of scox-gen."""
+    pass
+
+
+@main.command()
+@click.option('--output', type=click.Path(dir_okay=False),
+              default='benchmarks.json', help='Where to write the results.')
+@click.option('--repeat', default=5, help='Number of timed runs.')
+@click.option('--only', multiple=True, help='Run only this benchmark.')
+def run(output, repeat, only):
+    """Run the benchmarks and store the results as JSON."""
+    results = run_benchmarks(repeat, only)
+    print('{:<25}{:>15}{:>15}'.format('Benchmark', 'min (ms)', 'mean (ms)'))
+    for name, res in results['benchmarks'].items():
+        print('{:<25}{:>15.3f}{:>15.3f}'.format(
+            name, res['min'] * 1000, res['mean'] * 1000))
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+@main.command()
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', default=DEFAULT_THRESHOLD,
+              help='Relative slowdown flagged as a regression.')
+def compare(baseline, current, threshold):
+    """Compare results with a baseline and flag regressions."""
+    with open(baseline) as f:
+        baseline = json.load(f)
+    with open(current) as f:
+        current = json.load(f)
+    regressions = 0
+    print('{:<25}{:>15}{:>15}{:>10}'.format(
+        'Benchmark', 'baseline (ms)', 'current (ms)', 'change'))
+    for name, before, after, change, flag in compare_results(
+            baseline, current, threshold):
+        print('{:<25}{:>15.3f}{:>15.3f}{:>+9.1f}%{}'.format(
+            name, before * 1000, after * 1000, change * 100,
+            '  REGRESSION' if flag else ''))
+        regressions += flag
+    if regressions > 0:
+        print(str(regressions) + " regression(s) above " +
+              str(int(threshold * 100)) + "%.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import functools
+import os
+import sys
+import unicodedata
+
+PROFILE_PATH = os.path.join(os.path.dirname(__file__), 'profiles')
+CATALOG_FILE = os.path.join(PROFILE_PATH, 'catalog.json')
+CATEGORIES = {'demon': 'demons', 'angel': 'angels', 'arch': 'archetypes'}
+NATURES = {'demon': ['Demon'], 'angel': ['Angel'], 'arch': ['Angel', 'Demon']}
+
+
+def build_catalog():
+    """Scan the profile folders and describe every profile archive.
+
+    Returns: a dictionary mapping each category ('demon', 'angel', 'arch') to
+    the alphabetically ordered list of its profiles. Each profile is described
+    by its key, title, natures, file name, file size and SHA-256 hash.
+    """
+    import hashlib
+    catalog = {}
+    for category, folder in sorted(CATEGORIES.items()):
+        entries = []
+        for f in sorted(os.listdir(os.path.join(PROFILE_PATH, folder))):
+            if not f.endswith('.scx'):
+                continue
+            path = os.path.join(PROFILE_PATH, folder, f)
+            with open(path, 'rb') as archive:
+                digest = hashlib.sha256(archive.read()).hexdigest()
+            entries.append({'key': f.split('.')[0],
+                            'title': f.split('.')[0].title(),
+                            'natures': NATURES[category],
+                            'file': folder + '/' + f,
+                            'size': os.path.getsize(path),
+                            'sha256': digest})
+        catalog[category] = entries
+    return catalog
+
+
+def check_catalog():
+    """Compare the catalog manifest with the profile archives on disk.
+
+    Returns: the list of detected differences, as human-readable strings.
+    """
+    import json
+    errors = []
+    built = build_catalog()
+    with open(CATALOG_FILE, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    for category in CATEGORIES:
+        expected = {e['key']: e for e in built[category]}
+        found = {e['key']: e for e in saved.get(category, [])}
+        for k in sorted(set(expected) | set(found)):
+            if k not in found:
+                errors.append(category + "/" + k + ": missing from manifest.")
+            elif k not in expected:
+                errors.append(category + "/" + k + ": archive not found.")
+            elif found[k] != expected[k]:
+                errors.append(category + "/" + k + ": outdated entry.")
+    return errors
+
+
+def find_profile(category, name):
+    """Find a profile by name.
+
+    Names are matched regardless of case, accents, and of spaces or hyphens
+    used instead of underscores.
+
+    Args:
+        category: a string value in 'angel', 'demon' or 'arch'.
+        name: name of the profile, as typed by the user.
+
+    Returns: the catalog entry of the profile.
+
+    Raises:
+        ValueError: if the category or the profile does not exist. The error
+        message lists the closest profile names, if any.
+    """
+    if category not in CATEGORIES:
+        raise ValueError("Unknown profile category: " + str(category) + ".")
+    index = load_catalog()[category]
+    key = normalize_name(name)
+    if key in index:
+        return index[key]
+    msg = "Profile '" + name + "' not found."
+    suggestions = get_suggestions(category, name)
+    if len(suggestions) > 0:
+        msg += " Did you mean: " + ", ".join(suggestions) + "?"
+    raise ValueError(msg)
+
+
+def get_profile_list(category):
+    """Return the requested list of available profiles.
+
+    Args:
+        category: a string value in 'angel', 'demon' or 'arch'.
+
+    Returns: the alphabetically ordered list of profile titles corresponding
+    to the input category.
+    """
+    return [e['title'] for e in load_catalog()[category].values()]
+
+
+def get_profile_path(category, name):
+    """Return the path to the archive of a profile, after checking that it
+    exists in the catalog.
+
+    Args:
+        category: a string value in 'angel', 'demon' or 'arch'.
+        name: name of the profile.
+
+    Returns: a path to a profile archive.
+    """
+    return os.path.join(PROFILE_PATH, find_profile(category, name)['file'])
+
+
+def get_suggestions(category, name, n=3):
+    """Return the titles of the profiles whose names are close to the input.
+
+    Args:
+        category: a string value in 'angel', 'demon' or 'arch'.
+        name: a profile name.
+        n: maximum number of suggestions (default 3).
+
+    Returns: a list of profile titles.
+    """
+    import difflib
+    index = load_catalog()[category]
+    matches = difflib.get_close_matches(normalize_name(name), index.keys(),
+                                        n=n, cutoff=0.6)
+    return [index[m]['title'] for m in matches]
+
+
+@functools.lru_cache(maxsize=None)
+def load_catalog():
+    """Load the catalog manifest, once per process.
+
+    The manifest is built on the fly if it does not exist.
+
+    Returns: a dictionary mapping each category to an ordered dictionary of
+    catalog entries indexed by normalized profile name.
+    """
+    import json
+    if os.path.exists(CATALOG_FILE):
+        with open(CATALOG_FILE, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+    else:
+        catalog = build_catalog()
+    return {c: {normalize_name(e['key']): e for e in entries}
+            for c, entries in catalog.items()}
+
+
+def normalize_name(name):
+    """Normalize a profile name into a catalog key.
+
+    Args:
+        name: a profile name, such as 'Jean-Luc' or 'Poète maudit'.
+
+    Returns: a string.
+    """
+    key = unicodedata.normalize('NFKD', name.strip().lower())
+    key = ''.join(c for c in key if not unicodedata.combining(c))
+    return key.replace('-', '_').replace(' ', '_')
+
+
+def write_catalog():
+    """Build the catalog manifest and write it next to the profiles."""
+    import json
+    with open(CATALOG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(build_catalog(), f, indent=1, ensure_ascii=False)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    if '--check' in sys.argv[1:]:
+        differences = check_catalog()
+        for d in differences:
+            print(d)
+        sys.exit(1 if len(differences) > 0 else 0)
+    write_catalog()
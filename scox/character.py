@@ -3,6 +3,11 @@
 
 import scox.value as value
 import scox.profile as profile
+import scox.schema as schema
+import scox.timing as timing
+
+# merged superior and archetype profiles, by (nature, superior, archetype)
+DELTAS = {}
 
 
 class Character(profile.Profile):
@@ -24,6 +29,7 @@ class Character(profile.Profile):
     Methods:
     export -- Serialize the character as a pickle file.
     init_attributes -- Initialize the character's attributes.
+    init_sheet -- Initialize a blank character.
     init_skills -- Initialize the character's skills.
     init_values -- Initialize the character's attributes.
     update_values -- Update the base ranks of the skills listed in
@@ -31,7 +37,7 @@ class Character(profile.Profile):
         ranks of self.attributes.
     """
 
-    def __init__(self, name, nature, archetype, superior, level=0):
+    def __init__(self, name, nature, archetype, superior, level=0, rng=None):
         """Constructor.
 
         Arguments:
@@ -42,243 +48,72 @@ class Character(profile.Profile):
 
         Keyword arguments:
         level -- Level of the new character (default 0).
+        rng -- A random.Random instance used for drawing powers (default: the
+            random module).
+        """
+        with timing.stage('character.construct'):
+            self.init_sheet(name, nature, level)
+        key = (self.nature, superior, archetype)
+        delta = DELTAS.get(key)
+        if delta is None:
+            # first character of its kind: profiles are merged on the fly
+            self.load_profile(superior)
+            self.load_profile(archetype, True)
+            DELTAS[key] = profile.ProfileDelta(self)
+        else:
+            with timing.stage('character.delta'):
+                self.apply_delta(delta)
+        with timing.stage('character.draw'):
+            self.draw_from_table(2, rng)
+        with timing.stage('character.update'):
+            self.update_values()
+
+    def init_sheet(self, name, nature, level=0):
+        """Initialize a blank character: identity, attributes, skills and side
+        values, before any profile is applied.
+
+        Arguments:
+        name -- Name of the character.
+        nature -- Nature of the character.
+
+        Keyword arguments:
+        level -- Level of the character (default 0).
         """
         profile.Profile.__init__(self, nature.capitalize())
         self.name = name
         self.level = level
-        self.name_coords = [722, 136] if self.nature == 'Demon' else [1125, 138]
-        self.lvl_coords = [1715, 233] if self.nature == 'Demon' else [2253, 236]
-        self.sup_coords = [761, 233] if self.nature == 'Demon' else [1163, 236]
+        header = schema.load_schema().header[self.nature]
+        self.name_coords = list(header['name'])
+        self.lvl_coords = list(header['level'])
+        self.sup_coords = list(header['superior'])
         self.init_attributes()
         self.init_skills()
         self.init_values()
-        self.load_profile(superior)
-        self.load_profile(archetype, True)
-        self.draw_from_table(2)
-        self.update_values()
 
     def init_attributes(self):
         """Initialize the character's attributes."""
-        self.attributes["Force"] = value.Attribute(
-            'Force',
-            4, [161, 525] if self.nature == 'Demon' else [837, 653])
-        self.attributes["Agilite"] = value.Attribute(
-            'Agilité',
-            4, [394, 508] if self.nature == 'Demon' else [1245, 653])
-        self.attributes["Perception"] = value.Attribute(
-            'Perception',
-            4, [689, 538] if self.nature == 'Demon' else [1653, 653])
-        self.attributes["Volonte"] = value.Attribute(
-            'Volonté',
-            4, [1021, 540] if self.nature == 'Demon' else [837, 1037])
-        self.attributes["Presence"] = value.Attribute(
-            'Présence',
-            4, [1294, 530] if self.nature == 'Demon' else [1245, 1037])
-        self.attributes["Foi"] = value.Attribute(
-            'Foi',
-            4, [1563, 536] if self.nature == 'Demon' else [1653, 1037])
+        for k, name, x, y, rank, _, _, _, invariant, _ in\
+                schema.load_schema().layouts['attributes', self.nature]:
+            self.attributes[k] = value.Attribute(name, rank, (x, y),
+                                                 invariant=invariant)
 
     def init_skills(self):
         """Initialize the character's skills."""
-        # Primary skills
-        self.primary_skills["Baratin"] = value.Skill(
-            'Baratin',
-            [983, 924] if self.nature == 'Demon' else [914, 1277],
-            governing_attribute=self.attributes["Presence"])
-        self.primary_skills["Combat"] = value.Skill(
-            'Combat',
-            [942, 987] if self.nature == 'Demon' else [873, 1339.5],
-            governing_attribute=self.attributes["Agilite"],
-            specific=True)
-        self.primary_skills["CaC"] = value.Skill(
-            'Corps à corps',
-            [983, 1050] if self.nature == 'Demon' else [914, 1402],
-            governing_attribute=self.attributes["Agilite"])
-        self.primary_skills["Defense"] = value.Skill(
-            'Défense',
-            [983, 1113] if self.nature == 'Demon' else [914, 1464.5],
-            governing_attribute=self.attributes["Agilite"])
-        self.primary_skills["Discretion"] = value.Skill(
-            'Discrétion',
-            [983, 1176] if self.nature == 'Demon' else [914, 1527],
-            governing_attribute=self.attributes["Agilite"])
-        self.primary_skills["Discussion"] = value.Skill(
-            'Discussion',
-            [983, 1239] if self.nature == 'Demon' else [914, 1589.5],
-            governing_attribute=self.attributes["Volonte"])
-        self.primary_skills["Enquete"] = value.Skill(
-            'Enquête',
-            [983, 1302] if self.nature == 'Demon' else [914, 1652],
-            governing_attribute=self.attributes["Foi"])
-        self.primary_skills["Fouille"] = value.Skill(
-            'Fouille',
-            [983, 1365] if self.nature == 'Demon' else [914, 1714.5],
-            governing_attribute=self.attributes["Perception"])
-        self.primary_skills["Intrusion"] = value.Skill(
-            'Intrusion',
-            [983, 1428] if self.nature == 'Demon' else [914, 1777],
-            acquired=True)
-        self.primary_skills["Medecine"] = value.Skill(
-            'Médecine',
-            [983, 1491] if self.nature == 'Demon' else [914, 1839.5],
-            acquired=True)
-        self.primary_skills["Seduction"] = value.Skill(
-            'Séduction',
-            [983, 1554] if self.nature == 'Demon' else [914, 1902],
-            governing_attribute=self.attributes["Presence"])
-        self.primary_skills["Tir"] = value.Skill(
-            'Tir',
-            [942, 1617] if self.nature == 'Demon' else [873, 1964.5],
-            governing_attribute=self.attributes["Perception"],
-            specific=True)
-        # Exotic skills
-        self.exotic_skills["Contorsionnisme"] = value.Skill(
-            'Contorsionnisme',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Agilite"], acquired=True)
-        self.exotic_skills["Humour"] = value.Skill(
-            'Humour',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        self.exotic_skills["Hypnotisme"] = value.Skill(
-            'Hypnotisme',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Volonte"],
-            acquired=True)
-        self.exotic_skills["Jeu"] = value.Skill(
-            'Jeu',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        self.exotic_skills["KamaSutra"] = value.Skill(
-            'Kama Sutra',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        self.exotic_skills["LangageAnimal"] = value.Skill(
-            'Langage animal',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Perception"], acquired=True)
-        self.exotic_skills["Narcolepsie"] = value.Skill(
-            'Narcolepsie',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        self.exotic_skills["Pickpocket"] = value.Skill(
-            'Pickpocket',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Agilite"], acquired=True)
-        self.exotic_skills["Prestidigitation"] = value.Skill(
-            'Prestidigitation',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Agilite"], acquired=True)
-        self.exotic_skills["SixiemeSens"] = value.Skill(
-            'Sixième sens',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            governing_attribute=self.attributes["Foi"], acquired=True)
-        self.exotic_skills["Torture"] = value.Skill(
-            'Torture',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        self.exotic_skills["Ventriloquie"] = value.Skill(
-            'Ventriloquie',
-            [983, 1800] if self.nature == 'Demon' else [914, 2136],
-            acquired=True)
-        #  Secondary skills
-        self.secondary_skills["Acrobaties"] = value.Skill(
-            'Acrobaties',
-            [983, 2238] if self.nature == 'Demon' else [2078, 1277],
-            governing_attribute=self.attributes["Agilite"])
-        self.secondary_skills["AisanceSociale"] = value.Skill(
-            'Aisance sociale',
-            [983, 2300.5] if self.nature == 'Demon' else [2078, 1339.5],
-            governing_attribute=self.attributes["Presence"])
-        self.secondary_skills["Art"] = value.Skill(
-            'Art',
-            [942, 2363] if self.nature == 'Demon' else [2037, 1402],
-            governing_attribute=self.attributes["Presence"],
-            specific=True, acquired=True)
-        self.secondary_skills["Athletisme"] = value.Skill(
-            'Athlétisme',
-            [983, 2425.5] if self.nature == 'Demon' else [2078, 1464.5],
-            governing_attribute=self.attributes["Force"])
-        self.secondary_skills["Conduite"] = value.Skill(
-            'Conduite',
-            [983, 2488] if self.nature == 'Demon' else [2078, 1527],
-            governing_attribute=self.attributes["Agilite"], acquired=True)
-        self.secondary_skills["CultureGenerale"] = value.Skill(
-            'Culture générale',
-            [942, 2550.5] if self.nature == 'Demon' else [2037, 1589.5],
-            specific=True, acquired=True)
-        self.secondary_skills["Hobby"] = value.Skill(
-            'Hobby',
-            [983, 2613] if self.nature == 'Demon' else [2078, 1652],
-            multiple=True, acquired=True)
-        self.secondary_skills["Informatique"] = value.Skill(
-            'Informatique',
-            [983, 2675.5] if self.nature == 'Demon' else [2078, 1714.5],
-            acquired=True)
-        self.secondary_skills["Intimidation"] = value.Skill(
-            'Intimidation',
-            [983, 2738] if self.nature == 'Demon' else [2078, 1777],
-            governing_attribute=self.attributes["Force"])
-        self.secondary_skills["Langues"] = value.Skill(
-            'Langues',
-            [347, 2800.5] if self.nature == 'Demon' else [1442, 1839.5],
-            multiple=True, invariant=True, acquired=True)
-        self.secondary_skills["Metier"] = value.Skill(
-            'Métier',
-            [983, 2863] if self.nature == 'Demon' else [2078, 1902],
-            multiple=True, acquired=True)
-        self.secondary_skills["Navigation"] = value.Skill(
-            'Navigation',
-            [983, 2925.5] if self.nature == 'Demon' else [2078, 1964],
-            acquired=True)
-        self.secondary_skills["Pilotage"] = value.Skill(
-            'Pilotage',
-            [983, 2988] if self.nature == 'Demon' else [2078, 2027],
-            acquired=True)
-        self.secondary_skills["SavoirCriminel"] = value.Skill(
-            'Savoir criminel',
-            [942, 3050.5] if self.nature == 'Demon' else [2037, 2089.5],
-            specific=True, acquired=True)
-        self.secondary_skills["SavoirEspion"] = value.Skill(
-            'Savoir espion',
-            [942, 3113] if self.nature == 'Demon' else [2037, 2152],
-            specific=True, acquired=True)
-        self.secondary_skills["SavoirMilitaire"] = value.Skill(
-            'Savoir militaire',
-            [942, 3175.5] if self.nature == 'Demon' else [2037, 2214.5],
-            specific=True, acquired=True)
-        self.secondary_skills["SavoirOcculte"] = value.Skill(
-            'Savoir occulte',
-            [942, 3238] if self.nature == 'Demon' else [2037, 2277],
-            specific=True, acquired=True)
-        self.secondary_skills["Science"] = value.Skill(
-            'Science',
-            [942, 3300.5] if self.nature == 'Demon' else [2037, 2339.5],
-            specific=True, acquired=True)
-        self.secondary_skills["Survie"] = value.Skill(
-            'Survie',
-            [942, 3363] if self.nature == 'Demon' else [2037, 2402],
-            governing_attribute=self.attributes["Perception"],
-            specific=True, acquired=True)
-        self.secondary_skills["Technique"] = value.Skill(
-            'Technique',
-            [942, 3425.5] if self.nature == 'Demon' else [2037, 2464.5],
-            specific=True, acquired=True)
+        layouts = schema.load_schema().layouts
+        attributes = self.attributes
+        for section in schema.SKILL_SECTIONS:
+            skills = getattr(self, section)
+            for k, name, x, y, _, attr, spe, mult, inv, acq in\
+                    layouts[section, self.nature]:
+                skills[k] = value.Skill(
+                    name, (x, y), attributes[attr] if attr else None,
+                    spe, mult, inv, None, acq)
 
     def init_values(self):
         """Initialize the character's side values."""
-        self.values["PF"] = value.Value(
-            0, [1383, 805] if self.nature == 'Demon' else [1951, 556])
-        self.values["PP"] = value.Value(
-            0, [1383, 867] if self.nature == 'Demon' else [1951, 641])
-        self.values["BL"] = value.Value(
-            0, [1373, 945] if self.nature == 'Demon' else [1951, 726])
-        self.values["BG"] = value.Value(
-            0, [1373, 1009] if self.nature == 'Demon' else [1951, 811])
-        self.values["BF"] = value.Value(
-            0, [1373, 1073] if self.nature == 'Demon' else [1951, 896])
-        self.values["MS"] = value.Value(
-            0, [1373, 1137] if self.nature == 'Demon' else [1951, 981])
+        for k, _, x, y, rank, _, _, _, _, _ in\
+                schema.load_schema().layouts['values', self.nature]:
+            self.values[k] = value.Value(rank, (x, y))
 
     def get_attributes(self):
         """Return the character's attributes."""
@@ -351,3 +186,21 @@ class Character(profile.Profile):
         self.values["BG"].set_base_rank(int(2 * wound))
         self.values["BF"].set_base_rank(int(3 * wound))
         self.values["MS"].set_base_rank(int(4 * wound))
+
+
+def new_blank(name, nature, level=0):
+    """Create a character without applying any profile.
+
+    Arguments:
+    name -- Name of the new character.
+    nature -- Nature of the new character.
+
+    Keyword arguments:
+    level -- Level of the new character (default 0).
+
+    Returns: a Character instance. Its update_values method should be called
+    once its ranks are set.
+    """
+    c = Character.__new__(Character)
+    c.init_sheet(name, nature, level)
+    return c
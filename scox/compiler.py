@@ -0,0 +1,189 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.profile as profile
+import scox.schema as schema
+
+import os
+import pickle
+
+PROFILE_FILES = ['attributes.csv', 'values.csv', 'primary_skills.csv',
+                 'secondary_skills.csv', 'exotic_skills.csv', 'powers.csv']
+TABLE_FILES = {'Angel': 'table_angel.csv', 'Demon': 'table_demon.csv'}
+
+
+def compile_profiles():
+    """Validate every profile archive of the catalog and compile them.
+
+    Returns: a dictionary mapping the paths of the archives, relative to the
+    profile folder, to their compiled versions, in the format read by
+    scox.profile.load_compiled, and the list of every error found, as
+    human-readable strings. The compiled profiles should not be written if
+    there is any error.
+    """
+    value_names = get_schema()
+    superiors = {e['title'] for n in ['angel', 'demon']
+                 for e in catalog.load_catalog()[n].values()}
+    archives = {}
+    errors = []
+    for category in catalog.CATEGORIES:
+        for entry in catalog.load_catalog()[category].values():
+            path = os.path.join(catalog.PROFILE_PATH, entry['file'])
+            try:
+                data = profile.parse_profile(path)
+            except Exception as e:
+                errors.append(entry['file'] + ": unreadable archive (" +
+                              str(e) + ").")
+                continue
+            found = validate_profile(data, value_names)
+            tables = {}
+            if category == 'arch':
+                for nature in entry['natures']:
+                    t = TABLE_FILES[nature]
+                    if t not in data:
+                        found.append(t + ": missing file.")
+                        continue
+                    table_errors = validate_table(data[t], superiors)
+                    found.extend(t + ": " + e for e in table_errors)
+                    if len(table_errors) == 0:
+                        tables[t] = profile.parse_power_table(data[t])
+            errors.extend(entry['file'] + ", " + e for e in found)
+            archives[entry['file']] = {'version': profile.COMPILED_VERSION,
+                                       'sha256': entry['sha256'],
+                                       'data': data,
+                                       'tables': tables}
+    return archives, errors
+
+
+def get_schema():
+    """Return the names of the values of a blank character.
+
+    Returns: a dictionary mapping 'attributes', 'values' and 'exotic_skills'
+    to sets of keys, and 'primary_skills' and 'secondary_skills' to
+    dictionaries mapping keys to 'specific', 'multiple' or None.
+    """
+    sections = schema.load_schema().sections
+
+    def kinds(entries):
+        return {e.key: ('specific' if e.specific else
+                        'multiple' if e.multiple else None)
+                for e in entries}
+
+    return {'attributes': {e.key for e in sections['attributes']},
+            'values': {e.key for e in sections['values']},
+            'primary_skills': kinds(sections['primary_skills']),
+            'secondary_skills': kinds(sections['secondary_skills']),
+            'exotic_skills': {e.key for e in sections['exotic_skills']}}
+
+
+def validate_profile(data, value_names):
+    """Check the CSV files of a profile archive against the names of the values
+    of a character.
+
+    Arguments:
+    data -- Parsed CSV files of the archive, as returned by
+        scox.profile.parse_profile.
+    value_names -- Names of the values of a character, as returned by
+        get_schema.
+
+    Returns: the list of errors, as human-readable strings.
+    """
+    errors = []
+    for f in PROFILE_FILES:
+        if f not in data:
+            errors.append(f + ": missing file.")
+            continue
+        section = f.split('.')[0]
+        columns = ['Name', 'Invariant', 'Rank', 'Cost']\
+            if section == 'powers' else ['Name', 'Rank']
+        names = set()
+        for n, row in enumerate(data[f]):
+            where = f + ", row " + str(n + 2) + ": "
+            missing = [c for c in columns if row.get(c) is None]
+            if len(missing) > 0:
+                errors.append(where + "missing column(s) " +
+                              ", ".join(missing) + ".")
+                continue
+            name = row['Name']
+            if section != 'powers' or row['Invariant'] != 'True':
+                try:
+                    int(row['Rank'])
+                except ValueError:
+                    errors.append(where + "invalid rank '" + row['Rank'] +
+                                  "'.")
+            if section == 'powers':
+                if row['Invariant'] not in ('True', 'False'):
+                    errors.append(where + "invalid invariant flag '" +
+                                  row['Invariant'] + "'.")
+                if name in names:
+                    errors.append(where + "duplicate power " + name + ".")
+                names.add(name)
+            elif section in ('attributes', 'values', 'exotic_skills'):
+                if name not in value_names[section]:
+                    errors.append(where + "unknown " +
+                                  section.rstrip('s').replace('_', ' ') +
+                                  " " + name + ".")
+            else:
+                skills = value_names[section]
+                base, sep, suffix = name.partition('_')
+                if name in skills:
+                    continue
+                elif base not in skills:
+                    errors.append(where + "unknown skill " + name + ".")
+                elif section == 'primary_skills' and (
+                        suffix != 'spe' or skills[base] != 'specific'):
+                    errors.append(where + "invalid specialization " +
+                                  name + ".")
+                elif skills[base] is None:
+                    errors.append(where + "skill " + base + " is neither "
+                                  "specific nor multiple.")
+    return errors
+
+
+def validate_table(rows, superiors):
+    """Check the rows of a power table.
+
+    Arguments:
+    rows -- Rows of the CSV file of the table, as dictionaries.
+    superiors -- Titles of the superiors which may be given a bonus.
+
+    Returns: the list of errors, as human-readable strings.
+    """
+    errors = []
+    rolls = set()
+    for n, row in enumerate(rows):
+        where = "row " + str(n + 2) + ": "
+        try:
+            (values, powers, pp, bonus), = profile.parse_power_table([row])
+        except Exception:
+            errors.append(where + "malformed row.")
+            continue
+        for v in values:
+            if v in rolls:
+                errors.append(where + "duplicate roll " + str(v) + ".")
+            rolls.add(v)
+        for k, p in powers.items():
+            if len(p) != 3 or p[0] not in ('True', 'False'):
+                errors.append(where + "malformed power " + k + ".")
+            elif p[0] == 'False' and not p[1].strip().isdigit():
+                errors.append(where + "invalid rank for power " + k + ".")
+        for k in bonus:
+            if k not in superiors:
+                errors.append(where + "unknown superior " + k + ".")
+    return errors
+
+
+def write_compiled(compiled):
+    """Write compiled profiles in the compiled profile folder, one file per
+    archive.
+
+    Arguments:
+    compiled -- Compiled profiles, as returned by compile_profiles.
+    """
+    for name, archive in compiled.items():
+        path = profile.get_compiled_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(archive, f, protocol=4)
+        os.replace(path + '.tmp', path)
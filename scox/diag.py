@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.character as chc
+import scox.export.render as rdr
+import scox.value as value
+
+import io
+import sys
+import tempfile
+import tracemalloc
+
+
+def character_memory(character):
+    """Measure the memory held by a character, broken down by kind of value.
+
+    Objects shared between sections (such as the attributes referenced by
+    skills as governing attributes) are only counted once, in the first
+    section that holds them. Metadata shared with other characters
+    (scox.value.Metadata instances) and the merged profiles of their
+    combinations (scox.profile.ProfileDelta instances, such as their power
+    tables) are not counted.
+
+    Arguments:
+    character -- An instance of scox.character.Character.
+
+    Returns: a dictionary mapping 'attributes', 'skills', 'powers', 'values',
+    'other' and 'total' to sizes in bytes.
+    """
+    seen = set(id(m) for m in list(value.METADATA.values()))
+    for delta in list(chc.DELTAS.values()):
+        deep_sizeof(delta, seen)
+    sizes = {'attributes': deep_sizeof(character.get_attributes(), seen),
+             'skills': (deep_sizeof(character.get_primary_skills(), seen) +
+                        deep_sizeof(character.get_exotic_skills(), seen) +
+                        deep_sizeof(character.get_secondary_skills(), seen)),
+             'powers': deep_sizeof(character.get_powers(), seen),
+             'values': deep_sizeof(character.get_side_values(), seen)}
+    sizes['other'] = deep_sizeof(character, seen)
+    sizes['total'] = sum(sizes.values())
+    return sizes
+
+
+def deep_sizeof(obj, seen=None):
+    """Return the size of an object and of every object it references.
+
+    Arguments:
+    obj -- Any Python object.
+    seen -- Set of the ids of objects already counted, which are skipped
+        (default: None).
+
+    Returns: a size in bytes.
+    """
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        size += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        if hasattr(o, '__dict__'):
+            stack.append(o.__dict__)
+        for cls in type(o).__mro__:
+            for k in cls.__dict__.get('__slots__', ()):
+                if hasattr(o, k):
+                    stack.append(getattr(o, k))
+    return size
+
+
+def measure_team(count, nature, superior, archetype, formats=('txt',)):
+    """Measure the memory used to generate and export a team.
+
+    Memory is traced with tracemalloc while the team is generated and kept in
+    memory, then while it is exported to a temporary folder.
+
+    Arguments:
+    count -- Number of characters in the team.
+    nature -- Nature of the characters ('angel' or 'demon').
+    superior -- Path to the superior profile archive.
+    archetype -- Path to the archetype profile archive.
+    formats -- Export formats, from scox.export.render.TEAM_FORMATS (default:
+        TXT only).
+
+    Returns: a dictionary holding the bytes allocated per character, the peak
+    memory of the generation and the peak memory of the export, in bytes.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.clear_traces()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        team = [chc.Character('NPC ' + str(i), nature, archetype, superior)
+                for i in range(count)]
+        current, gen_peak = tracemalloc.get_traced_memory()
+        per_character = (current - before) / float(max(count, 1))
+        tracemalloc.reset_peak()
+        with tempfile.TemporaryDirectory() as folder:
+            streams = {f: io.StringIO() for f in formats
+                       if f in rdr.STREAMED_FORMATS}
+            rdr.export_team(team, formats, folder, streams)
+            export_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return {'count': count,
+            'per_character': per_character,
+            'generation_peak': gen_peak - before,
+            'export_peak': export_peak - before}
+
+
+def format_size(size):
+    """Format a size in bytes for display.
+
+    Arguments:
+    size -- A size in bytes.
+
+    Returns: a string such as '12.3 KiB'.
+    """
+    for unit in ['B', 'KiB', 'MiB']:
+        if abs(size) < 1024:
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024.0
+    return '{:.1f} GiB'.format(size)
+
@@ -0,0 +1,216 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.export.serialize as srl
+import scox.schema as schema
+import scox.storage as storage
+
+import json
+
+# sections of a mapping file, from the least to the most specific
+MAPPING_SECTIONS = ['archetypes', 'superiors', 'characters']
+
+
+def apply_rules(character, rules):
+    """Apply edition rules to a character.
+
+    Only usable skills are edited, as with 'scx character edit skills'.
+
+    Arguments:
+    character -- An instance of scox.character.Character.
+    rules -- A dictionary mapping (section, key) tuples of skills to a
+        specialization name or to a tuple of varieties, as returned by
+        get_rules.
+
+    Returns: True if the character was changed.
+    """
+    changed = False
+    for (section, k), new in rules.items():
+        sk = getattr(character, section).get(k)
+        if sk is None or not sk.is_usable():
+            continue
+        if isinstance(new, str):
+            if sk.is_specific() and sk.specialization.get_name() != new:
+                sk.specialization.set_name(new)
+                changed = True
+        elif sk.is_multiple() and sk.varieties != list(new):
+            sk.varieties = list(new)
+            changed = True
+    return changed
+
+
+def edit_team(folder, mapping, dry_run=False, sync=True):
+    """Apply a mapping to every character of a team, in a single pass.
+
+    Characters are loaded one at a time; only the changed ones are written
+    back, through a storage batch. Names of the mapping which match no
+    character are reported, so that a misspelt name does not go unnoticed.
+
+    Arguments:
+    folder -- Path to the team folder.
+    mapping -- A mapping, as returned by load_mapping.
+
+    Keyword arguments:
+    dry_run -- True to count the characters which would be changed, without
+        writing them (default False).
+    sync -- False to skip flushing the changed files to disk (default True).
+
+    Returns: the number of read characters, the number of changed
+    characters, the list of the paths of the files which could not be loaded
+    and the list of the (section, normalized name) tuples of the mapping
+    which matched no character.
+    """
+    failures = []
+    count = 0
+    changed = 0
+    matched = set()
+    with storage.Batch(sync=sync) as batch:
+        for c in srl.iter_from_folder(folder, failures):
+            count += 1
+            rules = get_rules(mapping, c, matched)
+            if len(rules) == 0 or not apply_rules(c, rules):
+                continue
+            changed += 1
+            if not dry_run:
+                srl.save_to_team(c, folder, batch)
+    unmatched = [(section, name) for section in MAPPING_SECTIONS
+                 for name in mapping[section]
+                 if (section, name) not in matched]
+    return count, changed, failures, unmatched
+
+
+def get_rules(mapping, character, matched=None):
+    """Merge the rules of a mapping which apply to a character.
+
+    Rules given for the character's name override those given for its
+    superior, which override those given for its archetype. Names are
+    compared once normalized (see scox.catalog.normalize_name).
+
+    Arguments:
+    mapping -- A mapping, as returned by load_mapping.
+    character -- An instance of scox.character.Character.
+
+    Keyword arguments:
+    matched -- Optional set to which the (section, normalized name) tuples of
+        the applied rules are added.
+
+    Returns: a dictionary mapping (section, key) tuples of skills to a
+    specialization name or to a tuple of varieties.
+    """
+    rules = {}
+    for section, name in zip(MAPPING_SECTIONS,
+                             [character.get_archetype(),
+                              character.get_superior(),
+                              character.get_name()]):
+        if name is None:
+            continue
+        key = catalog.normalize_name(name)
+        if key in mapping[section]:
+            rules.update(mapping[section][key])
+            if matched is not None:
+                matched.add((section, key))
+    return rules
+
+
+def get_skill_entry(skill):
+    """Return the section and schema entry of a skill.
+
+    Arguments:
+    skill -- Key or displayed name of a skill.
+
+    Returns: a (section, scox.schema.Entry) tuple, or None if the schema
+    lacks the skill.
+    """
+    sc = schema.load_schema()
+    for section in schema.SKILL_SECTIONS:
+        e = sc.get_entry(section, skill)
+        if e is not None:
+            return section, e
+    for section in schema.SKILL_SECTIONS:
+        for e in sc.sections[section]:
+            if e.name == skill:
+                return section, e
+    return None
+
+
+def load_mapping(handle):
+    """Read and check a mapping file.
+
+    A mapping file is a JSON object whose optional 'archetypes', 'superiors'
+    and 'characters' members map names to edits. Edits map skills, by key or
+    displayed name, either to the name of their specialization, for specific
+    skills, or to the list of their varieties, for multiple skills ('Métier'
+    and 'Hobby' accept a single variety). For example:
+    {"superiors": {"Baal": {"Combat": "Poings", "Langues": ["Latin"]}},
+     "characters": {"PNJ 1": {"Métier": ["Plombier"]}}}
+
+    Arguments:
+    handle -- Open text file with reading access.
+
+    Names are matched regardless of case, accents, and of spaces or hyphens
+    used instead of underscores, as profile names.
+
+    Returns: a dictionary mapping each section of MAPPING_SECTIONS to a
+    dictionary of normalized names (see scox.catalog.normalize_name) to
+    dictionaries of (section, key) tuples of skills to specialization names
+    or tuples of varieties.
+
+    Raises:
+    ValueError -- If the file is not a valid mapping.
+    """
+    data = json.load(handle)
+    if not isinstance(data, dict):
+        raise ValueError("The mapping file does not hold a JSON object.")
+    unknown = [k for k in data if k not in MAPPING_SECTIONS]
+    if len(unknown) > 0:
+        raise ValueError("Unknown mapping sections: " + ", ".join(unknown) +
+                         " (expected " + ", ".join(MAPPING_SECTIONS) + ").")
+    mapping = {}
+    for section in MAPPING_SECTIONS:
+        names = data.get(section, {})
+        if not isinstance(names, dict):
+            raise ValueError(section + ": not a JSON object.")
+        mapping[section] = {}
+        for name, edits in names.items():
+            if not isinstance(edits, dict):
+                raise ValueError(section + ", " + name +
+                                 ": not a JSON object.")
+            key = catalog.normalize_name(name)
+            if key in mapping[section]:
+                raise ValueError(section + ", " + name + ": given twice.")
+            try:
+                mapping[section][key] = dict(
+                    parse_edit(skill, new) for skill, new in edits.items())
+            except ValueError as e:
+                raise ValueError(section + ", " + name + ": " + str(e))
+    return mapping
+
+
+def parse_edit(skill, new):
+    """Check an edit of a mapping file.
+
+    Arguments:
+    skill -- Key or displayed name of the edited skill.
+    new -- New specialization name, or list of varieties.
+
+    Returns: a ((section, key), new) tuple, where lists are turned into
+    tuples.
+    """
+    found = get_skill_entry(skill)
+    if found is None:
+        raise ValueError("unknown skill: " + skill + ".")
+    section, e = found
+    if isinstance(new, str):
+        if not e.specific:
+            raise ValueError(skill + ": not a specific skill.")
+        return (section, e.key), new
+    if not isinstance(new, list) or\
+            not all(isinstance(v, str) for v in new):
+        raise ValueError(skill + ": expected a specialization name or a "
+                                 "list of varieties.")
+    if not e.multiple:
+        raise ValueError(skill + ": not a multiple skill.")
+    if not e.invariant and len(new) > 1:
+        raise ValueError(skill + ": a single variety is allowed.")
+    return (section, e.key), tuple(new)
@@ -1,52 +1,73 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import scox.timing as timing
 
-def print_cli(chc_profile):
+import sys
+
+
+def print_cli(chc_profile, stream=None):
     """Print the character's complete profile to the command line.
 
+    The whole tree is rendered in memory first, then written at once.
+
+    Args:
+        chc_profile: an instance of class scox.character.Character.
+        stream: open text file with writing access (default: the standard
+        output).
+    """
+    if stream is None:
+        stream = sys.stdout
+    with timing.stage('cli.render'):
+        rendered = render_cli(chc_profile)
+    with timing.stage('cli.write'):
+        stream.write(rendered)
+
+
+def render_cli(chc_profile):
+    """Render the character's complete profile as a tree.
+
     Args:
         chc_profile: an instance of class scox.character.Character.
+
+    Returns: a string.
     """
-    print("\n")
-    print("\u250C\u2500\u2500 " +
-          chc_profile.get_name() +
-          " \u2500 " +
-          "Grade " +
-          str(chc_profile.get_level()) +
-          " \u2500 " +
-          chc_profile.get_superior()
-          )
-    print("\u2502")
-    print("\u251c\u2500\u2500 " + "Attributs" +
-          " \u2500\u2500\u2500\u2500\u2500"
-          "\u2500\u2500\u2500\u2500\u2500\u2500 " +
-          "Valeurs annexes")
-    print_attributes(chc_profile)
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents principaux")
-    print_skills(chc_profile.get_primary_skills())
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents exotiques")
-    print_skills(chc_profile.get_exotic_skills())
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents secondaires")
-    print_skills(chc_profile.get_secondary_skills())
-    print("\u2502")
-    print("\u2514\u2500\u2500 " +
-          "Pouvoirs")
-    print_powers(chc_profile.get_powers())
-    print("\n")
-
-
-def print_attributes(chc_profile):
-    """Format and print the input character's attributes and side values.
+    lines = ["\n",
+             "\u250C\u2500\u2500 " +
+             chc_profile.get_name() +
+             " \u2500 " +
+             "Grade " +
+             str(chc_profile.get_level()) +
+             " \u2500 " +
+             chc_profile.get_superior(),
+             "\u2502",
+             "\u251c\u2500\u2500 " + "Attributs" +
+             " \u2500\u2500\u2500\u2500\u2500"
+             "\u2500\u2500\u2500\u2500\u2500\u2500 " +
+             "Valeurs annexes"]
+    render_attributes(chc_profile, lines)
+    lines.append("\u2502")
+    lines.append("\u251c\u2500\u2500 " + "Talents principaux")
+    render_skills(chc_profile.get_primary_skills(), lines)
+    lines.append("\u2502")
+    lines.append("\u251c\u2500\u2500 " + "Talents exotiques")
+    render_skills(chc_profile.get_exotic_skills(), lines)
+    lines.append("\u2502")
+    lines.append("\u251c\u2500\u2500 " + "Talents secondaires")
+    render_skills(chc_profile.get_secondary_skills(), lines)
+    lines.append("\u2502")
+    lines.append("\u2514\u2500\u2500 " + "Pouvoirs")
+    render_powers(chc_profile.get_powers(), lines)
+    lines.append("\n")
+    return "\n".join(lines) + "\n"
+
+
+def render_attributes(chc_profile, lines):
+    """Format the input character's attributes and side values.
 
     Args:
         chc_profile: an instance of scox.character.Character.
+        lines: list of strings to which formatted lines are appended.
     """
     attributes = chc_profile.get_attributes()
     values = chc_profile.get_side_values()
@@ -55,64 +76,52 @@ def print_attributes(chc_profile):
             attributes[a].get_name(), attributes[a].get_cli_rank(), 14)
         side = format_attribute(s, values[s].get_cli_rank(), 14)
         if a != 'Foi':
-            print('\u2502   \u251c\u2500\u2500 ' + attr +
-                  '    \u251c\u2500\u2500 ' + side)
+            lines.append('\u2502   \u251c\u2500\u2500 ' + attr +
+                         '    \u251c\u2500\u2500 ' + side)
         else:
-            print('\u2502   \u2514\u2500\u2500 ' + attr +
-                  '    \u2514\u2500\u2500 ' + side)
+            lines.append('\u2502   \u2514\u2500\u2500 ' + attr +
+                         '    \u2514\u2500\u2500 ' + side)
 
 
-def print_powers(power_set):
-    """Format and print a power set.
+def render_powers(power_set, lines):
+    """Format a power set.
 
     Args:
         power_set: a dictionary of scox.value.Power instances.
+        lines: list of strings to which formatted lines are appended.
     """
-    powers = [p for p in power_set.keys()]
-    for p in power_set:
-        br = "\u251C"
-        if p == powers[-1]:
-            br = "\u2514"
-        print("    " + br + "\u2500\u2500 " +
-              format_attribute(p, power_set[p].get_cli_rank(), 37))
+    last = len(power_set) - 1
+    for i, p in enumerate(power_set):
+        br = "\u2514" if i == last else "\u251c"
+        lines.append("    " + br + "\u2500\u2500 " +
+                     format_attribute(p, power_set[p].get_cli_rank(), 37))
 
 
-def print_skills(skill_set):
-    """Format and print a skill set.
+def render_skills(skill_set, lines):
+    """Format the usable skills of a skill set.
 
     Args:
         skill_set: a dictionary of scox.value.Skill instances.
+        lines: list of strings to which formatted lines are appended.
     """
-    last = get_last_usable_skill(skill_set)
-    for s in skill_set:
-        sk = skill_set[s]
-        if sk.is_usable():
-            br = "\u251c"  # branch character
-            if s == last:
-                br = "\u2514"
-            print("\u2502   " + br + "\u2500\u2500 " +
-                  format_attribute(sk.get_name(), sk.get_cli_rank(), 37))
-            if sk.is_specific():
-                if s == last:
-                    spacing = " "
-                else:
-                    spacing = "\u2502"
-                print("\u2502   " + spacing + "   \u2514\u2500\u2500 " +
-                      format_attribute(
-                          sk.get_specialization().get_name(),
-                          sk.get_specialization().get_cli_rank(), 33)
-                      )
-            elif sk.is_multiple():
-                if s == last:
-                    spacing_m = " "
-                else:
-                    spacing_m = "\u2502"
-                for v in sk.varieties:
-                    br_m = "\u251c"  # branch character
-                    if v == sk.varieties[-1]:
-                        br_m = "\u2514"
-                    print("\u2502   " + spacing_m + "   " + br_m +
-                          "\u2500\u2500 " + v)
+    usable = [sk for sk in skill_set.values() if sk.is_usable()]
+    last = len(usable) - 1
+    for i, sk in enumerate(usable):
+        br = "\u2514" if i == last else "\u251c"  # branch character
+        spacing = " " if i == last else "\u2502"
+        lines.append("\u2502   " + br + "\u2500\u2500 " +
+                     format_attribute(sk.get_name(), sk.get_cli_rank(), 37))
+        if sk.is_specific():
+            lines.append("\u2502   " + spacing + "   \u2514\u2500\u2500 " +
+                         format_attribute(
+                             sk.specialization.get_name(),
+                             sk.specialization.get_cli_rank(), 33))
+        elif sk.is_multiple():
+            last_m = len(sk.varieties) - 1
+            for j, v in enumerate(sk.varieties):
+                br_m = "\u2514" if j == last_m else "\u251c"
+                lines.append("\u2502   " + spacing + "   " + br_m +
+                             "\u2500\u2500 " + v)
 
 
 def format_attribute(name, val, lng):
@@ -145,11 +154,7 @@ def get_last_usable_skill(skill_dict):
 
     Returns: the last usable skill in skill_dict.
     """
-    usable = []
-    for s in skill_dict.keys():
+    for s in reversed(list(skill_dict.keys())):
         if skill_dict[s].is_usable():
-            usable.append(s)
-    if len(usable) > 0:
-        return usable[-1]
-    else:
-        return None
+            return s
+    return None
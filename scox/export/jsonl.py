@@ -0,0 +1,99 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.timing as timing
+
+import json
+
+
+def character_as_dict(profile):
+    """Convert the character's profile to a dictionary of JSON-compatible
+    values.
+
+    Only usable skills are listed.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a dictionary.
+    """
+    return {
+        'name': profile.get_name(),
+        'nature': profile.get_nature(),
+        'superior': profile.get_superior(),
+        'level': profile.get_level(),
+        'attributes': {k: value_as_dict(a) for k, a in
+                       profile.get_attributes().items()},
+        'values': {k: value_as_dict(v) for k, v in
+                   profile.get_side_values().items()},
+        'primary_skills': skills_as_dict(profile.get_primary_skills()),
+        'exotic_skills': skills_as_dict(profile.get_exotic_skills()),
+        'secondary_skills': skills_as_dict(profile.get_secondary_skills()),
+        'powers': {k: power_as_dict(p) for k, p in
+                   profile.get_powers().items()}
+    }
+
+
+def export_as_json(profile, json_file):
+    """Export the character's profile as a single line of JSON.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        json_file: open text file with writing access.
+    """
+    with timing.stage('json.export'):
+        json.dump(character_as_dict(profile), json_file, ensure_ascii=False)
+        json_file.write("\n")
+
+
+def power_as_dict(power):
+    """Convert a power to a dictionary.
+
+    Args:
+        power: an instance of scox.value.Power.
+
+    Returns: a dictionary.
+    """
+    d = value_as_dict(power)
+    d['cost'] = power.get_cost()
+    d['invariant'] = power.is_invariant()
+    return d
+
+
+def skills_as_dict(skill_dict):
+    """Convert the usable skills of a skill dictionary to a dictionary.
+
+    Args:
+        skill_dict: an ordered dictionary of scox.value.Skill instances.
+
+    Returns: a dictionary.
+    """
+    skills = {}
+    for k, s in skill_dict.items():
+        if s.is_usable():
+            d = value_as_dict(s)
+            if s.is_specific():
+                d['specialization'] = value_as_dict(s.get_specialization())
+            elif s.is_multiple():
+                d['varieties'] = list(s.get_varieties())
+            skills[k] = d
+    return skills
+
+
+def value_as_dict(val):
+    """Convert a value to a dictionary.
+
+    Args:
+        val: an instance of scox.value.Value.
+
+    Returns: a dictionary holding the name of the value, if any, its invested
+    rank, its full rank and its displayed rank.
+    """
+    d = {}
+    if hasattr(val, 'get_name'):
+        d['name'] = val.get_name()
+    d['rank'] = val.rank
+    d['full_rank'] = val.get_full_rank()
+    cli_rank = val.get_cli_rank()
+    d['display'] = cli_rank.rstrip() if cli_rank is not None else None
+    return d
@@ -0,0 +1,460 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.export.jsonl as jsonl
+import scox.export.svg as svg
+import scox.export.table as table
+import scox.export.txt as txt
+import scox.storage as storage
+import scox.timing as timing
+
+import collections
+import concurrent.futures
+import io
+import os
+import zipfile
+
+CHARACTER_FORMATS = ['svg', 'txt', 'json']
+TEAM_FORMATS = ['svg', 'json', 'txt', 'jsonl', 'csv', 'html']
+STREAMED_FORMATS = ['txt', 'jsonl', 'csv', 'html']
+SHEETS_FOLDER = 'sheets'
+
+
+class RenderModel:
+    """Normalized view of a character, shared by every export writer.
+
+    A render model is built once per character. It exposes the same getters as
+    scox.character.Character, except that skill dictionaries only hold usable
+    skills, so that writers do not have to filter them again.
+
+    Instance variables:
+    attributes -- Map of the character's attributes.
+    exotic_skills -- Map of the character's usable exotic skills.
+    level -- Level of the character.
+    lvl_coords -- Coordinates of the character's level on an SVG export.
+    name -- Name of the character.
+    name_coords -- Coordinates of the character's name on an SVG export.
+    nature -- Nature of the character; either 'Angel' or 'Demon'.
+    powers -- Map of the character's powers.
+    primary_skills -- Map of the character's usable primary skills.
+    secondary_skills -- Map of the character's usable secondary skills.
+    side_values -- Map of the character's side values.
+    sup_coords -- Coordinates of the character's superior on an SVG export.
+    superior -- Hierarchical superior of the character.
+    """
+
+    def __init__(self, profile):
+        """Constructor.
+
+        Arguments:
+        profile -- An instance of scox.character.Character.
+        """
+        self.name = profile.get_name()
+        self.nature = profile.get_nature()
+        self.superior = profile.get_superior()
+        self.level = profile.get_level()
+        self.name_coords = profile.get_name_coords()
+        self.lvl_coords = profile.get_lvl_coords()
+        self.sup_coords = profile.get_sup_coords()
+        self.attributes = profile.get_attributes()
+        self.side_values = profile.get_side_values()
+        self.powers = profile.get_powers()
+        self.primary_skills = usable_skills(profile.get_primary_skills())
+        self.exotic_skills = usable_skills(profile.get_exotic_skills())
+        self.secondary_skills = usable_skills(profile.get_secondary_skills())
+
+    def get_attributes(self):
+        """Return the character's attributes."""
+        return self.attributes
+
+    def get_exotic_skills(self):
+        """Return the character's usable exotic skills."""
+        return self.exotic_skills
+
+    def get_level(self):
+        """Return the character's level."""
+        return self.level
+
+    def get_lvl_coords(self):
+        """Return the character's level coordinates."""
+        return self.lvl_coords
+
+    def get_name(self):
+        """Return the character's name."""
+        return self.name
+
+    def get_name_coords(self):
+        """Return the character's name coordinates."""
+        return self.name_coords
+
+    def get_nature(self):
+        """Return the character's nature."""
+        return self.nature
+
+    def get_powers(self):
+        """Return the character's powers."""
+        return self.powers
+
+    def get_primary_skills(self):
+        """Return the character's usable primary skills."""
+        return self.primary_skills
+
+    def get_secondary_skills(self):
+        """Return the character's usable secondary skills."""
+        return self.secondary_skills
+
+    def get_side_values(self):
+        """Return the character's side values."""
+        return self.side_values
+
+    def get_sup_coords(self):
+        """Return the character's superior coordinates."""
+        return self.sup_coords
+
+    def get_superior(self):
+        """Return the character's superior."""
+        return self.superior
+
+
+def export_archive(load, formats, archive, team, workers=4,
+                   link_sheets=False):
+    """Export the characters of a team to a single ZIP archive.
+
+    Characters are rendered by a pool of threads, while the calling thread
+    writes the rendered entries to the archive in the order of the team, so
+    that nothing is written to temporary files. Only a few characters are
+    rendered ahead of the archive. Entries are stored in a folder named after
+    the team: SVG and JSON formats give one entry per character, and streamed
+    formats one '<team>.<format>' entry for the whole team.
+
+    A ZIP entry has to be written in one go, so the team is read once for the
+    per-character entries, then once for each streamed format, whose entry is
+    written to as characters are rendered: memory use does not grow with the
+    size of the team. Characters with the same name get numbered entries, as
+    with export_team. SVG entries embedding a character sheet are mostly made
+    of base64-encoded PNG data, which hardly compresses: they are stored
+    without compression.
+
+    Args:
+        load: a function returning a new iterable of
+        scox.character.Character instances, called once per pass over the
+        team.
+        formats: a list of formats from TEAM_FORMATS.
+        archive: path to the ZIP file, or binary file with writing access
+        (which does not need to be seekable).
+        team: name of the team.
+        workers: number of rendering threads.
+        link_sheets: True to link SVG exports to the empty character sheets,
+        which are stored once in the SHEETS_FOLDER of the archive, instead of
+        embedding them in every SVG entry.
+
+    Returns: the number of exported characters and the list of names of the
+    characters which could not be exported.
+    """
+    prefix = team + '/'
+    files = [f for f in formats if f not in STREAMED_FORMATS]
+    total = 0
+    failures = {}
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf,\
+            concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        if len(files) > 0:
+            names = set()
+            sheets = set()
+
+            def write_files(name, entries):
+                name = unique_name(name, names)
+                for f, content, sheet in entries:
+                    if f == 'svg' and not link_sheets:
+                        zf.writestr(prefix + name + '.' + f, content,
+                                    compress_type=zipfile.ZIP_STORED)
+                    else:
+                        zf.writestr(prefix + name + '.' + f, content)
+                    if f == 'svg' and sheet is not None and\
+                            sheet not in sheets:
+                        # already compressed image, stored as is
+                        zf.write(sheet, prefix + SHEETS_FOLDER + '/' +
+                                 os.path.basename(sheet),
+                                 compress_type=zipfile.ZIP_STORED)
+                        sheets.add(sheet)
+            total = render_in_pool(pool, load(), files, write_files,
+                                   failures, 2 * workers, link_sheets)
+        for fmt in formats:
+            if fmt not in STREAMED_FORMATS:
+                continue
+            with zf.open(prefix + team + '.' + fmt, 'w') as entry,\
+                    io.TextIOWrapper(entry, encoding='utf-8',
+                                     newline='') as handle:
+                if fmt == 'csv':
+                    table.write_csv_header(handle)
+                elif fmt == 'html':
+                    bundle = svg.PrintBundle(handle, team)
+
+                def write_stream_entry(name, entries):
+                    for _, content, sheet in entries:
+                        if fmt == 'html':
+                            bundle.write_page(content, sheet)
+                        else:
+                            handle.write(content)
+                total = render_in_pool(pool, load(), [fmt],
+                                       write_stream_entry, failures,
+                                       2 * workers)
+                if fmt == 'html':
+                    bundle.close()
+    return total - len(failures), [failures[i] for i in sorted(failures)]
+
+
+def export_character(profile, formats, folder):
+    """Export a character to several file formats at once.
+
+    The render model of the character is built once and handed to every
+    requested writer. Files are named after the character.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        formats: a list of formats from CHARACTER_FORMATS.
+        folder: path to the folder where to write the resulting files.
+
+    Returns: the list of written paths.
+    """
+    with timing.stage('render.model'):
+        model = RenderModel(profile)
+    paths = []
+    for f in formats:
+        path = os.path.join(folder, model.get_name() + '.' + f)
+        write_file(model, f, path)
+        paths.append(path)
+    return paths
+
+
+def export_team(profiles, formats, folder, streams=None):
+    """Export a sequence of characters to several formats in a single pass.
+
+    Each character is turned into a render model once, which is then written
+    to one file per character for SVG and JSON formats, and appended to the
+    matching open file for streamed formats (TXT, JSONL, CSV, and HTML print
+    bundle, titled after the team folder). Characters with the same name get
+    numbered files (see unique_name) rather than overwriting each other.
+
+    Args:
+        profiles: an iterable of scox.character.Character instances.
+        formats: a list of formats from TEAM_FORMATS.
+        folder: path to the folder where to write per-character files.
+        streams: a dictionary mapping each requested streamed format to an
+        open text file with writing access.
+
+    Returns: the number of exported characters and the list of names of the
+    characters which could not be exported.
+    """
+    streams = streams or {}
+    if 'csv' in streams:
+        table.write_csv_header(streams['csv'])
+    if 'html' in streams:
+        bundle = svg.PrintBundle(streams['html'], os.path.basename(
+            os.path.normpath(folder)))
+    count = 0
+    failures = []
+    names = set()
+    for p in profiles:
+        try:
+            with timing.stage('render.model'):
+                model = RenderModel(p)
+            name = unique_name(model.get_name(), names)
+            for f in formats:
+                if f == 'html':
+                    bundle.add(model)
+                elif f in STREAMED_FORMATS:
+                    write_stream(model, f, streams[f])
+                else:
+                    write_file(model, f, os.path.join(folder, name + '.' + f))
+            count += 1
+        except Exception:
+            failures.append(p.get_name())
+    if 'html' in streams:
+        bundle.close()
+    return count, failures
+
+
+def render_entries(profile, formats, link_sheets=False):
+    """Render a character to several formats in memory.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        formats: a list of formats from TEAM_FORMATS.
+        link_sheets: True to link SVG exports to the empty character sheets
+        of the SHEETS_FOLDER, relative to the SVG files, instead of embedding
+        them.
+
+    Returns: a list of (format, content, sheet) tuples, where content is a
+    string and sheet is the path to the linked character sheet, if any. HTML
+    content is a page of a print bundle (see scox.export.svg.PrintBundle).
+    """
+    with timing.stage('render.model'):
+        model = RenderModel(profile)
+    entries = []
+    for f in formats:
+        sheet = None
+        if f == 'svg':
+            path = svg.get_sheet_path(model)
+            if link_sheets:
+                sheet = path
+                background = SHEETS_FOLDER + '/' + os.path.basename(path)
+            else:
+                background = svg.encode_sheet(path)
+            content = svg.render_svg(model, background)
+        elif f == 'html':
+            sheet = svg.get_sheet_path(model)
+            content = svg.render_page(model, sheet)
+        else:
+            buf = io.StringIO()
+            write_stream(model, 'jsonl' if f == 'json' else f, buf)
+            content = buf.getvalue()
+        entries.append((f, content, sheet))
+    return entries
+
+
+def render_in_pool(pool, profiles, formats, write, failures, ahead,
+                   link_sheets=False):
+    """Render characters with a pool of threads and hand their entries, in
+    order, to a function of the calling thread.
+
+    Args:
+        pool: a concurrent.futures.Executor instance.
+        profiles: an iterable of scox.character.Character instances.
+        formats: a list of formats from TEAM_FORMATS.
+        write: a function called with the name of each rendered character and
+        its entries, as returned by render_entries.
+        failures: a dictionary to which the position and name of each
+        character which could not be rendered are added.
+        ahead: maximum number of characters rendered ahead of the written
+        ones.
+        link_sheets: True to link SVG exports to the empty character sheets
+        (see render_entries).
+
+    Returns: the number of characters read from profiles.
+    """
+    pending = collections.deque()
+    count = 0
+
+    def write_next():
+        i, name, future = pending.popleft()
+        try:
+            entries = future.result()
+        except Exception:
+            failures[i] = name
+            return
+        with timing.stage('archive.write'):
+            write(name, entries)
+
+    for p in profiles:
+        pending.append((count, p.get_name(), pool.submit(
+            render_entries, p, formats, link_sheets)))
+        count += 1
+        if len(pending) > ahead:
+            write_next()
+    while len(pending) > 0:
+        write_next()
+    return count
+
+
+def stream_team(profiles, fmt, handle, flush=True):
+    """Write characters to an open file as soon as they are produced.
+
+    Unlike export_team, characters are not held back by any buffering, so
+    that the output can be piped to other tools while a long generation is
+    still running.
+
+    Args:
+        profiles: an iterable of scox.character.Character instances, such as
+        a generator.
+        fmt: a format from STREAMED_FORMATS.
+        handle: open text file with writing access.
+        flush: True to flush the file after each character.
+
+    Returns: the number of written characters.
+    """
+    if fmt == 'csv':
+        table.write_csv_header(handle)
+    elif fmt == 'html':
+        bundle = svg.PrintBundle(handle)
+    count = 0
+    for p in profiles:
+        with timing.stage('render.model'):
+            model = RenderModel(p)
+        if fmt == 'html':
+            bundle.add(model)
+        else:
+            write_stream(model, fmt, handle)
+        if flush:
+            handle.flush()
+        count += 1
+    if fmt == 'html':
+        bundle.close()
+    return count
+
+
+def unique_name(name, names):
+    """Return a name which is not in a set of used names, and add it to the
+    set.
+
+    Args:
+        name: a character name.
+        names: set of the names already used.
+
+    Returns: the name itself if unused, otherwise the name followed by '_2',
+    '_3' and so on.
+    """
+    unique = name
+    n = 1
+    while unique in names:
+        n += 1
+        unique = name + '_' + str(n)
+    names.add(unique)
+    return unique
+
+
+def usable_skills(skill_dict):
+    """Return the usable skills of the input dictionary.
+
+    Args:
+        skill_dict: an ordered dictionary of scox.value.Skill instances.
+
+    Returns: an ordered dictionary.
+    """
+    return collections.OrderedDict(
+        (k, s) for k, s in skill_dict.items() if s.is_usable())
+
+
+def write_file(model, fmt, path):
+    """Write a render model to a new file of the requested format.
+
+    The file is replaced atomically, but not flushed to disk: exports can be
+    generated again.
+
+    Args:
+        model: a RenderModel instance.
+        fmt: a format from CHARACTER_FORMATS.
+        path: path of the file to write.
+    """
+    if fmt == 'svg':
+        svg.export_as_svg(model, path)
+    else:
+        with storage.atomic_write(path, 'w', encoding='utf-8',
+                                  sync=False) as handle:
+            write_stream(model, 'jsonl' if fmt == 'json' else fmt, handle)
+
+
+def write_stream(model, fmt, handle):
+    """Append a render model to an open file of the requested format.
+
+    Args:
+        model: a RenderModel instance.
+        fmt: a format from STREAMED_FORMATS, except HTML (see
+        scox.export.svg.PrintBundle).
+        handle: open text file with writing access.
+    """
+    if fmt == 'txt':
+        txt.export_as_txt(model, handle)
+    elif fmt == 'jsonl':
+        jsonl.export_as_json(model, handle)
+    else:
+        table.export_as_csv(model, handle)
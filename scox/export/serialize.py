@@ -1,18 +1,29 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import scox.storage as storage
+import scox.team as team
+import scox.timing as timing
+
+import os
 import pickle
 
 
-def export_as_pickle(profile, path):
+def export_as_pickle(profile, path, batch=None):
     """Serialize the character as a pickle file.
 
+    The file is replaced atomically: a crash never leaves it half written.
+
     Args:
         profile: an instance of scox.character.Character.
-        path: path to a folder where to write the resulting pickle file.
+        path: path of the resulting pickle file.
+        batch: optional scox.storage.Batch instance, to which the write is
+        added instead of being flushed to disk on its own.
     """
-    with open(path, mode='wb') as f:
-        pickle.dump(profile, f)
+    with timing.stage('serialize.dump'):
+        with (batch.open(path) if batch is not None else
+              storage.atomic_write(path)) as f:
+            pickle.dump(profile, f)
 
 
 def load_from_pickle(filepath):
@@ -23,6 +34,76 @@ def load_from_pickle(filepath):
 
     Returns: a Character instance.
     """
-    with open(filepath, mode='rb') as f:
-        c = pickle.load(f)
-        return c
+    with timing.stage('serialize.load'):
+        with open(filepath, mode='rb') as f:
+            c = pickle.load(f)
+            return c
+
+
+def iter_from_folder(folder, failures=None):
+    """Lazily load every Character instance pickled in the input folder.
+
+    Characters are loaded one at a time, so that a whole team can be processed
+    without being held in memory. The team lock is held in shared mode while
+    the folder is scanned and while each file is read, but not in between, so
+    that writers are not kept waiting for the whole iteration. Files deleted
+    in the meantime are skipped.
+
+    Args:
+        folder: path to a team folder, in any layout (see scox.team).
+        failures: optional list to which the paths of the pickle files which
+        could not be loaded are appended.
+
+    Returns: a generator of Character instances, ordered by file name.
+    """
+    with team.get_lock(folder) as lock:
+        with lock.hold(shared=True):
+            entries = team.scan(folder)
+        for _, e in entries:
+            file_path = e.path
+            try:
+                with lock.hold(shared=True):
+                    c = load_from_pickle(file_path)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                if failures is not None:
+                    failures.append(file_path)
+                continue
+            yield c
+
+
+def load_from_team(folder, name):
+    """Load a character of a team, under the team lock in shared mode.
+
+    Args:
+        folder: path to a team folder.
+        name: name of the character.
+
+    Returns: a Character instance, or None if the team has no such character.
+    """
+    with team.get_lock(folder) as lock, lock.hold(shared=True):
+        try:
+            return load_from_pickle(team.get_character_path(folder, name))
+        except FileNotFoundError:
+            return None
+
+
+def save_to_team(profile, folder, batch=None):
+    """Write a character to its pickle file in a team folder, under the team
+    lock in exclusive mode.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        folder: path to a team folder.
+        batch: optional scox.storage.Batch instance (see export_as_pickle).
+        The lock only covers the writing of the temporary file, the batch
+        being committed later.
+
+    Returns: the path of the pickle file.
+    """
+    path = team.get_character_path(folder, profile.get_name())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with team.get_lock(folder) as lock, lock.hold():
+        export_as_pickle(profile, path, batch)
+    return path
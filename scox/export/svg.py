@@ -1,26 +1,142 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import scox.schema as schema
+import scox.storage as storage
+import scox.timing as timing
+
 import base64
+import functools
+import html
+import io
+import os
 import svgwrite
 
+SHEET_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'sheets')
+SHEET_SIZE = (2479, 3504)
+BUNDLE_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{}</title>
+<style>
+@page {{ size: A4; margin: 0; }}
+body {{ margin: 0; }}
+svg.page {{ display: block; width: 210mm; height: 297mm; }}
+svg.page + svg.page {{ break-before: page; }}
+svg.sheets {{ position: absolute; width: 0; height: 0; }}
+</style>
+</head>
+<body>
+"""
+BUNDLE_TAIL = """</body>
+</html>
+"""
+
+
+class PrintBundle:
+    """Single HTML document holding the SVG sheets of several characters, one
+    per printed page.
+
+    Each empty character sheet is embedded once, in the definitions of a
+    hidden SVG element written before the first page using it, and every page
+    refers to it through a <use> element: the size of the document grows with
+    the number of characters, not with the number of backgrounds. Pages are
+    written as soon as they are added.
+
+    Instance variables:
+    handle -- Open text file with writing access.
+    sheets -- Set of the paths of the sheets already embedded.
+    """
+
+    def __init__(self, handle, title='scox-gen'):
+        """Constructor. Write the head of the document.
+
+        Args:
+            handle: open text file with writing access.
+            title: title of the document, such as the name of the team.
+        """
+        self.handle = handle
+        self.sheets = set()
+        handle.write(BUNDLE_HEAD.format(html.escape(title)))
+
+    def add(self, profile):
+        """Render the character's profile and append it as a new page."""
+        sheet = get_sheet_path(profile)
+        self.write_page(render_page(profile, sheet), sheet)
 
-def export_as_svg(profile, path, sheet):
+    def close(self):
+        """Write the end of the document. The file is not closed."""
+        self.handle.write(BUNDLE_TAIL)
+
+    def write_page(self, page, sheet):
+        """Append a page rendered by render_page, embedding its sheet first if
+        needed.
+
+        Args:
+            page: an SVG element, as a string.
+            sheet: path to the PNG file of the sheet used by the page.
+        """
+        if sheet not in self.sheets:
+            dwg = svgwrite.Drawing(size=SHEET_SIZE, class_='sheets')
+            dwg.defs.add(dwg.image(encode_sheet(sheet), size=SHEET_SIZE,
+                                   id=get_sheet_id(sheet)))
+            self.handle.write(dwg.tostring() + '\n')
+            self.sheets.add(sheet)
+        self.handle.write(page + '\n')
+
+
+def export_as_svg(profile, path, sheet=None):
     """Export the character's profile to a formatted SVG file.
 
+    The file is replaced atomically, but not flushed to disk: exports can be
+    generated again.
+
     Args:
         profile: an instance of scox.character.Character.
         path: path to a folder where to write the resulting SVG file.
         sheet: a PNG file representing the (empty) character sheet to be
-        exported.
+        exported (default: the sheet matching the character's nature).
     """
-    with open(sheet, 'rb') as image_file:
-        encoded_str = 'data:image/png;base64,' + \
-                      base64.b64encode(image_file.read()).decode()
-    fnt_skl = "font-size:40pt;font-family:'Traveling _Typewriter'"
-    dwg = svgwrite.Drawing(path, size=(2479, 3504))
+    if sheet is None:
+        sheet = get_sheet_path(profile)
+    with timing.stage('svg.encode_sheet'):
+        encoded_str = encode_sheet(sheet)
+    with timing.stage('svg.build'):
+        dwg = build_drawing(profile, path, encoded_str)
+    with timing.stage('svg.write'):
+        with storage.atomic_write(path, 'w', encoding='utf-8',
+                                  sync=False) as f:
+            dwg.write(f)
+
+
+def build_drawing(profile, path, background):
+    """Build the SVG drawing of the character's profile.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        path: path of the SVG file the drawing is meant to be saved to.
+        background: the empty character sheet, as a data URI.
+
+    Returns: an svgwrite.Drawing instance.
+    """
+    dwg = svgwrite.Drawing(path, size=SHEET_SIZE)
     # background
-    dwg.add(dwg.image(encoded_str, size=(2479, 3504)))
+    dwg.add(dwg.image(background, size=SHEET_SIZE))
+    draw_character(profile, dwg)
+    return dwg
+
+
+def draw_character(profile, dwg):
+    """Write the whole character's profile on an SVG drawing, above its
+    background.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        dwg: an svgwrite.Drawing instance.
+    """
+    fnt_skl = "font-size:40pt;font-family:'Traveling _Typewriter'"
     # identity info
     dwg.add(dwg.text(profile.get_name(),
                      x=[profile.get_name_coords()[0]],
@@ -43,7 +159,83 @@ def export_as_svg(profile, path, sheet):
     export_exotic_skills_as_svg(profile, dwg)
     # powers
     export_powers_as_svg(profile, dwg)
-    dwg.save()
+
+
+@functools.lru_cache(maxsize=None)
+def encode_sheet(sheet):
+    """Return the input character sheet encoded as a data URI.
+
+    Encoded sheets are cached, so that exporting several characters reads and
+    encodes each sheet only once.
+
+    Args:
+        sheet: path to a PNG file.
+
+    Returns: a string.
+    """
+    with open(sheet, 'rb') as image_file:
+        return 'data:image/png;base64,' + \
+               base64.b64encode(image_file.read()).decode()
+
+
+def get_sheet_id(sheet):
+    """Return the identifier of an empty character sheet in a print bundle.
+
+    Args:
+        sheet: path to a PNG file.
+
+    Returns: a string, such as 'sheet-INS'.
+    """
+    return 'sheet-' + os.path.splitext(os.path.basename(sheet))[0]
+
+
+def get_sheet_path(profile):
+    """Return the path to the empty character sheet matching the nature of the
+    input profile.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a path to a PNG file.
+    """
+    sheet = 'INS.png' if profile.get_nature() == 'Demon' else 'MV.png'
+    return os.path.join(SHEET_PATH, sheet)
+
+
+def render_page(profile, sheet):
+    """Return the page of the character's profile in a print bundle.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        sheet: path to the empty character sheet, embedded elsewhere in the
+        bundle (see PrintBundle).
+
+    Returns: an SVG element, as a string.
+    """
+    with timing.stage('svg.build'):
+        dwg = svgwrite.Drawing(size=('210mm', '297mm'), class_='page',
+                               viewBox='0 0 {} {}'.format(*SHEET_SIZE))
+        dwg.add(dwg.use('#' + get_sheet_id(sheet)))
+        draw_character(profile, dwg)
+    return dwg.tostring()
+
+
+def render_svg(profile, background):
+    """Return the formatted SVG document of the character's profile.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        background: the empty character sheet, as a data URI or as a link to
+        an image file.
+
+    Returns: a string, with the same content as the file written by
+    export_as_svg.
+    """
+    with timing.stage('svg.build'):
+        dwg = build_drawing(profile, profile.get_name() + '.svg', background)
+    buf = io.StringIO()
+    dwg.write(buf)
+    return buf.getvalue()
 
 
 def export_attributes_as_svg(profile, drawing):
@@ -62,6 +254,9 @@ def export_attributes_as_svg(profile, drawing):
 def export_skills_as_svg(profile, drawing):
     """Write the character's skills on an SVG drawing.
 
+    Secondary skills added by profiles, which are not printed on the sheet,
+    are written with their name on the free lines of the exotic skills.
+
     Args:
         profile: an instance of scox.character.Character.
         drawing: a writable SVG drawing.
@@ -70,10 +265,12 @@ def export_skills_as_svg(profile, drawing):
     fnt_sml = "font-size:32pt;font-family:'Traveling _Typewriter'"
     sp_shift = -549
     m_shift = -527
+    n_shift = -807
+    sc = schema.load_schema()
     p_and_s = {}
     p_and_s.update(profile.get_primary_skills())
     p_and_s.update(profile.get_secondary_skills())
-    for s in p_and_s.values():
+    for k, s in p_and_s.items():
         if s.is_usable():
             if s.is_invariant():  # only one possibility : Langues
                 v_list = ''
@@ -85,6 +282,11 @@ def export_skills_as_svg(profile, drawing):
             else:
                 drawing.add(drawing.text(s.get_cli_rank(), x=[s.get_x()],
                                          y=[s.get_y()], style=fnt))
+                if sc.get_entry('secondary_skills', k) is None and\
+                        k in profile.get_secondary_skills():
+                    drawing.add(drawing.text(s.get_name(),
+                                             x=[s.get_x() + n_shift],
+                                             y=[s.get_y()], style=fnt_sml))
                 if s.is_specific():
                     sp = s.get_specialization()
                     drawing.add(
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.export.txt as txt
+import scox.timing as timing
+
+import csv
+
+ATTRIBUTE_COLUMNS = ['Force', 'Agilite', 'Perception', 'Volonte', 'Presence',
+                     'Foi']
+VALUE_COLUMNS = ['PF', 'PP', 'BL', 'BG', 'BF', 'MS']
+CSV_HEADER = (['name', 'nature', 'superior', 'level'] + ATTRIBUTE_COLUMNS +
+              VALUE_COLUMNS + ['skills', 'powers'])
+
+
+def character_as_row(profile):
+    """Convert the character's profile to a CSV row matching CSV_HEADER.
+
+    Skills and powers are formatted as in TXT exports.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a list of strings.
+    """
+    row = [profile.get_name(), profile.get_nature(), profile.get_superior(),
+           str(profile.get_level())]
+    attributes = profile.get_attributes()
+    for a in ATTRIBUTE_COLUMNS:
+        row.append(attributes[a].get_cli_rank().rstrip())
+    values = profile.get_side_values()
+    for v in VALUE_COLUMNS:
+        row.append(values[v].get_cli_rank())
+    row.append(txt.format_skills(profile))
+    row.append(txt.format_powers(profile))
+    return row
+
+
+def export_as_csv(profile, csv_file):
+    """Write the character's profile as a single CSV row.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        csv_file: open text file with writing access.
+    """
+    with timing.stage('csv.export'):
+        csv.writer(csv_file, lineterminator='\n').writerow(
+            character_as_row(profile))
+
+
+def write_csv_header(csv_file):
+    """Write the CSV_HEADER row to the input CSV file.
+
+    Args:
+        csv_file: open text file with writing access.
+    """
+    csv.writer(csv_file, lineterminator='\n').writerow(CSV_HEADER)
@@ -1,6 +1,8 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import scox.timing as timing
+
 
 def export_as_txt(profile, txt_file):
     """Export the character's profile to a formatted TXT file.
@@ -9,23 +11,22 @@ def export_as_txt(profile, txt_file):
         profile: an instance of scox.character.Character.
         txt_file: open TXT file with writing access.
     """
-    # identity info
-    txt_file.write(profile.get_name() + " - Grade " +
-                   str(profile.get_level()) + " - " +
-                   profile.get_superior() + "\n")
-    # attributes
-    txt_file.write("Attributs : ")
-    export_attributes_as_txt(profile, txt_file)
-    # side values
-    txt_file.write("Valeurs annexes : ")
-    export_values_as_txt(profile, txt_file)
-    # skills
-    txt_file.write("Talents : ")
-    export_skills_as_txt(profile, txt_file)
-    # powers
-    txt_file.write("Pouvoirs : ")
-    export_powers_as_txt(profile, txt_file)
-    txt_file.write("\n")
+    with timing.stage('txt.export'):
+        # identity info
+        txt_file.write(format_identity(profile) + "\n")
+        # attributes
+        txt_file.write("Attributs : ")
+        export_attributes_as_txt(profile, txt_file)
+        # side values
+        txt_file.write("Valeurs annexes : ")
+        export_values_as_txt(profile, txt_file)
+        # skills
+        txt_file.write("Talents : ")
+        export_skills_as_txt(profile, txt_file)
+        # powers
+        txt_file.write("Pouvoirs : ")
+        export_powers_as_txt(profile, txt_file)
+        txt_file.write("\n")
 
 
 def export_attributes_as_txt(profile, txt_file):
@@ -35,10 +36,7 @@ def export_attributes_as_txt(profile, txt_file):
         profile: an instance of scox.character.Character.
         txt_file: open TXT file with writing access.
     """
-    attrs = ""
-    for a in profile.get_attributes().values():
-        attrs += a.get_name() + " " + a.get_cli_rank().rstrip() + ", "
-    txt_file.write(attrs.rstrip(', ') + "\n")
+    txt_file.write(format_attributes(profile) + "\n")
 
 
 def export_powers_as_txt(profile, txt_file):
@@ -48,21 +46,79 @@ def export_powers_as_txt(profile, txt_file):
         profile: an instance of scox.character.Character.
         txt_file: open TXT file with writing access.
     """
+    txt_file.write(format_powers(profile) + "\n")
+
+
+def export_skills_as_txt(profile, txt_file):
+    """Write the input profile's skills to the input TXT file.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        txt_file: open TXT file with writing access.
+    """
+    txt_file.write(format_skills(profile) + "\n")
+
+
+def export_values_as_txt(profile, txt_file):
+    """Write the input profile's values to the input TXT file.
+
+    Args:
+        profile: an instance of scox.character.Character.
+        txt_file: open TXT file with writing access.
+    """
+    txt_file.write(format_values(profile) + "\n")
+
+
+def format_identity(profile):
+    """Return the name, level and superior of the input profile as a string.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a string.
+    """
+    return (profile.get_name() + " - Grade " + str(profile.get_level()) +
+            " - " + profile.get_superior())
+
+
+def format_attributes(profile):
+    """Return the input profile's attributes as a string.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a string.
+    """
+    attrs = ""
+    for a in profile.get_attributes().values():
+        attrs += a.get_name() + " " + a.get_cli_rank().rstrip() + ", "
+    return attrs.rstrip(', ')
+
+
+def format_powers(profile):
+    """Return the input profile's powers as a string.
+
+    Args:
+        profile: an instance of scox.character.Character.
+
+    Returns: a string.
+    """
     pows = ""
     for p in profile.get_powers().values():
         pows += p.get_name()
         if not p.is_invariant():
             pows += (" " + p.get_cli_rank()).rstrip()
         pows += ", "
-    txt_file.write(pows.rstrip(', ') + "\n")
+    return pows.rstrip(', ')
 
 
-def export_skills_as_txt(profile, txt_file):
-    """Write the input profile's skills to the input TXT file.
+def format_skills(profile):
+    """Return the input profile's usable skills as a string.
 
     Args:
         profile: an instance of scox.character.Character.
-        txt_file: open TXT file with writing access.
+
+    Returns: a string.
     """
     skills = ""
     skill_dict = {}
@@ -72,21 +128,21 @@ def export_skills_as_txt(profile, txt_file):
     for s in skill_dict.values():
         if s.is_usable():
             skills += s.get_pretty_string() + ", "
-    txt_file.write(skills.rstrip(", ") + "\n")
+    return skills.rstrip(", ")
 
 
-def export_values_as_txt(profile, txt_file):
-    """Write the input profile's values to the input TXT file.
+def format_values(profile):
+    """Return the input profile's side values as a string.
 
     Args:
         profile: an instance of scox.character.Character.
-        txt_file: open TXT file with writing access.
+
+    Returns: a string.
     """
-    vals = ""
-    vals += (profile.get_side_values()['PP'].get_cli_rank() + " PP, " +
-             profile.get_side_values()['PF'].get_cli_rank() + " PF, " +
-             "BL " + profile.get_side_values()['BL'].get_cli_rank() +
-             " / BG " + profile.get_side_values()['BG'].get_cli_rank() +
-             " / BF " + profile.get_side_values()['BF'].get_cli_rank() +
-             " / MS " + profile.get_side_values()['MS'].get_cli_rank() + "\n")
-    txt_file.write(vals)
+    values = profile.get_side_values()
+    return (values['PP'].get_cli_rank() + " PP, " +
+            values['PF'].get_cli_rank() + " PF, " +
+            "BL " + values['BL'].get_cli_rank() +
+            " / BG " + values['BG'].get_cli_rank() +
+            " / BF " + values['BF'].get_cli_rank() +
+            " / MS " + values['MS'].get_cli_rank())
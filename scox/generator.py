@@ -0,0 +1,194 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.character as chc
+import scox.export.cli as cli
+import scox.export.jsonl as jsonl
+import scox.export.svg as svg
+import scox.export.txt as txt
+import scox.profile as profile
+
+import io
+import json
+import os
+import random
+import threading
+
+RENDER_FORMATS = ['json', 'txt', 'cli', 'svg']
+
+
+class Generator:
+    """Character generator, usable without the command line.
+
+    A generator resolves profile names through the catalog, keeps the profile
+    archives and character sheets it used in memory, and draws powers from its
+    own random number generator. It can be reused across calls and shared
+    between threads: each character draws its powers from a dedicated random
+    number generator, seeded from the generator's one under a lock.
+
+    Instance variables:
+    defaults -- Default nature, superior and archetype of new characters.
+    lock -- Lock protecting the random number generator and the caches.
+    paths -- Map of (category, profile name) tuples to profile archives.
+    rng -- A random.Random instance.
+    """
+
+    def __init__(self, seed=None, nature='demon', superior='Scox',
+                 archetype='Corrupteur'):
+        """Constructor.
+
+        Keyword arguments:
+        seed -- Seed of the random number generator (default: None, seeded
+            from the system).
+        nature -- Default nature of new characters (default 'demon').
+        superior -- Default superior of new characters (default 'Scox').
+        archetype -- Default archetype of new characters (default
+            'Corrupteur').
+        """
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.paths = {}
+        self.defaults = {'nature': nature, 'superior': superior,
+                         'archetype': archetype}
+
+    def generate(self, name, nature=None, superior=None, archetype=None,
+                 level=0):
+        """Generate a new character.
+
+        Arguments:
+        name -- Name of the new character.
+
+        Keyword arguments:
+        nature -- Nature of the new character, 'angel' or 'demon' (default:
+            the generator's default nature).
+        superior -- Name of the superior of the new character (default: the
+            generator's default superior).
+        archetype -- Name of the archetype of the new character (default: the
+            generator's default archetype).
+        level -- Level of the new character (default 0).
+
+        Returns: a scox.character.Character instance.
+
+        Raises:
+        ValueError -- If the nature, superior or archetype is unknown.
+        """
+        nature = nature or self.defaults['nature']
+        if nature not in ('angel', 'demon'):
+            raise ValueError("Unknown nature: " + str(nature) + ".")
+        superior = self.get_profile_path(
+            nature, superior or self.defaults['superior'])
+        archetype = self.get_profile_path(
+            'arch', archetype or self.defaults['archetype'])
+        with self.lock:
+            seed = self.rng.getrandbits(64)
+        return chc.Character(name, nature, archetype, superior, level,
+                             random.Random(seed))
+
+    def generate_many(self, count, prefix='PNJ', nature=None, superior=None,
+                      archetype=None):
+        """Generate characters lazily.
+
+        Unlike generate, a nature, superior or archetype left to None is drawn
+        at random for each character.
+
+        Arguments:
+        count -- Number of characters to generate (None for an endless
+            stream).
+
+        Keyword arguments:
+        prefix -- Prefix of the characters' names, which are numbered from 1
+            (default 'PNJ').
+        nature -- Nature of the new characters (default: random).
+        superior -- Superior of the new characters (default: random).
+        archetype -- Archetype of the new characters (default: random).
+
+        Returns: a generator of scox.character.Character instances.
+        """
+        i = 0
+        while count is None or i < count:
+            i += 1
+            with self.lock:
+                n = nature or self.rng.choice(['angel', 'demon'])
+                s = superior or self.rng.choice(
+                    catalog.get_profile_list(n))
+                a = archetype or self.rng.choice(
+                    catalog.get_profile_list('arch'))
+            yield self.generate(prefix + ' ' + str(i), n, s, a)
+
+    def get_profile_path(self, category, name):
+        """Return the path to a profile archive, checked against the catalog.
+
+        Arguments:
+        category -- A string value in 'angel', 'demon' or 'arch'.
+        name -- Name of the profile.
+
+        Returns: a path to a profile archive.
+        """
+        key = (category, name)
+        path = self.paths.get(key)
+        if path is None:
+            path = catalog.get_profile_path(category, name)
+            with self.lock:
+                self.paths[key] = path
+        return path
+
+    def render(self, character, fmt='json'):
+        """Render a character as a string.
+
+        Arguments:
+        character -- An instance of scox.character.Character.
+
+        Keyword arguments:
+        fmt -- A format in RENDER_FORMATS (default 'json').
+
+        Returns: a string.
+        """
+        if fmt == 'json':
+            return json.dumps(jsonl.character_as_dict(character),
+                              ensure_ascii=False)
+        elif fmt == 'txt':
+            out = io.StringIO()
+            txt.export_as_txt(character, out)
+            return out.getvalue()
+        elif fmt == 'cli':
+            return cli.render_cli(character)
+        elif fmt == 'svg':
+            sheet = svg.encode_sheet(svg.get_sheet_path(character))
+            return svg.build_drawing(character, None, sheet).tostring()
+        else:
+            raise ValueError("Unknown format: " + str(fmt) + ".")
+
+    def render_many(self, count, fmt='json', prefix='PNJ', nature=None,
+                    superior=None, archetype=None):
+        """Generate and render characters lazily.
+
+        Each character is rendered as soon as it is generated and then
+        dropped, so that runs of any length use constant memory. In the 'json'
+        format, each string is one line of JSON Lines output, without its
+        trailing newline.
+
+        Arguments:
+        count -- Number of characters to generate (None for an endless
+            stream).
+
+        Keyword arguments:
+        fmt -- A format in RENDER_FORMATS (default 'json').
+        prefix -- Prefix of the characters' names (default 'PNJ').
+        nature -- Nature of the new characters (default: random).
+        superior -- Superior of the new characters (default: random).
+        archetype -- Archetype of the new characters (default: random).
+
+        Returns: a generator of strings.
+        """
+        for c in self.generate_many(count, prefix, nature, superior,
+                                    archetype):
+            yield self.render(c, fmt)
+
+    def warm_up(self):
+        """Load every profile archive and character sheet into the caches."""
+        for category in catalog.CATEGORIES:
+            for p in catalog.get_profile_list(category):
+                profile.read_profile(self.get_profile_path(category, p))
+        for sheet in ['INS.png', 'MV.png']:
+            svg.encode_sheet(os.path.join(svg.SHEET_PATH, sheet))
@@ -0,0 +1,332 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.character as chc
+import scox.export.serialize as srl
+import scox.export.table as table
+import scox.query as query
+import scox.schema as schema
+import scox.storage as storage
+
+import csv
+import functools
+import json
+import re
+
+IMPORT_FORMATS = ['jsonl', 'csv']
+# longest specialization or variety name accepted
+MAX_NAME_LENGTH = 100
+SPECIFIC = re.compile(r'^(.+?) (\d+\+?) \((.*) (\d+\+?)\)$')
+MULTIPLE = re.compile(r'^(.+?) \((.*)\)(?: (\d+\+?))?$')
+RANKED = re.compile(r'^(.+) (\d+\+?)$')
+
+
+def character_from_dict(data):
+    """Rebuild a character from a JSON Lines record.
+
+    Records follow the format of scox.export.jsonl.character_as_dict. Invested
+    ranks are restored, and full ranks, when given, are checked against the
+    base ranks recomputed from the attributes.
+
+    Arguments:
+    data -- A dictionary, as parsed from one line of JSON.
+
+    Returns: a scox.character.Character instance.
+
+    Raises:
+    ValueError -- If the record does not describe a valid character.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("not a JSON object.")
+    c = new_character(data.get('name'), data.get('nature'),
+                      data.get('superior'), data.get('level', 0))
+    ranks = []
+    for k, d in get_section(data, 'attributes').items():
+        ranks.append((get_value(c.attributes, 'attribute', k), d))
+    for k, d in get_section(data, 'values').items():
+        ranks.append((get_value(c.values, 'side value', k), d))
+    for section in schema.SKILL_SECTIONS:
+        skills = getattr(c, section)
+        for k, d in get_section(data, section).items():
+            sk = get_value(skills, 'skill', k)
+            ranks.append((sk, d))
+            if 'specialization' in d:
+                if not sk.is_specific():
+                    raise ValueError(k + ": not a specific skill.")
+                spe = d['specialization']
+                sk.specialization.set_name(check_name(k, spe.get('name')))
+                ranks.append((sk.specialization, spe))
+            if 'varieties' in d:
+                if not sk.is_multiple():
+                    raise ValueError(k + ": not a multiple skill.")
+                if not isinstance(d['varieties'], list):
+                    raise ValueError(k + ": varieties are not a list.")
+                sk.varieties = [check_name(k, v) for v in d['varieties']]
+    for k, d in get_section(data, 'powers').items():
+        rank = int(d.get('rank', 0))
+        full = int(d.get('full_rank', rank))
+        c.add_power(str(k), str(d.get('cost', '')), base_rank=full - rank,
+                    invariant=bool(d.get('invariant', False))).rank = rank
+    for v, d in ranks:
+        v.rank = int(d.get('rank', 0))
+    c.update_values()
+    check_ranks(c)
+    for v, d in ranks:
+        if 'full_rank' in d and int(d['full_rank']) != v.get_full_rank():
+            raise ValueError(getattr(v, 'name', 'value') + ": full rank " +
+                             str(d['full_rank']) + " does not match rank " +
+                             str(v.rank) + " and base rank " +
+                             str(v.base_rank) + ".")
+    return c
+
+
+def character_from_row(row):
+    """Rebuild a character from a CSV row.
+
+    Rows follow scox.export.table.CSV_HEADER, with ranks as displayed. Skills
+    and powers are parsed from their TXT formatting; power costs are not part
+    of CSV exports and are left empty.
+
+    Arguments:
+    row -- A dictionary mapping the columns of CSV_HEADER to strings.
+
+    Returns: a scox.character.Character instance.
+
+    Raises:
+    ValueError -- If the row does not describe a valid character.
+    """
+    c = new_character(row.get('name'), row.get('nature'),
+                      row.get('superior'), row.get('level') or 0)
+    for k in table.ATTRIBUTE_COLUMNS:
+        a = c.attributes[k]
+        a.rank = parse_rank(row.get(k), a.base_rank, k)
+    c.update_values()
+    names = get_skill_names()
+    for item in split_list(row.get('skills') or ''):
+        spe = SPECIFIC.match(item)
+        mult = None if spe else MULTIPLE.match(item)
+        ranked = None if spe or mult else RANKED.match(item)
+        m = spe or mult or ranked
+        if m is None or m.group(1) not in names:
+            raise ValueError("unknown skill: " + item + ".")
+        section, k = names[m.group(1)]
+        sk = getattr(c, section)[k]
+        if spe is not None:
+            if not sk.is_specific():
+                raise ValueError(k + ": not a specific skill.")
+            sk.rank = parse_rank(spe.group(2), sk.base_rank, k)
+            sk.specialization.set_name(check_name(k, spe.group(3)))
+            sk.specialization.rank = parse_rank(
+                spe.group(4), sk.specialization.base_rank, k)
+        elif mult is not None:
+            if not sk.is_multiple():
+                raise ValueError(k + ": not a multiple skill.")
+            sk.varieties = [check_name(k, v)
+                            for v in split_list(mult.group(2))]
+            if mult.group(3) is not None:
+                sk.rank = parse_rank(mult.group(3), sk.base_rank, k)
+        else:
+            sk.rank = parse_rank(ranked.group(2), sk.base_rank, k)
+    for item in split_list(row.get('powers') or ''):
+        m = RANKED.match(item)
+        if m is None:
+            c.add_power(item, '', invariant=True)
+        else:
+            c.add_power(m.group(1), '',
+                        base_rank=parse_rank(m.group(2), 0, m.group(1)))
+    for k in table.VALUE_COLUMNS:
+        v = c.values[k]
+        v.rank = parse_rank(row.get(k), v.base_rank, k, scale=1)
+    check_ranks(c)
+    return c
+
+
+def check_name(k, name):
+    """Check a specialization or variety name of an imported skill.
+
+    Arguments:
+    k -- Key of the skill, for error messages.
+    name -- The imported name.
+
+    Returns: the name.
+
+    Raises:
+    ValueError -- If the name is not a non-empty string of at most
+        MAX_NAME_LENGTH characters.
+    """
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(k + ": invalid name " + repr(name) + ".")
+    if len(name) > MAX_NAME_LENGTH:
+        raise ValueError(k + ": name longer than " + str(MAX_NAME_LENGTH) +
+                         " characters.")
+    return name
+
+
+def check_ranks(character):
+    """Check that the full ranks of a character are within 0 and
+    scox.query.MAX_RANK.
+
+    Raises:
+    ValueError -- If a full rank is out of range.
+    """
+    for k, v, _ in query.iter_ranks(character):
+        values = [v]
+        if getattr(v, 'specialization', None) is not None:
+            values.append(v.specialization)
+        for v in values:
+            if not 0 <= v.get_full_rank() <= query.MAX_RANK:
+                raise ValueError(k + ": full rank " + str(v.get_full_rank()) +
+                                 " out of range (0 to " +
+                                 str(query.MAX_RANK) + ").")
+
+
+def get_section(data, section):
+    """Return a section of a JSON record, checked to be a dictionary of
+    dictionaries."""
+    d = data.get(section) or {}
+    if not isinstance(d, dict) or\
+            not all(isinstance(v, dict) for v in d.values()):
+        raise ValueError(section + ": not a JSON object of objects.")
+    return d
+
+
+@functools.lru_cache(maxsize=None)
+def get_skill_names():
+    """Map the displayed names of the skills of the schema to (section, key)
+    tuples."""
+    return {e.name: (s, e.key) for s in schema.SKILL_SECTIONS
+            for e in schema.load_schema().sections[s]}
+
+
+def get_value(values, kind, k):
+    """Return a value of a character, rejecting keys unknown to the schema.
+
+    Arguments:
+    values -- Dictionary of values of the character.
+    kind -- Kind of the values, for error messages.
+    k -- Key of the value.
+    """
+    if k not in values:
+        raise ValueError("unknown " + kind + ": " + str(k) + ".")
+    return values[k]
+
+
+def import_team(handle, fmt, folder, rejects=None, sync=True):
+    """Import characters from a JSONL or CSV stream into a team.
+
+    Records are read, validated and turned into characters one at a time, and
+    written to the team through a single batch: the characters only replace
+    existing files of the same name once the whole stream has been read.
+
+    Arguments:
+    handle -- Open text file with reading access.
+    fmt -- A format from IMPORT_FORMATS.
+    folder -- Path to the team folder.
+
+    Keyword arguments:
+    rejects -- Optional list to which a (line number, message) tuple is
+        appended for each rejected record.
+    sync -- False to skip flushing the imported files to disk (default True).
+
+    Returns: the number of imported characters.
+    """
+    count = 0
+    with storage.Batch(size=None, sync=sync) as batch:
+        for n, record in iter_records(handle, fmt):
+            try:
+                if fmt == 'jsonl':
+                    c = character_from_dict(json.loads(record))
+                else:
+                    c = character_from_row(record)
+            except (ValueError, TypeError, AttributeError) as e:
+                if rejects is not None:
+                    rejects.append((n, str(e)))
+                continue
+            srl.save_to_team(c, folder, batch)
+            count += 1
+    return count
+
+
+def iter_records(handle, fmt):
+    """Yield the (line number, record) tuples of a JSONL or CSV stream.
+
+    JSONL records are the raw lines, blank lines being skipped; CSV records
+    are dictionaries mapping the columns of the header row to strings.
+
+    Raises:
+    ValueError -- If the format is unknown or the CSV header lacks columns of
+        scox.export.table.CSV_HEADER.
+    """
+    if fmt == 'jsonl':
+        for n, line in enumerate(handle, 1):
+            if line.strip():
+                yield n, line
+    elif fmt == 'csv':
+        reader = csv.DictReader(handle)
+        missing = [k for k in table.CSV_HEADER
+                   if k not in (reader.fieldnames or [])]
+        if len(missing) > 0:
+            raise ValueError("Missing CSV columns: " + ", ".join(missing) +
+                             ".")
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        raise ValueError("Unknown import format: " + str(fmt) + ".")
+
+
+def new_character(name, nature, superior, level):
+    """Create a blank character from checked identity fields.
+
+    The superior must be a profile of the catalog for the nature of the
+    character, matched as by scox.catalog.find_profile; its catalog title is
+    kept, as for generated characters.
+    """
+    if not isinstance(name, str) or not name.strip() or\
+            name.startswith('.') or re.search(r'[/\\\0]', name):
+        raise ValueError("invalid character name: " + repr(name) + ".")
+    if not isinstance(nature, str) or\
+            nature.capitalize() not in schema.NATURES:
+        raise ValueError("unknown nature: " + repr(nature) + ".")
+    if not isinstance(superior, str) or not superior.strip():
+        raise ValueError("invalid superior: " + repr(superior) + ".")
+    entry = catalog.find_profile(nature.lower(), superior)
+    c = chc.new_blank(name, nature, int(level))
+    c.superior = entry['title']
+    return c
+
+
+def parse_rank(rank, base_rank, k, scale=2):
+    """Convert a displayed rank to an invested rank.
+
+    Arguments:
+    rank -- A displayed rank, such as '3+'.
+    base_rank -- Base rank of the value.
+    k -- Key of the value, for error messages.
+
+    Keyword arguments:
+    scale -- Ratio between full and displayed ranks (default 2).
+
+    Returns: an integer.
+    """
+    try:
+        return query.parse_rank(rank or '', scale) - base_rank
+    except ValueError:
+        raise ValueError(k + ": invalid rank " + repr(rank) + ".")
+
+
+def split_list(text):
+    """Split a comma-separated list, ignoring commas within parentheses."""
+    items = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            items.append(text[start:i].strip())
+            start = i + 1
+    items.append(text[start:].strip())
+    return [i for i in items if i]
@@ -1,16 +1,24 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import scox.catalog as catalog
+import scox.schema as schema
+import scox.timing as timing
 import scox.value as value
 
+import pickle
 import zipfile
 import csv
 import io
 import warnings
 import collections
+import functools
 import os
 import random
 
+COMPILED_PATH = os.path.join(catalog.PROFILE_PATH, 'compiled')
+COMPILED_VERSION = 1
+
 
 class Profile:
     """Base class for representing a character's numerical values.
@@ -20,6 +28,7 @@ class Profile:
     of quick character creation.
 
     Instance variables:
+    archetype -- Archetype of the character.
     attributes -- Map of profile defining attributes.
     powers -- Map of profile defining powers.
     primary_skills -- Map of profile's defining skills.
@@ -44,22 +53,100 @@ class Profile:
         self.exotic_skills = collections.OrderedDict()
         self.nature = nature
         self.superior = None
+        self.archetype = None
         self.power_table = None
 
-    def draw_from_table(self, iterations):
+    def add_power(self, key, cost, base_rank=0, invariant=False):
+        """Create a power, drawn below the previous ones on the character
+        sheet.
+
+        Arguments:
+        key -- Key and name of the new power.
+        cost -- Cost for activating the power.
+
+        Keyword arguments:
+        base_rank -- Base rank of the new power (default 0).
+        invariant -- True if the new power has no rank (default False).
+
+        Returns: the new scox.value.Power instance.
+        """
+        x, y = [2135, 1357] if self.nature == 'Demon' else [939, 2628]
+        pw = value.Power(key, cost, [x, y + len(self.powers) * 72],
+                         base_rank=base_rank, invariant=invariant)
+        self.powers[key] = pw
+        return pw
+
+    def add_secondary_skill(self, key):
+        """Create a secondary skill unknown to the schema.
+
+        The skill is acquired, has no governing attribute, and is drawn on the
+        first free slot of the character sheet.
+
+        Arguments:
+        key -- Key and name of the new skill.
+
+        Returns: the new scox.value.Skill instance.
+        """
+        sc = schema.load_schema()
+        added = sum(1 for k in self.secondary_skills
+                    if sc.get_entry('secondary_skills', k) is None)
+        sk = value.Skill(key, sc.get_free_slot(self.nature, added),
+                         acquired=True)
+        self.secondary_skills[key] = sk
+        return sk
+
+    def apply_delta(self, delta):
+        """Apply a merged superior and archetype profile.
+
+        The ranks stored in the delta replace the current ranks, so the delta
+        must be applied to freshly initialized values.
+
+        Arguments:
+        delta -- A ProfileDelta instance.
+        """
+        self.superior = delta.superior
+        self.archetype = delta.archetype
+        self.power_table = delta.power_table
+        for k, r in delta.attributes:
+            self.attributes[k].rank = r
+        for k, r in delta.values:
+            self.values[k].rank = r
+        for skills, changes in [(self.primary_skills, delta.primary_skills),
+                                (self.secondary_skills,
+                                 delta.secondary_skills),
+                                (self.exotic_skills, delta.exotic_skills)]:
+            for k, r, spe, varieties in changes:
+                sk = skills.get(k)
+                if sk is None:  # skill created by a profile
+                    sk = self.add_secondary_skill(k)
+                sk.rank = r
+                if spe is not None:
+                    sk.specialization.rank = spe
+                if varieties is not None:
+                    sk.varieties = list(varieties)
+        for k, cost, coords, base_rank, invariant in delta.powers:
+            self.powers[k] = value.Power(k, cost, coords,
+                                         base_rank=base_rank,
+                                         invariant=invariant)
+
+    def draw_from_table(self, iterations, rng=None):
         """Draw random elements from the profile power table and apply the
         results.
 
         Arguments:
         iterations -- Number of successes required before ending the draws.
+
+        Keyword arguments:
+        rng -- A random.Random instance used for the draws (default: the
+            random module).
         """
+        if rng is None:
+            rng = random
         if self.power_table is not None:
             it = 0
-            coords = [2135, 1357] if self.nature == 'Demon' else [939, 2628]
-            shift = 72
             keys = [k for k in self.power_table.keys()]
             while it < iterations:
-                roll = self.power_table[random.choice(keys)]
+                roll = self.power_table[rng.choice(keys)]
                 reroll = False
                 for i in roll[0].keys():
                     if i in self.powers:
@@ -72,19 +159,9 @@ class Profile:
                     for k in roll[0].keys():
                         p = roll[0][k]
                         if p[0] == 'True':
-                            self.powers[k] = value.Power(
-                                k,
-                                p[2],
-                                [coords[0], coords[1] +
-                                 len(self.powers) * shift],
-                                invariant=True)
+                            self.add_power(k, p[2], invariant=True)
                         else:
-                            self.powers[k] = value.Power(
-                                k,
-                                p[2],
-                                [coords[0], coords[1] +
-                                 len(self.powers) * shift],
-                                base_rank=2 * int(p[1]))
+                            self.add_power(k, p[2], base_rank=2 * int(p[1]))
                     it += 1  # current iteration is successful
                 else:
                     break  # exit current iteration
@@ -96,29 +173,18 @@ class Profile:
         """Generate a table from which random powers can be drawn.
 
         Arguments:
-        table -- CSV file containing information for building the table.
+        table -- Entries of the power table, as returned by read_power_table.
         """
         self.power_table = {}
-        reader = csv.DictReader(io.TextIOWrapper(table), delimiter=';')
-        for row in reader:
-            val = row['value'].strip('[]').split(',')
-            powers = {}  # building powers dictionary
-            power_items = row['powers'].strip('{}').split('|')
-            for item in power_items:
-                k, v = item.split(':')
-                powers[k.strip('"')] = v.strip('[]').replace('"', '').split(',')
-            pp = int(row['pp'])
-            bonus = {}  # building bonus dictionary
-            bonus_str = row['bonus'].strip('{}')
-            if len(bonus_str) > 0:
-                bonus_items = bonus_str.split(',')
-                for item in bonus_items:
-                    k, v = item.split(':')
-                    bonus[k] = int(v)
+        for val, powers, pp, bonus in table:
             if self.superior.title() in bonus.keys():
                 pp = bonus[self.superior.title()]
             for i in val:
-                self.power_table[int(i)] = [powers, pp]
+                self.power_table[i] = [powers, pp]
+
+    def get_archetype(self):
+        """Return the profile's archetype, if known."""
+        return getattr(self, 'archetype', None)
 
     def get_nature(self):
         """Return the profile's nature."""
@@ -136,37 +202,35 @@ class Profile:
         archetype -- True if the loaded profile is an archetype (default:
         False).
         """
-        with zipfile.ZipFile(profile) as p:
-            with p.open('attributes.csv') as attr:
-                self.load_attributes(attr)
-            with p.open('values.csv') as val:
-                self.load_side_values(val)
-            with p.open('primary_skills.csv') as p_skills:
-                self.load_primary_skills(p_skills)
-            with p.open('secondary_skills.csv') as s_skills:
-                self.load_secondary_skills(s_skills)
-            with p.open('exotic_skills.csv') as e_skills:
-                self.load_exotic_skills(e_skills)
-            with p.open('powers.csv') as powers:
-                self.load_powers(powers)
-            if archetype and self.nature.upper() == 'DEMON':
-                with p.open('table_demon.csv') as table:
-                    self.generate_power_table(table)
-            elif archetype and self.nature.upper() == 'ANGEL':
-                with p.open('table_angel.csv') as table:
-                    self.generate_power_table(table)
-            else:
-                self.superior =\
-                    profile.split(os.path.sep)[-1].split('.')[0].title()
+        table = None
+        if archetype and self.nature.upper() == 'DEMON':
+            table = 'table_demon.csv'
+        elif archetype and self.nature.upper() == 'ANGEL':
+            table = 'table_angel.csv'
+        data = read_profile(profile)
+        with timing.stage('profile.apply'):
+            self.load_attributes(data['attributes.csv'])
+            self.load_side_values(data['values.csv'])
+            self.load_primary_skills(data['primary_skills.csv'])
+            self.load_secondary_skills(data['secondary_skills.csv'])
+            self.load_exotic_skills(data['exotic_skills.csv'])
+            self.load_powers(data['powers.csv'])
+        name = profile.split(os.path.sep)[-1].split('.')[0].title()
+        if table is not None:
+            self.archetype = name
+            with timing.stage('profile.power_table'):
+                self.generate_power_table(read_power_table(profile, table))
+        else:
+            self.superior = name
 
     def load_attributes(self, attr):
         """Load attributes from the input attribute file.
 
         Arguments:
-        attr -- CSV file containing attributes.
+        attr -- Rows of the CSV file containing attributes, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(attr))
-        for row in reader:
+        for row in attr:
             if row['Name'] in self.attributes:
                 self.attributes[row['Name']].increase_rank(int(row['Rank']))
             else:
@@ -176,10 +240,10 @@ class Profile:
         """Load primary skills from the input skill file.
 
         Arguments:
-        p_skills -- CSV file containing skills.
+        p_skills -- Rows of the CSV file containing skills, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(p_skills))
-        for row in reader:
+        for row in p_skills:
             #  case where skill exists
             if row['Name'] in self.primary_skills:
                 self.primary_skills[row['Name']].increase_rank(int(row['Rank']))
@@ -196,10 +260,10 @@ class Profile:
         """Load secondary skills from the input skill file.
 
         Arguments:
-        s_skills -- CSV file containing skills.
+        s_skills -- Rows of the CSV file containing skills, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(s_skills))
-        for row in reader:
+        for row in s_skills:
             #  case where skill exists
             if row['Name'] in self.secondary_skills:
                 self.secondary_skills[row['Name']].increase_rank(
@@ -219,48 +283,33 @@ class Profile:
                                   Warning)
             # case where skill does not exist - it is created
             else:
-                if not row['Name'] in self.secondary_skills:
-                    self.secondary_skills[row['Name']] = value.Skill(
-                        row['Name'],
-                        [0, 0],  # FIXME: which coordinates for this skill?
-                        acquired=True)
-                self.secondary_skills[row['Name']].increase_rank(
+                self.add_secondary_skill(row['Name']).increase_rank(
                     int(row['Rank']))
 
     def load_powers(self, powers):
         """Load powers from the input power file.
 
         Arguments:
-        powers -- CSV file containing powers.
+        powers -- Rows of the CSV file containing powers, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(powers))
-        coords = [2135, 1357] if self.nature == 'Demon' else [939, 2628]
-        shift = 72
-        for row in reader:
+        for row in powers:
             if row['Name'] in self.powers:
                 raise KeyError("Power " + row['Name'] + " already exists.")
+            elif row['Invariant'] == 'True':
+                self.add_power(row['Name'], row['Cost'], invariant=True)
             else:
-                if row['Invariant'] == 'True':
-                    self.powers[row['Name']] = value.Power(
-                        row['Name'],
-                        row['Cost'],
-                        [coords[0], coords[1] + len(self.powers) * shift],
-                        invariant=True)
-                else:
-                    self.powers[row['Name']] = value.Power(
-                        row['Name'],
-                        row['Cost'],
-                        [coords[0], coords[1] + len(self.powers) * shift],
-                        base_rank=2 * int(row['Rank']))
+                self.add_power(row['Name'], row['Cost'],
+                               base_rank=2 * int(row['Rank']))
 
     def load_exotic_skills(self, e_skills):
         """Load exotic skills from the input skill file.
 
         Arguments:
-        e_skills -- CSV file containing skills.
+        e_skills -- Rows of the CSV file containing skills, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(e_skills))
-        for row in reader:
+        for row in e_skills:
             if row['Name'] in self.exotic_skills:
                 self.exotic_skills[row['Name']].increase_rank(int(row['Rank']))
             else:
@@ -270,11 +319,204 @@ class Profile:
         """Load side values from the input value file.
 
         Arguments:
-        values -- CSV file containing side values.
+        values -- Rows of the CSV file containing side values, as
+            dictionaries.
         """
-        reader = csv.DictReader(io.TextIOWrapper(values))
-        for row in reader:
+        for row in values:
             if row['Name'] in self.values:
                 self.values[row['Name']].set_rank(int(row['Rank']))
             else:
                 raise KeyError("Value " + row['Name'] + " not found.")
+
+
+class ProfileDelta:
+    """Merged superior and archetype profile, ready to be applied.
+
+    A delta holds the ranks which result from loading a superior profile then
+    an archetype profile on freshly initialized values, so that characters of
+    the same combination can be built without loading any profile. Only the
+    values changed by the profiles are listed. Deltas are shared and must not
+    be modified.
+
+    Instance variables:
+    archetype -- Name of the archetype.
+    attributes -- List of (key, rank) tuples.
+    exotic_skills -- List of (key, rank, specialization rank, varieties)
+        tuples.
+    power_table -- Power table of the archetype, for the superior.
+    powers -- List of (key, cost, coordinates, base rank, invariant) tuples.
+    primary_skills -- List of (key, rank, specialization rank, varieties)
+        tuples.
+    secondary_skills -- List of (key, rank, specialization rank, varieties)
+        tuples, including the skills created by the profiles.
+    superior -- Name of the superior.
+    values -- List of (key, rank) tuples.
+    """
+
+    def __init__(self, template):
+        """Constructor.
+
+        Arguments:
+        template -- A Profile instance on which the superior and archetype
+            profiles were loaded.
+        """
+        self.superior = template.superior
+        self.archetype = template.archetype
+        self.power_table = template.power_table
+        self.attributes = [(k, a.rank) for k, a in template.attributes.items()
+                           if a.rank != 0]
+        self.values = [(k, v.rank) for k, v in template.values.items()
+                       if v.rank != 0]
+        self.primary_skills = skill_changes(template.primary_skills)
+        self.secondary_skills = skill_changes(template.secondary_skills)
+        self.exotic_skills = skill_changes(template.exotic_skills)
+        self.powers = [(k, p.cost, tuple(p.coordinates), p.base_rank,
+                        p.invariant) for k, p in template.powers.items()]
+
+
+@functools.lru_cache(maxsize=None)
+def load_compiled(profile):
+    """Load the compiled version of a profile archive, written by
+    'scx profiles compile'.
+
+    The compiled version is ignored if its hash does not match the catalog
+    manifest, so that an archive modified since the last compilation is parsed
+    again.
+
+    Arguments:
+    profile -- Path to a profile archive.
+
+    Returns: a dictionary holding the parsed CSV files of the archive under
+    'data' and its parsed power tables under 'tables', or None if there is no
+    valid compiled version.
+    """
+    name = os.path.relpath(profile, catalog.PROFILE_PATH)
+    try:
+        with open(get_compiled_path(name), 'rb') as f:
+            compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    hashes = {e['file']: e['sha256'] for entries in
+              catalog.load_catalog().values() for e in entries.values()}
+    if compiled.get('version') != COMPILED_VERSION or\
+            compiled.get('sha256') != hashes.get(name.replace(os.sep, '/')):
+        return None
+    return compiled
+
+
+def get_compiled_path(name):
+    """Return the path to the compiled version of a profile archive.
+
+    Arguments:
+    name -- Path to the archive, relative to the profile folder.
+    """
+    return os.path.join(COMPILED_PATH, os.path.splitext(name)[0] + '.pickle')
+
+
+def parse_power_table(rows):
+    """Parse the rows of a power table.
+
+    Arguments:
+    rows -- Rows of the CSV file of the table, as dictionaries.
+
+    Returns: a list of (values, powers, pp, bonus) tuples, one per row, where
+    values is the list of the rolls matching the row, powers maps the names of
+    the drawn powers to their descriptions, pp is the PP bonus and bonus maps
+    superiors to their specific PP bonus.
+    """
+    entries = []
+    for row in rows:
+        val = [int(i) for i in row['value'].strip('[]').split(',')]
+        powers = {}  # building powers dictionary
+        power_items = row['powers'].strip('{}').split('|')
+        for item in power_items:
+            k, v = item.split(':')
+            powers[k.strip('"')] = v.strip('[]').replace('"', '').split(',')
+        bonus = {}  # building bonus dictionary
+        bonus_str = row['bonus'].strip('{}')
+        if len(bonus_str) > 0:
+            bonus_items = bonus_str.split(',')
+            for item in bonus_items:
+                k, v = item.split(':')
+                bonus[k.strip('"')] = int(v)
+        entries.append((val, powers, int(row['pp']), bonus))
+    return entries
+
+
+def parse_profile(profile):
+    """Read and parse every CSV file of a profile archive.
+
+    Arguments:
+    profile -- Path to a profile archive.
+
+    Returns: a dictionary mapping each CSV file name to the list of its rows,
+    as dictionaries.
+    """
+    data = {}
+    with timing.stage('profile.zip_io'):
+        with zipfile.ZipFile(profile) as p:
+            raw = {m: p.read(m) for m in p.namelist() if m.endswith('.csv')}
+    with timing.stage('profile.csv_parse'):
+        for m, content in raw.items():
+            delimiter = ';' if m.startswith('table_') else ','
+            data[m] = list(csv.DictReader(
+                io.StringIO(content.decode('utf-8')), delimiter=delimiter))
+    return data
+
+
+@functools.lru_cache(maxsize=None)
+def read_power_table(profile, table):
+    """Return the parsed power table of a profile archive.
+
+    Compiled tables are used when available. Parsed tables are cached and
+    shared: the returned entries must not be modified.
+
+    Arguments:
+    profile -- Path to a profile archive.
+    table -- Name of the CSV file of the power table.
+
+    Returns: a list of entries, as returned by parse_power_table.
+    """
+    compiled = load_compiled(profile)
+    if compiled is not None and table in compiled['tables']:
+        return compiled['tables'][table]
+    return parse_power_table(read_profile(profile)[table])
+
+
+@functools.lru_cache(maxsize=None)
+def read_profile(profile):
+    """Return the parsed CSV files of a profile archive.
+
+    Compiled profiles are used when available, otherwise the archive is read
+    and parsed. Parsed archives are cached, so that each archive is only read
+    once per process. The returned rows are shared and must not be modified.
+
+    Arguments:
+    profile -- Path to a profile archive.
+
+    Returns: a dictionary mapping each CSV file name to the list of its rows,
+    as dictionaries.
+    """
+    compiled = load_compiled(profile)
+    if compiled is not None:
+        return compiled['data']
+    return parse_profile(profile)
+
+
+def skill_changes(skills):
+    """Return the (key, rank, specialization rank, varieties) tuples of the
+    skills of a map which were changed by a profile.
+
+    The specialization rank and the varieties are None if unchanged.
+
+    Arguments:
+    skills -- Map of scox.value.Skill instances.
+    """
+    changes = []
+    for k, sk in skills.items():
+        spe = sk.specialization.rank if sk.specialization is not None and\
+            sk.specialization.rank != 0 else None
+        varieties = tuple(sk.varieties) if sk.varieties else None
+        if sk.rank != 0 or spe is not None or varieties is not None:
+            changes.append((k, sk.rank, spe, varieties))
+    return changes
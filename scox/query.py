@@ -0,0 +1,366 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.export.serialize as srl
+import scox.storage as storage
+import scox.team as team
+
+import array
+import operator
+import os
+import pickle
+import re
+
+INDEX_FILE = '.index'
+INDEX_VERSION = 2
+KINDS = {'attribute': 2, 'skill': 2, 'power': 2, 'value': 1}
+MISSING = -1
+# largest full rank held by the signed char rank columns
+MAX_RANK = 127
+TEXT_COLUMNS = ['name', 'nature', 'superior']
+OPERATORS = {'>=': operator.ge, '<=': operator.le, '!=': operator.ne,
+             '=': operator.eq, '>': operator.gt, '<': operator.lt}
+CONDITION = re.compile(r'^\s*(.+?)\s*(>=|<=|!=|=|>|<|\s+in\s+)\s*(.+?)\s*$')
+
+
+class TeamIndex:
+    """Columnar index of the characters of a team.
+
+    The index holds one row per pickle file of the team folder, and one column
+    per attribute, side value, skill and power met in the team. Rank columns
+    are arrays of full ranks, clamped to 0 to MAX_RANK, in which MISSING
+    stands for a skill which is not usable or a power which the character
+    does not have. Text columns hold the
+    name, nature and superior of each character.
+
+    Columns are named after the normalized names of the values (see
+    scox.catalog.normalize_name), so that 'Corps à corps', 'corps_a_corps' and
+    'CaC' all designate the same column.
+
+    Instance variables:
+    aliases -- Map of alternative column names to column names.
+    columns -- Map of column names to arrays of ranks.
+    files -- List of the paths of the indexed files, relative to the team
+        folder, one per row.
+    folder -- Path to the team folder.
+    kinds -- Map of column names to the kind of their values, from KINDS.
+    labels -- Map of column names to displayed value names.
+    mtimes -- Array of the modification times of the indexed files.
+    scales -- Map of column names to the ratio between full and displayed
+        ranks (2 for attributes, skills and powers, 1 for side values).
+    text -- Map of text column names to lists of strings.
+    version -- Version of the index layout, compared to INDEX_VERSION.
+    """
+
+    def __init__(self, folder):
+        """Constructor.
+
+        Arguments:
+        folder -- Path to the team folder.
+        """
+        self.version = INDEX_VERSION
+        self.folder = folder
+        self.files = []
+        self.mtimes = array.array('d')
+        self.text = {k: [] for k in TEXT_COLUMNS}
+        self.columns = {}
+        self.scales = {}
+        self.kinds = {}
+        self.labels = {}
+        self.aliases = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def add_column(self, key, label, kind):
+        """Add an empty rank column, filled with MISSING for existing rows."""
+        self.columns[key] = array.array('b', [MISSING]) * len(self.files)
+        self.labels[key] = label
+        self.kinds[key] = kind
+        self.scales[key] = KINDS[kind]
+
+    def delete_rows(self, rows):
+        """Delete rows from every column.
+
+        Arguments:
+        rows -- Iterable of row numbers.
+        """
+        for r in sorted(rows, reverse=True):
+            del self.files[r]
+            del self.mtimes[r]
+            for col in self.text.values():
+                del col[r]
+            for col in self.columns.values():
+                del col[r]
+
+    def get_column(self, name):
+        """Return the name of the column matching a value name.
+
+        Arguments:
+        name -- Name of a value, or of a text column.
+
+        Raises:
+        ValueError -- If no column matches the name.
+        """
+        key = catalog.normalize_name(name)
+        if key in self.text or key in self.columns:
+            return key
+        if key in self.aliases:
+            return self.aliases[key]
+        raise ValueError("Unknown column: " + name + ".")
+
+    def get_value(self, column, row):
+        """Return the value of a column for a row, as displayed.
+
+        Arguments:
+        column -- Name of a column.
+        row -- Row number.
+
+        Returns: a string, or None if the value is missing.
+        """
+        if column in self.text:
+            return self.text[column][row]
+        rank = self.columns[column][row]
+        if rank == MISSING:
+            return None
+        if self.scales[column] == 1:
+            return str(rank)
+        return str(rank // 2) + ('+' if rank % 2 else '')
+
+    def select(self, conditions, sort=None, limit=None):
+        """Return the rows matching every condition.
+
+        Arguments:
+        conditions -- List of conditions, in the syntax of parse_condition.
+
+        Keyword arguments:
+        sort -- Name of the column by which rows are sorted, in ascending
+            order, or in descending order if prefixed with '-' (default: None,
+            sorted by file name).
+        limit -- Maximum number of returned rows (default: None).
+
+        Returns: a list of row numbers.
+
+        Raises:
+        ValueError -- If a condition or the sort column is invalid.
+        """
+        rows = range(len(self.files))
+        for c in conditions:
+            column, test = self.parse_condition(c)
+            col = self.text[column] if column in self.text else\
+                self.columns[column]
+            rows = [r for r in rows if test(col[r])]
+        rows = list(rows)
+        if sort is not None:
+            reverse = sort.startswith('-')
+            column = self.get_column(sort.lstrip('-'))
+            col = self.text[column] if column in self.text else\
+                self.columns[column]
+            rows.sort(key=col.__getitem__, reverse=reverse)
+        return rows[:limit] if limit is not None else rows
+
+    def parse_condition(self, condition):
+        """Turn a condition into a column name and a test on its values.
+
+        A condition is either a comparison of a column to a value, such as
+        'Combat>=4', 'Fuite=3+', 'PP>10' or 'superior=Baal', a membership
+        test, such as 'superior in Baal,Scox', or a bare value name, such as
+        'Hypnotisme', true when the skill is usable or the power is owned.
+        Ranks are given as displayed, 'Combat>=4' meaning a full rank of 8 or
+        more. A leading '!' negates a bare value name.
+
+        Arguments:
+        condition -- A string.
+
+        Returns: a (column name, function) tuple.
+
+        Raises:
+        ValueError -- If the condition is invalid.
+        """
+        m = CONDITION.match(condition)
+        if m is None:
+            negate = condition.strip().startswith('!')
+            column = self.get_column(condition.strip().lstrip('!'))
+            if column in self.text:
+                raise ValueError("Invalid condition: " + condition + ".")
+            if negate:
+                return column, lambda v: v == MISSING
+            return column, lambda v: v != MISSING
+        name, op, target = m.groups()
+        column = self.get_column(name)
+        if op.strip() == 'in':
+            targets = [t.strip() for t in target.split(',')]
+        else:
+            targets = [target]
+        if column in self.text:
+            targets = [catalog.normalize_name(t) for t in targets]
+            convert = {v: catalog.normalize_name(v)
+                       for v in set(self.text[column])}.__getitem__
+        else:
+            try:
+                targets = [parse_rank(t, self.scales[column]) for t in targets]
+            except ValueError:
+                raise ValueError("Invalid rank in condition: " + condition +
+                                 ".")
+
+            def convert(v):
+                return v
+        if op.strip() == 'in':
+            allowed = set(targets)
+            return column, lambda v: convert(v) in allowed
+        compare = OPERATORS[op]
+        t = targets[0]
+        if column in self.columns:
+            return column, lambda v: v != MISSING and compare(v, t)
+        return column, lambda v: compare(convert(v), t)
+
+    def set_row(self, row, file_name, mtime, character):
+        """Fill a row with the values of a character.
+
+        Arguments:
+        row -- Row number, equal to the number of rows to append a new row.
+        file_name -- Path of the character's pickle file, relative to the
+            team folder.
+        mtime -- Modification time of the pickle file.
+        character -- A scox.character.Character instance.
+        """
+        if row == len(self.files):
+            self.files.append(file_name)
+            self.mtimes.append(mtime)
+            for col in self.text.values():
+                col.append('')
+            for col in self.columns.values():
+                col.append(MISSING)
+        self.files[row] = file_name
+        self.mtimes[row] = mtime
+        self.text['name'][row] = str(character.get_name())
+        self.text['nature'][row] = character.get_nature()
+        self.text['superior'][row] = str(character.get_superior())
+        for col in self.columns.values():
+            col[row] = MISSING
+        for k, v, kind in iter_ranks(character):
+            key = catalog.normalize_name(v.get_name()) if\
+                hasattr(v, 'get_name') else catalog.normalize_name(k)
+            if key not in self.columns:
+                self.add_column(key, v.get_name() if hasattr(v, 'get_name')
+                                else k, kind)
+            alias = catalog.normalize_name(k)
+            if alias != key:
+                self.aliases[alias] = key
+            usable = v.is_usable() if hasattr(v, 'is_usable') else True
+            # clamped, so that an out-of-range rank neither overflows the
+            # column nor reads as MISSING
+            self.columns[key][row] = min(max(v.get_full_rank(), 0),
+                                         MAX_RANK) if usable else MISSING
+
+    def update(self, failures=None):
+        """Bring the index up to date with the team folder.
+
+        Only the pickle files added or modified since the last update are
+        loaded; the rows of deleted files are dropped. The team lock is held
+        in shared mode while the folder is scanned and while each file is
+        read.
+
+        Keyword arguments:
+        failures -- Optional list to which the paths of the pickle files which
+            could not be loaded are appended.
+
+        Returns: the number of added, modified and deleted rows.
+        """
+        with team.get_lock(self.folder) as lock:
+            with lock.hold(shared=True):
+                current = {k: e.stat().st_mtime
+                           for k, e in team.scan(self.folder)}
+            rows = {f: i for i, f in enumerate(self.files)}
+            deleted = [rows[f] for f in rows if f not in current]
+            self.delete_rows(deleted)
+            rows = {f: i for i, f in enumerate(self.files)}
+            changed = len(deleted)
+            for f in sorted(current):
+                row = rows.get(f)
+                if row is not None and self.mtimes[row] == current[f]:
+                    continue
+                path = os.path.join(self.folder, f)
+                try:
+                    with lock.hold(shared=True):
+                        c = srl.load_from_pickle(path)
+                except Exception as e:
+                    if failures is not None and\
+                            not isinstance(e, FileNotFoundError):
+                        failures.append(path)
+                    if row is not None:
+                        self.delete_rows([row])
+                        rows = {f: i for i, f in enumerate(self.files)}
+                        changed += 1
+                    continue
+                self.set_row(len(self.files) if row is None else row, f,
+                             current[f], c)
+                changed += 1
+        return changed
+
+
+def iter_ranks(character):
+    """Yield a (key, value, kind) tuple for every ranked value of a
+    character, kind being a key of KINDS."""
+    for kind, d in [('attribute', character.get_attributes()),
+                    ('skill', character.get_primary_skills()),
+                    ('skill', character.get_exotic_skills()),
+                    ('skill', character.get_secondary_skills()),
+                    ('power', character.get_powers()),
+                    ('value', character.get_side_values())]:
+        for k, v in d.items():
+            yield k, v, kind
+
+
+def load_index(folder, failures=None):
+    """Load the index of a team folder, update it and save it if needed.
+
+    Arguments:
+    folder -- Path to the team folder.
+
+    Keyword arguments:
+    failures -- Optional list to which the paths of the pickle files which
+        could not be loaded are appended.
+
+    Returns: a TeamIndex instance.
+    """
+    path = os.path.join(folder, INDEX_FILE)
+    try:
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        index.folder = folder
+        if getattr(index, 'version', 1) != INDEX_VERSION:
+            index = TeamIndex(folder)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        index = TeamIndex(folder)
+    if index.update(failures) > 0 or not os.path.exists(path):
+        save_index(index)
+    return index
+
+
+def parse_rank(rank, scale=2):
+    """Convert a displayed rank to a full rank.
+
+    Arguments:
+    rank -- A displayed rank, such as '3', '3+' or '3.5'.
+
+    Keyword arguments:
+    scale -- Ratio between full and displayed ranks (default 2).
+
+    Returns: an integer.
+
+    Raises:
+    ValueError -- If the rank is invalid.
+    """
+    rank = rank.strip()
+    if rank.endswith('+'):
+        return int(rank[:-1]) * scale + 1
+    return int(float(rank) * scale)
+
+
+def save_index(index):
+    """Write an index to its team folder."""
+    path = os.path.join(index.folder, INDEX_FILE)
+    with storage.atomic_write(path, sync=False) as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,262 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.export.serialize as srl
+import scox.generator as gen
+import scox.storage as storage
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import uuid
+
+REFILL_LOG = 'refill.log'
+RESERVOIR_FOLDER = '.reservoir'
+STATS_FILE = 'stats.json'
+
+
+class Reservoir:
+    """Pool of pre-generated characters, stored in a team folder.
+
+    Characters are kept as pickle files, in one folder per (nature, superior,
+    archetype) combination under the RESERVOIR_FOLDER folder of the team, so
+    that a character can be handed out by moving a single file. Each
+    combination is refilled up to the size of the reservoir, either by a
+    thread of the current process or by a detached process.
+
+    Instance variables:
+    folder -- Path to the reservoir folder.
+    generator -- A scox.generator.Generator instance used for refills.
+    lock -- Lock serializing the updates of the statistics file within the
+        process; a lock file serializes them across processes.
+    size -- Number of characters kept per combination.
+    """
+
+    def __init__(self, team_folder, size=5, generator=None):
+        """Constructor.
+
+        Arguments:
+        team_folder -- Path to the folder of the team.
+
+        Keyword arguments:
+        size -- Number of characters kept per combination (default 5).
+        generator -- A scox.generator.Generator instance (default: a new
+            unseeded generator).
+        """
+        self.folder = os.path.join(team_folder, RESERVOIR_FOLDER)
+        self.size = size
+        self.generator = generator or gen.Generator()
+        self.lock = threading.Lock()
+
+    def fill(self, nature, superior, archetype):
+        """Generate characters until a combination holds self.size of them.
+
+        Arguments:
+        nature -- Nature of the characters ('angel' or 'demon').
+        superior -- Name of the superior profile.
+        archetype -- Name of the archetype profile.
+
+        Returns: the number of generated characters.
+
+        Raises:
+        ValueError -- If the superior or archetype is unknown.
+        """
+        self.generator.get_profile_path(nature, superior)
+        self.generator.get_profile_path('arch', archetype)
+        folder = self.get_pool(nature, superior, archetype)
+        os.makedirs(folder, exist_ok=True)
+        missing = self.size - self.get_count(nature, superior, archetype)
+        count = 0
+        with storage.Batch() as batch:
+            while count < missing:
+                c = self.generator.generate(None, nature, superior, archetype)
+                srl.export_as_pickle(
+                    c, os.path.join(folder, uuid.uuid4().hex + '.pickle'),
+                    batch)
+                count += 1
+        if count > 0:
+            self.update_stats(key(nature, superior, archetype), 'refills',
+                              count)
+        return count
+
+    def fill_in_background(self, nature, superior, archetype, detach=False):
+        """Refill a combination without waiting for it.
+
+        Arguments:
+        nature -- Nature of the characters ('angel' or 'demon').
+        superior -- Name of the superior profile.
+        archetype -- Name of the archetype profile.
+
+        Keyword arguments:
+        detach -- If True, refill in a separate process which outlives the
+            current one, otherwise in a daemon thread (default False). The
+            errors of a separate process are appended to the REFILL_LOG file
+            of the reservoir folder.
+
+        Returns: the started threading.Thread or subprocess.Popen instance.
+        """
+        if not detach:
+            worker = threading.Thread(target=self.fill,
+                                      args=(nature, superior, archetype),
+                                      daemon=True)
+            worker.start()
+            return worker
+        # the package may not be importable from the current folder
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [root] + [p for p in [env.get('PYTHONPATH')] if p])
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, REFILL_LOG), 'ab') as log:
+            return subprocess.Popen(
+                [sys.executable, '-m', 'scox.reservoir',
+                 os.path.abspath(os.path.dirname(self.folder)), nature,
+                 superior, archetype, str(self.size)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                stderr=log, env=env, start_new_session=True)
+
+    def get_count(self, nature, superior, archetype):
+        """Return the number of characters held for a combination."""
+        try:
+            with os.scandir(self.get_pool(nature, superior, archetype)) as it:
+                return sum(1 for e in it if e.name.endswith('.pickle'))
+        except FileNotFoundError:
+            return 0
+
+    def get_pool(self, nature, superior, archetype):
+        """Return the path to the folder of a combination.
+
+        Arguments:
+        nature -- Nature of the characters ('angel' or 'demon').
+        superior -- Name of the superior profile.
+        archetype -- Name of the archetype profile.
+        """
+        return os.path.join(self.folder, nature,
+                            catalog.normalize_name(superior),
+                            catalog.normalize_name(archetype))
+
+    def get_stats(self):
+        """Return the statistics of the reservoir.
+
+        Returns: a dictionary mapping each combination, as a
+        'nature/superior/archetype' string, to its number of hits, misses and
+        refilled characters and to the number of characters it holds.
+        """
+        stats = self.read_stats()
+        if os.path.isdir(self.folder):
+            for n, s, a in walk_pools(self.folder):
+                stats.setdefault(key(n, s, a), {})
+        for k, st in stats.items():
+            for field in ['hits', 'misses', 'refills']:
+                st.setdefault(field, 0)
+            st['available'] = self.get_count(*k.split('/'))
+        return stats
+
+    def read_stats(self):
+        """Return the content of the statistics file."""
+        try:
+            with open(os.path.join(self.folder, STATS_FILE),
+                      encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def take(self, name, nature, superior, archetype):
+        """Hand out a character of the requested combination.
+
+        A pooled character is renamed and returned if one is available (a
+        hit); otherwise a new one is generated on the spot (a miss). The pool
+        is not refilled: see fill and fill_in_background.
+
+        Arguments:
+        name -- Name given to the character.
+        nature -- Nature of the character ('angel' or 'demon').
+        superior -- Name of the superior profile.
+        archetype -- Name of the archetype profile.
+
+        Returns: a scox.character.Character instance.
+
+        Raises:
+        ValueError -- If the nature, superior or archetype is unknown.
+        """
+        k = key(nature, superior, archetype)
+        c = self.take_pooled(nature, superior, archetype)
+        if c is None:
+            c = self.generator.generate(name, nature, superior, archetype)
+            self.update_stats(k, 'misses')
+        else:
+            c.name = name
+            self.update_stats(k, 'hits')
+        return c
+
+    def take_pooled(self, nature, superior, archetype):
+        """Remove a character from a pool and return it, or None if the pool
+        is empty.
+
+        Files are claimed by renaming them, so that concurrent takers never
+        get the same character.
+        """
+        folder = self.get_pool(nature, superior, archetype)
+        try:
+            it = os.scandir(folder)
+        except FileNotFoundError:
+            return None
+        with it:
+            for e in it:
+                if not e.name.endswith('.pickle'):
+                    continue
+                claimed = e.path + '.' + str(os.getpid()) + '.taken'
+                try:
+                    os.replace(e.path, claimed)
+                except FileNotFoundError:
+                    continue
+                try:
+                    return srl.load_from_pickle(claimed)
+                except Exception:
+                    continue
+                finally:
+                    os.remove(claimed)
+        return None
+
+    def update_stats(self, k, field, count=1):
+        """Add a count to a field of the statistics of a combination.
+
+        Arguments:
+        k -- A 'nature/superior/archetype' string.
+        field -- 'hits', 'misses' or 'refills'.
+
+        Keyword arguments:
+        count -- Number to add (default 1).
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        with self.lock, storage.locked(
+                os.path.join(self.folder, STATS_FILE + '.lock')):
+            stats = self.read_stats()
+            st = stats.setdefault(k, {})
+            st[field] = st.get(field, 0) + count
+            with storage.atomic_write(os.path.join(self.folder, STATS_FILE),
+                                      'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=1)
+
+
+def key(nature, superior, archetype):
+    """Return the statistics key of a combination."""
+    return '/'.join([nature, catalog.normalize_name(superior),
+                     catalog.normalize_name(archetype)])
+
+
+def walk_pools(folder):
+    """Yield the (nature, superior, archetype) tuple of every pool folder."""
+    for n in ['angel', 'demon']:
+        if not os.path.isdir(os.path.join(folder, n)):
+            continue
+        for s in sorted(os.listdir(os.path.join(folder, n))):
+            for a in sorted(os.listdir(os.path.join(folder, n, s))):
+                yield n, s, a
+
+
+if __name__ == '__main__':
+    Reservoir(sys.argv[1], int(sys.argv[5])).fill(*sys.argv[2:5])
@@ -0,0 +1,114 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import collections
+import functools
+import json
+import os
+import types
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), 'schema.json')
+SKILL_SECTIONS = ['primary_skills', 'exotic_skills', 'secondary_skills']
+SECTIONS = ['attributes'] + SKILL_SECTIONS + ['values']
+NATURES = ['Angel', 'Demon']
+
+Entry = collections.namedtuple(
+    'Entry', ['key', 'name', 'base_rank', 'attribute', 'specific', 'multiple',
+              'invariant', 'acquired', 'slots'])
+Entry.__doc__ = """Description of an attribute, skill or side value.
+
+Instance variables:
+key -- Key of the value in the dictionaries of a character.
+name -- Displayed name of the value.
+base_rank -- Initial base rank of the value.
+attribute -- Key of the governing attribute of a skill, or None.
+specific -- True if the skill has a specialization.
+multiple -- True if the skill has varieties.
+invariant -- True if the rank of the value cannot be modified.
+acquired -- True if the skill needs ranks to be usable.
+slots -- Map of natures ('Angel', 'Demon') to the coordinates of the value on
+    the character sheet, as (x, y) tuples.
+"""
+
+
+class Schema:
+    """Immutable description of the values of a blank character.
+
+    Instance variables:
+    free_slots -- Map of natures to the tuple of sheet coordinates given to
+        the skills which profiles add to a character, in order of use.
+    header -- Map of natures to maps of 'name', 'level' and 'superior' to the
+        coordinates of the character's header fields.
+    index -- Map of (section, key) tuples to entries.
+    layouts -- Map of (section, nature) tuples to the tuple of the (key, name,
+        x, y, base rank, attribute, specific, multiple, invariant, acquired)
+        tuples of the section's entries, flattened for quick construction.
+    sections -- Map of section names, from SECTIONS, to tuples of entries, in
+        display order.
+    """
+
+    def __init__(self, data):
+        """Constructor.
+
+        Arguments:
+        data -- Content of the schema file, as parsed JSON.
+        """
+        sections = {}
+        for s in SECTIONS:
+            sections[s] = tuple(
+                Entry(key=e['key'], name=e.get('name', e['key']),
+                      base_rank=e.get('base_rank', 0),
+                      attribute=e.get('attribute'),
+                      specific=e.get('specific', False),
+                      multiple=e.get('multiple', False),
+                      invariant=e.get('invariant', False),
+                      acquired=e.get('acquired', False),
+                      slots=types.MappingProxyType(
+                          {n: tuple(c) for n, c in e['slots'].items()}))
+                for e in data[s])
+        self.sections = types.MappingProxyType(sections)
+        self.index = types.MappingProxyType(
+            {(s, e.key): e for s, entries in sections.items()
+             for e in entries})
+        self.layouts = types.MappingProxyType(
+            {(s, n): tuple((e.key, e.name) + e.slots[n] +
+                           (e.base_rank, e.attribute, e.specific, e.multiple,
+                            e.invariant, e.acquired) for e in entries)
+             for s, entries in sections.items() for n in NATURES})
+        self.free_slots = types.MappingProxyType(
+            {n: tuple(tuple(c) for c in slots)
+             for n, slots in data['free_slots'].items()})
+        self.header = types.MappingProxyType(
+            {n: types.MappingProxyType({k: tuple(c) for k, c in h.items()})
+             for n, h in data['header'].items()})
+
+    def get_entry(self, section, key):
+        """Return the entry of a value, or None if the schema lacks it.
+
+        Arguments:
+        section -- A section name, from SECTIONS.
+        key -- Key of the value.
+        """
+        return self.index.get((section, key))
+
+    def get_free_slot(self, nature, n):
+        """Return the coordinates given to a skill added by a profile.
+
+        Arguments:
+        nature -- Nature of the character ('Angel' or 'Demon').
+        n -- Number of skills already added to the character.
+
+        Returns: a list of coordinates; [0, 0] once every free slot is taken.
+        """
+        slots = self.free_slots[nature]
+        return list(slots[n]) if n < len(slots) else [0, 0]
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema():
+    """Load the schema file, once per process.
+
+    Returns: a Schema instance.
+    """
+    with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+        return Schema(json.load(f))
@@ -0,0 +1,291 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.catalog as catalog
+import scox.generator as gen
+
+import collections
+import http.server
+import itertools
+import json
+import sys
+import threading
+import time
+import traceback
+import urllib.parse
+
+# endpoints counted separately in the metrics, other paths being counted
+# under 'other'
+METRICS_ENDPOINTS = ['/generate', '/health', '/metrics', '/profiles']
+RENDER_FORMATS = {'json': 'application/json; charset=utf-8',
+                  'txt': 'text/plain; charset=utf-8',
+                  'cli': 'text/plain; charset=utf-8',
+                  'svg': 'image/svg+xml'}
+
+
+class Metrics:
+    """Thread-safe request counters and latency statistics.
+
+    Instance variables:
+    counts -- Number of handled requests per endpoint.
+    errors -- Number of failed requests per endpoint.
+    latencies -- Latest request durations per endpoint, in seconds.
+    rejected -- Number of requests rejected by the concurrency limit.
+    in_flight -- Number of requests being handled.
+    """
+
+    def __init__(self, window=1000):
+        """Constructor.
+
+        Keyword arguments:
+        window -- Number of latest durations kept per endpoint (default 1000).
+        """
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.errors = collections.Counter()
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=window))
+        self.rejected = 0
+        self.in_flight = 0
+
+    def record(self, endpoint, elapsed, failed=False):
+        """Record a handled request.
+
+        Arguments:
+        endpoint -- Path of the requested endpoint.
+        elapsed -- Duration of the request, in seconds.
+        failed -- True if the request failed (default False).
+        """
+        with self.lock:
+            self.counts[endpoint] += 1
+            if failed:
+                self.errors[endpoint] += 1
+            self.latencies[endpoint].append(elapsed)
+
+    def snapshot(self):
+        """Return the current metrics as a JSON-compatible dictionary.
+
+        Latencies are given in milliseconds.
+        """
+        with self.lock:
+            endpoints = {}
+            for k, lat in self.latencies.items():
+                ordered = sorted(lat)
+                endpoints[k] = {
+                    'requests': self.counts[k],
+                    'errors': self.errors[k],
+                    'p50_ms': percentile(ordered, 0.50) * 1000,
+                    'p95_ms': percentile(ordered, 0.95) * 1000,
+                    'max_ms': ordered[-1] * 1000}
+            return {'endpoints': endpoints,
+                    'rejected': self.rejected,
+                    'in_flight': self.in_flight}
+
+
+class GenerationServer(http.server.ThreadingHTTPServer):
+    """HTTP server generating and rendering characters.
+
+    Profile archives and character sheets are loaded when the server starts
+    and stay cached for its whole lifetime.
+
+    Instance variables:
+    generator -- A scox.generator.Generator instance.
+    limit -- Semaphore bounding the number of requests handled at once.
+    metrics -- A Metrics instance.
+    names -- Counter used for naming anonymous characters.
+    queue_timeout -- Time a request may wait for a free slot, in seconds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, max_concurrency=4, queue_timeout=5.0):
+        """Constructor.
+
+        Arguments:
+        address -- (host, port) tuple to listen on.
+
+        Keyword arguments:
+        max_concurrency -- Maximum number of requests handled at once
+            (default 4).
+        queue_timeout -- Time a request may wait for a free slot before being
+            rejected, in seconds (default 5).
+        """
+        http.server.ThreadingHTTPServer.__init__(self, address,
+                                                 RequestHandler)
+        self.limit = threading.BoundedSemaphore(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.metrics = Metrics()
+        self.names = itertools.count(1)
+        self.generator = gen.Generator()
+        self.generator.warm_up()
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handler for the endpoints of GenerationServer.
+
+    Endpoints:
+    GET /health -- Liveness check.
+    GET /metrics -- Request counts, errors and latencies, per endpoint
+        (requests to unknown paths are counted under 'other').
+    GET /profiles/<category> -- Profiles of a category ('angel', 'demon' or
+        'arch').
+    GET|POST /generate -- Generate a character. Parameters (query string or
+        JSON body): name, nature, superior, archetype and format ('json',
+        'txt', 'cli' or 'svg').
+    """
+
+    server_version = 'scox-gen'
+
+    def do_GET(self):
+        self.handle_request(dict(urllib.parse.parse_qsl(
+            urllib.parse.urlsplit(self.path).query)))
+
+    def do_POST(self):
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.reject(400, 'Invalid Content-Length header.', start)
+            return
+        try:
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.reject(400, 'Invalid JSON body.', start)
+            return
+        if not isinstance(params, dict) or\
+                not all(isinstance(v, str) for v in params.values()):
+            self.reject(400, 'The JSON body must be an object of strings.',
+                        start)
+            return
+        self.handle_request(params)
+
+    def get_metrics_key(self):
+        """Return the key under which the current request is counted in the
+        metrics: its endpoint, '/profiles' for every category, or 'other'
+        for unknown paths, so that the metrics do not grow with every
+        requested URL."""
+        endpoint = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        if endpoint.startswith('/profiles/'):
+            endpoint = '/profiles'
+        return endpoint if endpoint in METRICS_ENDPOINTS else 'other'
+
+    def handle_request(self, params):
+        """Dispatch a request to its endpoint, within the concurrency limit.
+
+        Arguments:
+        params -- Dictionary of request parameters.
+        """
+        endpoint = urllib.parse.urlsplit(self.path).path.rstrip('/')
+        metrics = self.server.metrics
+        if not self.server.limit.acquire(timeout=self.server.queue_timeout):
+            with metrics.lock:
+                metrics.rejected += 1
+            self.send_text(503, 'Too many concurrent requests.')
+            return
+        with metrics.lock:
+            metrics.in_flight += 1
+        start = time.perf_counter()
+        failed = True
+        try:
+            failed = self.route(endpoint, params)
+        except Exception:
+            # answered, rather than dropping the connection
+            traceback.print_exc(file=sys.stderr)
+            self.send_text(500, 'Internal server error.')
+        finally:
+            with metrics.lock:
+                metrics.in_flight -= 1
+            self.server.limit.release()
+            metrics.record(self.get_metrics_key(),
+                           time.perf_counter() - start, failed)
+
+    def reject(self, status, text, start):
+        """Answer a malformed request, and count it as failed.
+
+        Arguments:
+        status -- HTTP status code.
+        text -- Error message.
+        start -- Value of the performance counter when the request was
+            received.
+        """
+        self.send_text(status, text)
+        self.server.metrics.record(self.get_metrics_key(),
+                                   time.perf_counter() - start, True)
+
+    def route(self, endpoint, params):
+        """Answer a request.
+
+        Arguments:
+        endpoint -- Path of the requested endpoint.
+        params -- Dictionary of request parameters.
+
+        Returns: True if the request failed.
+        """
+        if endpoint == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif endpoint == '/metrics':
+            self.send_json(200, self.server.metrics.snapshot())
+        elif endpoint.startswith('/profiles/'):
+            category = endpoint[len('/profiles/'):]
+            if category not in catalog.CATEGORIES:
+                self.send_text(404, 'Unknown category: ' + category + '.')
+                return True
+            self.send_json(200, catalog.get_profile_list(category))
+        elif endpoint == '/generate':
+            fmt = params.get('format', 'json')
+            if fmt not in RENDER_FORMATS:
+                self.send_text(400, 'Unknown format: ' + fmt + '.')
+                return True
+            try:
+                generator = self.server.generator
+                c = generator.generate(params.get('name') or
+                                       'PNJ ' + str(next(self.server.names)),
+                                       params.get('nature'),
+                                       params.get('superior'),
+                                       params.get('archetype'))
+            except ValueError as e:
+                self.send_text(400, str(e))
+                return True
+            self.send_body(200, generator.render(c, fmt), RENDER_FORMATS[fmt])
+        else:
+            self.send_text(404, 'Unknown endpoint: ' + endpoint + '.')
+            return True
+        return False
+
+    def send_body(self, status, body, content_type):
+        """Send a complete response.
+
+        Arguments:
+        status -- HTTP status code.
+        body -- Response body, as a string.
+        content_type -- Value of the Content-Type header.
+        """
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, status, obj):
+        """Send a JSON response."""
+        self.send_body(status, json.dumps(obj, ensure_ascii=False),
+                       RENDER_FORMATS['json'])
+
+    def send_text(self, status, text):
+        """Send a plain text response."""
+        self.send_body(status, text + '\n', RENDER_FORMATS['txt'])
+
+    def log_message(self, format, *args):
+        """Silence the default per-request logging."""
+        pass
+
+
+def percentile(ordered, fraction):
+    """Return a percentile of an ordered list of values (0 if empty)."""
+    if len(ordered) == 0:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
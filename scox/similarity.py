@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.query as query
+
+import collections
+import operator
+
+EXACT_LIMIT = 5000
+SIGNATURE_SIZE = 16
+WINDOW = 16
+
+
+def block_pairs(vectors, order, signatures, threshold, window=None):
+    """Yield the candidate pairs of close vectors, bucketed by blocks.
+
+    Coordinates are dealt into threshold + 1 disjoint blocks. Two vectors
+    whose L1 distance is at most threshold differ on at most threshold
+    coordinates, so they are identical on at least one block: only vectors
+    sharing the content of a block need to be compared.
+
+    Arguments:
+    vectors -- List of distinct feature vectors.
+    order -- Indices of the coordinates, as returned by coordinate_order.
+    signatures -- Signatures of the vectors, as returned by get_signatures.
+    threshold -- Maximum distance.
+
+    Keyword arguments:
+    window -- If set, each vector of a bucket is only paired with the window
+        vectors following it, by order of signature, which bounds the number
+        of pairs in large buckets but may miss some close pairs (default:
+        None, every pair of a bucket).
+    """
+    blocks = min(threshold + 1, len(order))
+    for b in range(blocks):
+        key = operator.itemgetter(*order[b::blocks])
+        buckets = collections.defaultdict(list)
+        for i, v in enumerate(vectors):
+            buckets[key(v)].append(i)
+        for ids in buckets.values():
+            if len(ids) < 2:
+                continue
+            if window is not None:
+                ids.sort(key=signatures.__getitem__)
+            for n, a in enumerate(ids):
+                end = len(ids) if window is None else n + 1 + window
+                for c in ids[n + 1:end]:
+                    yield a, c
+
+
+def cluster_vectors(vectors, threshold, window=None):
+    """Group vectors into clusters of close vectors.
+
+    Clusters are the connected groups of vectors whose L1 distance is at most
+    threshold. Candidate pairs are checked against the distance between the
+    signatures of the vectors first, which bounds their distance from below,
+    and pairs already in the same cluster are not checked at all.
+
+    Arguments:
+    vectors -- List of feature vectors.
+    threshold -- Maximum distance.
+
+    Keyword arguments:
+    window -- See block_pairs (default None).
+
+    Returns: a list of clusters of at least two vectors, each one being a
+    sorted list of indices in vectors.
+    """
+    groups = collections.defaultdict(list)
+    for i, v in enumerate(vectors):
+        groups[v].append(i)
+    distinct = list(groups)
+    parent = list(range(len(distinct)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if len(distinct) > 1:
+        order = coordinate_order(distinct)
+        signatures = get_signatures(distinct, order)
+        for a, b in block_pairs(distinct, order, signatures, threshold,
+                                window):
+            ra, rb = find(a), find(b)
+            if ra == rb or distance(signatures[a], signatures[b]) > threshold:
+                continue
+            if distance(distinct[a], distinct[b]) <= threshold:
+                parent[max(ra, rb)] = min(ra, rb)
+    clusters = collections.defaultdict(list)
+    for i, v in enumerate(distinct):
+        clusters[find(i)].extend(groups[v])
+    return sorted(sorted(c) for c in clusters.values() if len(c) > 1)
+
+
+def coordinate_order(vectors):
+    """Return the indices of the coordinates, by decreasing variance."""
+    count = float(len(vectors))
+    variances = []
+    for c in zip(*vectors):
+        mean = sum(c) / count
+        variances.append(sum(map(operator.mul, c, c)) / count - mean * mean)
+    return sorted(range(len(variances)), key=lambda i: -variances[i])
+
+
+def distance(a, b):
+    """Return the L1 distance between two vectors."""
+    return sum(map(abs, map(operator.sub, a, b)))
+
+
+def feature_vectors(index):
+    """Encode every character of a team index as a feature vector.
+
+    A feature vector holds the full ranks of the attributes, of the usable
+    skills and of the powers of a character, 0 standing for an unusable skill
+    or a missing power, so that the power set counts in the distance. Side
+    values, which derive from attributes, are left out.
+
+    Arguments:
+    index -- A scox.query.TeamIndex instance.
+
+    Returns: a list of bytes objects, one per row of the index.
+    """
+    missing = bytes([query.MISSING & 0xff])
+    columns = [bytes(index.columns[k]).replace(missing, b'\x00')
+               for k in sorted(index.columns) if index.kinds[k] != 'value']
+    return [bytes(r) for r in zip(*columns)]
+
+
+def find_duplicates(index, threshold=4, method='auto'):
+    """Find the clusters of overly similar characters in a team.
+
+    Two characters are similar when the L1 distance between their feature
+    vectors is at most threshold; clusters are the connected groups of similar
+    characters.
+
+    Arguments:
+    index -- A scox.query.TeamIndex instance.
+
+    Keyword arguments:
+    threshold -- Maximum distance between similar characters, in full rank
+        points (default 4, i.e. two displayed ranks).
+    method -- 'exact', 'bucketed' for a faster search which may miss a few
+        similar pairs, or 'auto' to use the exact search up to EXACT_LIMIT
+        characters (default 'auto').
+
+    Returns: a list of clusters, each one being a sorted list of rows of the
+    index.
+
+    Raises:
+    ValueError -- If the method is unknown.
+    """
+    vectors = feature_vectors(index)
+    if method == 'auto':
+        method = 'exact' if len(vectors) <= EXACT_LIMIT else 'bucketed'
+    if method not in ('exact', 'bucketed'):
+        raise ValueError("Unknown method: " + str(method) + ".")
+    return cluster_vectors(vectors, threshold,
+                           WINDOW if method == 'bucketed' else None)
+
+
+def get_signatures(vectors, order):
+    """Return the signature of every vector.
+
+    The signature of a vector holds the sums of its coordinates over
+    SIGNATURE_SIZE disjoint groups, so that the distance between two
+    signatures never exceeds the distance between their vectors.
+
+    Arguments:
+    vectors -- List of feature vectors.
+    order -- Indices of the coordinates, as returned by coordinate_order.
+    """
+    groups = [order[g::SIGNATURE_SIZE] for g in range(SIGNATURE_SIZE)]
+    permute = operator.itemgetter(*[i for g in groups for i in g])
+    bounds = []
+    start = 0
+    for g in groups:
+        bounds.append((start, start + len(g)))
+        start += len(g)
+    signatures = []
+    for v in vectors:
+        p = bytes(permute(v)) if len(order) > 1 else v
+        signatures.append(tuple(sum(p[s:e]) for s, e in bounds))
+    return signatures
@@ -0,0 +1,277 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import contextlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+TMP_EXT = '.tmp'
+
+
+class Batch:
+    """Group of atomic file writes, made durable together.
+
+    Files opened through a batch are written to temporary files, which replace
+    their targets when the batch is committed. A commit flushes the pending
+    files to disk one after the other, then renames them all and syncs each
+    of their folders once, instead of interleaving one file sync, one rename
+    and one folder sync per file. Every file is still synced on its own: the
+    gain comes from the folder syncs and from letting the kernel write back
+    the files before they are synced. A crash leaves every target either in
+    its previous state or fully written.
+
+    A batch is used as a context manager: it is committed on exit, or its
+    pending files are discarded if an exception is raised. Temporary files
+    which a failed commit could not move are removed as well.
+
+    Instance variables:
+    pending -- Ordered map of the temporary paths of the files written since
+        the last commit to their target paths.
+    size -- Number of pending files which triggers a commit (None for no
+        limit).
+    sync -- False if files are not flushed to disk (renames stay atomic).
+    """
+
+    def __init__(self, size=500, sync=True):
+        """Constructor.
+
+        Keyword arguments:
+        size -- Number of pending files which triggers a commit (default 500;
+            None for no limit).
+        sync -- False to skip flushing files to disk (default True).
+        """
+        self.pending = {}
+        self.size = size
+        self.sync = sync
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+    def commit(self):
+        """Flush the pending files to disk, move them to their targets and
+        flush their folders to disk.
+
+        Returns: the number of committed files.
+        """
+        pending, self.pending = list(self.pending.items()), {}
+        if len(pending) == 0:
+            return 0
+        folders = set()
+        moved = 0
+        try:
+            if self.sync:
+                for tmp, _ in pending:
+                    sync_file(tmp)
+            for tmp, path in pending:
+                os.replace(tmp, path)
+                folders.add(os.path.dirname(path))
+                moved += 1
+        except BaseException:
+            for tmp, _ in pending[moved:]:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+            raise
+        if self.sync:
+            for d in folders:
+                sync_folder(d)
+        return len(pending)
+
+    def discard(self):
+        """Remove the pending files without touching their targets."""
+        pending, self.pending = self.pending, {}
+        for tmp in pending:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+
+    @contextlib.contextmanager
+    def open(self, path, mode='wb', encoding=None):
+        """Open a file of the batch for writing.
+
+        Arguments:
+        path -- Path to the target file.
+
+        Keyword arguments:
+        mode -- Writing mode, 'wb' or 'w' (default 'wb').
+        encoding -- Encoding of a text file (default None).
+
+        Returns: a context manager giving a file object.
+        """
+        tmp = get_tmp_path(path)
+        try:
+            with open(tmp, mode, encoding=encoding) as f:
+                yield f
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+        self.pending[tmp] = path
+        if self.size is not None and len(self.pending) >= self.size:
+            self.commit()
+
+
+class FileLock:
+    """Advisory lock on a lock file, held by readers or by a writer.
+
+    Any number of processes can hold the lock in shared mode, or a single one
+    in exclusive mode. The lock only protects against processes which use it
+    too. Locks are tied to the file descriptor, so that threads of a process
+    using distinct FileLock instances also exclude one another. Shared locks
+    are exclusive on Windows.
+
+    Instance variables:
+    fd -- File descriptor of the lock file, or None until first acquired.
+    path -- Path to the lock file, created if needed.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        Arguments:
+        path -- Path to the lock file.
+        """
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def acquire(self, shared=False):
+        """Wait for the lock and take it.
+
+        Keyword arguments:
+        shared -- True to take the lock in shared mode (default False).
+        """
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(0.01)
+
+    def close(self):
+        """Release the lock and close the lock file."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    @contextlib.contextmanager
+    def hold(self, shared=False):
+        """Hold the lock for the duration of a with block.
+
+        Keyword arguments:
+        shared -- True to take the lock in shared mode (default False).
+        """
+        self.acquire(shared)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def release(self):
+        """Release the lock, keeping the lock file open."""
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb', encoding=None, sync=True):
+    """Open a file for writing, so that it is replaced atomically.
+
+    Data is written to a temporary file in the same folder, flushed to disk,
+    and renamed over the target once the file is closed without error.
+
+    Arguments:
+    path -- Path to the target file.
+
+    Keyword arguments:
+    mode -- Writing mode, 'wb' or 'w' (default 'wb').
+    encoding -- Encoding of a text file (default None).
+    sync -- False to skip flushing the file to disk (default True).
+
+    Returns: a context manager giving a file object.
+    """
+    tmp = get_tmp_path(path)
+    try:
+        with open(tmp, mode, encoding=encoding) as f:
+            yield f
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    if sync:
+        sync_folder(os.path.dirname(path))
+
+
+def get_tmp_path(path):
+    """Return a temporary path next to a file, unique to the calling process
+    and thread."""
+    return path + '.' + str(os.getpid()) + '.' +\
+        str(threading.get_ident()) + TMP_EXT
+
+
+@contextlib.contextmanager
+def locked(path, shared=False):
+    """Hold an advisory lock on a lock file for the duration of a with block.
+
+    Arguments:
+    path -- Path to the lock file, created if needed.
+
+    Keyword arguments:
+    shared -- True to take the lock in shared mode (default False).
+    """
+    with FileLock(path) as lock:
+        with lock.hold(shared):
+            yield lock
+
+
+def sync_file(path):
+    """Flush a written file to disk, through a new descriptor."""
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def sync_folder(folder):
+    """Flush the entries of a folder to disk, so that renames in it survive a
+    crash. Does nothing on systems where folders cannot be opened."""
+    try:
+        fd = os.open(folder or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
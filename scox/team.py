@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import scox.storage as storage
+
+import os
+import re
+import zlib
+
+CHARACTER_EXT = '.pickle'
+LAYOUT_FILE = '.layout'
+LOCK_FILE = '.lock'
+LAYOUTS = ['flat', 'sharded']
+SHARD = re.compile(r'^[0-9a-f]{2}$')
+
+
+def get_character_path(folder, name, layout=None):
+    """Return the path to the pickle file of a character.
+
+    Arguments:
+    folder -- Path to the team folder.
+    name -- Name of the character.
+
+    Keyword arguments:
+    layout -- Layout of the team folder, from LAYOUTS (default: read from the
+        team folder).
+
+    Returns: a path, whether the file exists or not.
+    """
+    if layout is None:
+        layout = get_layout(folder)
+    if layout == 'sharded':
+        return os.path.join(folder, get_shard(name), name + CHARACTER_EXT)
+    return os.path.join(folder, name + CHARACTER_EXT)
+
+
+def get_layout(folder):
+    """Return the layout of a team folder.
+
+    In the 'flat' layout, character files are stored directly in the team
+    folder. In the 'sharded' layout, they are spread over up to 256
+    subfolders, named after a hash of the characters' names.
+
+    Arguments:
+    folder -- Path to the team folder.
+
+    Returns: a layout, from LAYOUTS.
+    """
+    try:
+        with open(os.path.join(folder, LAYOUT_FILE), encoding='utf-8') as f:
+            layout = f.read().strip()
+    except FileNotFoundError:
+        return 'flat'
+    return layout if layout in LAYOUTS else 'flat'
+
+
+def get_lock(folder):
+    """Return the lock of a team folder.
+
+    Readers of character files hold it in shared mode, and writers in
+    exclusive mode. Character files are replaced atomically, so readers may
+    release the lock between two files; writers should generate characters
+    before taking the lock.
+
+    Arguments:
+    folder -- Path to the team folder.
+
+    Returns: a scox.storage.FileLock instance, to be closed after use.
+    """
+    return storage.FileLock(os.path.join(folder, LOCK_FILE))
+
+
+def get_shard(name):
+    """Return the name of the subfolder holding a character in the 'sharded'
+    layout, as two hexadecimal digits."""
+    return '{:02x}'.format(zlib.crc32(name.encode('utf-8')) & 0xff)
+
+
+def migrate(folder, layout):
+    """Move the character files of a team folder to another layout.
+
+    Files are moved one at a time, and the new layout is only recorded once
+    they all are, so that an interrupted migration can be resumed by running
+    it again. Files exported next to the characters are not moved. The team
+    is locked in exclusive mode during the migration.
+
+    Arguments:
+    folder -- Path to the team folder.
+    layout -- The new layout, from LAYOUTS.
+
+    Returns: the number of moved files.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError("Unknown team layout: " + str(layout) + ".")
+    with get_lock(folder) as lock, lock.hold():
+        return move_files(folder, layout)
+
+
+def move_files(folder, layout):
+    """Move the character files of a team folder to another layout, without
+    locking the team. See migrate."""
+    moved = 0
+    for _, e in scan(folder):
+        target = get_character_path(folder, e.name[:-len(CHARACTER_EXT)],
+                                    layout)
+        if e.path == target:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(e.path, target)
+        moved += 1
+    set_layout(folder, layout)
+    if layout == 'flat':
+        with os.scandir(folder) as it:
+            for e in it:
+                if SHARD.match(e.name) and e.is_dir():
+                    try:
+                        os.rmdir(e.path)
+                    except OSError:  # not empty
+                        pass
+    return moved
+
+
+def scan(folder):
+    """List the character files of a team folder, whatever its layout.
+
+    Both the team folder and its shard subfolders are scanned with os.scandir,
+    so that file types come from the directory listing. The returned entries
+    cache the result of their stat method.
+
+    Arguments:
+    folder -- Path to the team folder.
+
+    Returns: a list of (key, os.DirEntry) tuples ordered by file name, where
+    key is the path of the file relative to the team folder.
+    """
+    found = []
+    shards = []
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.name.endswith(CHARACTER_EXT) and not\
+                    e.name.startswith('.') and e.is_file():
+                found.append((e.name, e))
+            elif SHARD.match(e.name) and e.is_dir():
+                shards.append(e)
+    for s in shards:
+        with os.scandir(s.path) as it:
+            for e in it:
+                if e.name.endswith(CHARACTER_EXT) and e.is_file():
+                    found.append((s.name + '/' + e.name, e))
+    found.sort(key=lambda t: (t[1].name, t[0]))
+    return found
+
+
+def set_layout(folder, layout):
+    """Record the layout of a team folder.
+
+    Arguments:
+    folder -- Path to the team folder.
+    layout -- A layout, from LAYOUTS.
+    """
+    path = os.path.join(folder, LAYOUT_FILE)
+    if layout == 'flat':
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with storage.atomic_write(path, 'w', encoding='utf-8') as f:
+        f.write(layout + '\n')
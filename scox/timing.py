@@ -0,0 +1,157 @@
+#! /usr/bin/env python3
+# coding=utf-8
+
+import collections
+import contextlib
+import threading
+import time
+
+_enabled = False
+_timings = collections.OrderedDict()
+# guards _timings, updated by every thread running instrumented code
+_lock = threading.Lock()
+_hooks = []
+_null = contextlib.nullcontext()
+
+
+class Stage:
+    """Context manager measuring the time spent in a stage of a run.
+
+    Instance variables:
+    name -- Name of the measured stage.
+    start -- Value of the performance counter when entering the stage.
+    """
+
+    def __init__(self, name):
+        """Constructor.
+
+        Arguments:
+        name -- Name of the measured stage.
+        """
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start
+        record(self.name, elapsed)
+        return False
+
+
+def add_hook(hook):
+    """Register a function called with the name and duration of every
+    measured stage, while timing is enabled.
+
+    Arguments:
+    hook -- A callable accepting a stage name and a duration in seconds.
+    """
+    _hooks.append(hook)
+
+
+def disable():
+    """Stop measuring stages."""
+    global _enabled
+    _enabled = False
+
+
+def enable():
+    """Start measuring stages."""
+    global _enabled
+    _enabled = True
+
+
+def format_report():
+    """Return the timings measured so far as a table.
+
+    Stages are sorted by decreasing total time.
+    """
+    rows = sorted(get_timings().items(), key=lambda t: t[1][1], reverse=True)
+    total = sum(t[1] for _, t in rows)
+    lines = ['{:<28}{:>8}{:>12}{:>12}{:>8}'.format(
+        'Stage', 'Calls', 'Total (ms)', 'Mean (ms)', '%')]
+    for name, (calls, elapsed) in rows:
+        lines.append('{:<28}{:>8}{:>12.2f}{:>12.3f}{:>8.1f}'.format(
+            name, calls, elapsed * 1000, elapsed * 1000 / calls,
+            100 * elapsed / total if total > 0 else 0))
+    return '\n'.join(lines)
+
+
+def get_timings():
+    """Return the timings measured so far.
+
+    Returns: an ordered dictionary mapping stage names to their number of
+    calls and cumulated duration in seconds.
+    """
+    with _lock:
+        return collections.OrderedDict((k, tuple(v))
+                                       for k, v in _timings.items())
+
+
+def is_enabled():
+    """Return True if stages are being measured."""
+    return _enabled
+
+
+@contextlib.contextmanager
+def profiled(dump=None):
+    """Measure stages within a block, and optionally run cProfile.
+
+    Arguments:
+    dump -- Path of a file where cProfile statistics are written (default:
+        cProfile is not run).
+    """
+    profiler = None
+    if dump is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(dump)
+
+
+def record(name, elapsed):
+    """Add a duration to the timings of a stage. Safe to call from several
+    threads; hooks are called outside of the lock.
+
+    Arguments:
+    name -- Name of the stage.
+    elapsed -- Duration, in seconds.
+    """
+    with _lock:
+        t = _timings.get(name)
+        if t is None:
+            _timings[name] = [1, elapsed]
+        else:
+            t[0] += 1
+            t[1] += elapsed
+    for hook in _hooks:
+        hook(name, elapsed)
+
+
+def reset():
+    """Forget the timings measured so far."""
+    with _lock:
+        _timings.clear()
+
+
+def stage(name):
+    """Return a context manager measuring the enclosed block as a stage.
+
+    When timing is disabled, a shared no-op context manager is returned so
+    that instrumented code pays almost nothing.
+
+    Arguments:
+    name -- Name of the stage, such as 'profile.zip_io'.
+    """
+    if not _enabled:
+        return _null
+    return Stage(name)
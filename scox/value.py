@@ -1,29 +1,92 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
+import collections
+import itertools
+import operator
+import sys
 import warnings
 
+# shared metadata, by (name, coordinates, cost, invariant, acquired)
+METADATA = {}
+
+
+class Metadata(collections.namedtuple(
+        'Metadata', ['name', 'coordinates', 'cost', 'invariant',
+                     'acquired'])):
+    """Immutable description of a value, shared by all the values which have
+    the same one, whatever their character. Use get_metadata to get them.
+
+    Instance variables:
+    name -- Displayed name of the value, or None.
+    coordinates -- 2D coordinates of the value on an SVG character sheet, as
+        a tuple.
+    cost -- Cost for activating a power, or None.
+    invariant -- True if the rank of the value cannot be modified.
+    acquired -- True if a skill needs ranks to be usable.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        # unpickled metadata are shared as well
+        return get_metadata, tuple(self)
+
 
 class Value:
     """Base class for representing numerical values for characters and profiles
     in scox.
 
+    Values only hold the state of one character; what they have in common
+    with the values of other characters is held by a shared Metadata
+    instance. Values are pickled as the tuple of the slots listed in STATE;
+    slots missing from older pickles are set to None.
+
     Instance variables:
     base_rank -- Initial rank of the value, expressed as an integer.
     rank -- Rank of the value, expressed as an integer.
-    coordinates -- 2D coordinates of the value on an SVG character sheet.
+    meta -- Shared metadata of the value, as a Metadata instance.
     """
 
-    def __init__(self, base_rank, coordinates):
+    __slots__ = ('meta', 'base_rank', 'rank')
+    STATE = __slots__
+    state_getter = operator.attrgetter(*STATE)
+
+    def __init__(self, base_rank, coordinates, meta=None):
         """Constructor.
 
         Arguments:
         base_rank -- Base rank of the new value.
         coordinates -- 2D coordinates of the nw value.
+
+        Keyword arguments:
+        meta -- Metadata of the new value (default: metadata only holding
+            coordinates).
         """
+        if meta is None:
+            meta = get_metadata(None, coordinates)
+        self.meta = meta
         self.base_rank = base_rank
         self.rank = 0
-        self.coordinates = coordinates
+
+    def __getstate__(self):
+        return self.state_getter(self)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # pickled before metadata were shared
+            state = tuple(get_metadata(
+                state.get('name'), state.get('coordinates', (0, 0)),
+                state.get('cost'), state.get('invariant', False),
+                state.get('acquired', False)) if k == 'meta' else state.get(k)
+                for k in self.STATE)
+        for k, v in itertools.zip_longest(self.STATE, state):
+            setattr(self, k, v)
+
+    @property
+    def coordinates(self):
+        """2D coordinates of the value on an SVG character sheet."""
+        return self.meta.coordinates
 
     def get_cli_rank(self):
         """Return the real rank of the represented value as a string of
@@ -67,7 +130,7 @@ class Value:
 class Attribute(Value):
     """Value-derived class for representing character's attributes.
 
-    Instance variables:
+    Instance variables (from the shared metadata):
     name -- Name of the skill, and how it is displayed.
     invariant -- Boolean value; True if the attribute's rank cannot be
         modified.
@@ -77,7 +140,10 @@ class Attribute(Value):
     decrement_rank -- Decrease the rank of the attribute by 1.
     """
 
-    def __init__(self, name, base_rank, coordinates, invariant=False):
+    __slots__ = ()
+
+    def __init__(self, name, base_rank, coordinates, invariant=False,
+                 cost=None, acquired=False):
         """Constructor.
 
         Arguments:
@@ -87,10 +153,22 @@ class Attribute(Value):
 
         Keyword arguments:
         invariant -- True if the new attribute is an invariant (default False).
+        cost -- Cost for activating a power (default None).
+        acquired -- True if a skill requires a rank investment before it can
+            be used (default False).
         """
-        Value.__init__(self, base_rank, coordinates)
-        self.name = name
-        self.invariant = invariant
+        Value.__init__(self, base_rank, coordinates, get_metadata(
+            name, coordinates, cost, invariant, acquired))
+
+    @property
+    def invariant(self):
+        """True if the attribute's rank cannot be modified."""
+        return self.meta.invariant
+
+    @property
+    def name(self):
+        """Name of the skill, and how it is displayed."""
+        return self.meta.name
 
     def increase_rank(self, step):
         """Increase the rank of the attribute by step.
@@ -134,19 +212,15 @@ class Attribute(Value):
             rank = None
         return rank
 
-    def set_name(self, name):
-        """Set a new name for the skill.
-
-        Args:
-            name: a new name for the skill.
-        """
-        self.name = name
-
 
 class Skill(Attribute):
     """Attribute-derived class for representing character's skills.
 
     Instance variables:
+    custom_name -- Name given to the skill with set_name, such as the name of
+        a specialization, or None. It is kept on the instance rather than in
+        the shared metadata, which only hold names from the schema and the
+        profiles.
     governing_attribute -- Attribute governing the skill base rank.
     varieties -- List of skill varieties, if the skill is multiple.
     specialization -- Skill instance representing a specialization, if the
@@ -154,9 +228,14 @@ class Skill(Attribute):
     master_skill -- Generic version of the skill; quite the opposite of
         specialization.
     acquired -- Whether the attribute needs to be invested ranks before it
-        can be used (default False).
+        can be used (default False), from the shared metadata.
     """
 
+    __slots__ = ('governing_attribute', 'specialization', 'varieties',
+                 'master_skill', 'custom_name')
+    STATE = Value.STATE + __slots__
+    state_getter = operator.attrgetter(*STATE)
+
     def __init__(self, name, coordinates,
                  governing_attribute=None, specific=False,
                  multiple=False, invariant=False, master_skill=None,
@@ -180,10 +259,10 @@ class Skill(Attribute):
         acquired -- True if the new attribute requires a rank investment before
         it can be used (default False).
         """
-        Attribute.__init__(self, name, 0, coordinates, invariant=invariant)
+        Attribute.__init__(self, name, 0, coordinates, invariant=invariant,
+                           acquired=acquired)
         self.governing_attribute = governing_attribute
-        self.invariant = invariant
-        self.acquired = acquired
+        self.custom_name = None
         self.specialization = None
         self.varieties = None
         if multiple:
@@ -191,13 +270,18 @@ class Skill(Attribute):
         if specific:
             self.specialization = Skill(
                 'Spécialité',
-                [coordinates[0] + 63, coordinates[1]],
+                (coordinates[0] + 63, coordinates[1]),
                 governing_attribute=self.governing_attribute,
                 master_skill=self,
-                acquired=self.acquired
+                acquired=acquired
                 )
         self.master_skill = master_skill
 
+    @property
+    def acquired(self):
+        """True if the skill needs ranks to be usable."""
+        return self.meta.acquired
+
     def add_variety(self, variety, parent):
         """Append the input variety to the list of this skill's varieties, if
         the skill is multiple.
@@ -313,15 +397,32 @@ class Skill(Attribute):
         else:
             return False
 
+    @property
+    def name(self):
+        """Name of the skill, and how it is displayed."""
+        if self.custom_name is not None:
+            return self.custom_name
+        return self.meta.name
+
+    def set_name(self, name):
+        """Set a new name for the skill.
+
+        Args:
+            name: a new name for the skill.
+        """
+        self.custom_name = name
+
 
 class Power(Attribute):
     """Attribute-derived class for representing character's powers.
 
     Instance variables:
     cost -- String; short description of the cost for using the power (usually
-        expressed in PP, per time unit or not).
+        expressed in PP, per time unit or not), from the shared metadata.
     """
 
+    __slots__ = ()
+
     def __init__(self, name, cost, coordinates, base_rank=0,
                  invariant=False):
         """Constructor.
@@ -336,9 +437,42 @@ class Power(Attribute):
         base_rank -- Base rank of the new attribute (default 0).
         """
         Attribute.__init__(self, name, base_rank, coordinates,
-                           invariant=invariant)
-        self.cost = cost
+                           invariant=invariant, cost=cost)
+
+    @property
+    def cost(self):
+        """Short description of the cost for using the power."""
+        return self.meta.cost
 
     def get_cost(self):
         """Return the cost for activating the power."""
         return self.cost
+
+
+def get_metadata(name, coordinates, cost=None, invariant=False,
+                 acquired=False):
+    """Return the shared metadata of a value.
+
+    Metadata are created once per process for each distinct description,
+    with interned strings, then shared by every value they describe.
+
+    Arguments:
+    name -- Displayed name of the value, or None.
+    coordinates -- 2D coordinates of the value on an SVG character sheet.
+
+    Keyword arguments:
+    cost -- Cost for activating a power (default None).
+    invariant -- True if the rank of the value cannot be modified (default
+        False).
+    acquired -- True if a skill needs ranks to be usable (default False).
+
+    Returns: a Metadata instance.
+    """
+    key = (name, tuple(coordinates), cost, invariant, acquired)
+    meta = METADATA.get(key)
+    if meta is None:
+        meta = METADATA.setdefault(key, Metadata(
+            None if name is None else sys.intern(name), key[1],
+            None if cost is None else sys.intern(cost), bool(invariant),
+            bool(acquired)))
+    return meta
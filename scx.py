@@ -1,62 +1,130 @@
 #! /usr/bin/env python3
 # coding=utf-8
 
-import scox.character as chc
-import scox.export.cli as cli
-import scox.export.serialize as srl
-import scox.export.svg as svg
-import scox.export.txt as txt
-
+import contextlib
 import os
-import shutil
-import json
 import click
-from colorama import Fore, Style
 
 SCOX_HOME = os.path.join(os.path.expanduser('~'), '.scox-gen')
 CONFIG_FILE = os.path.join(SCOX_HOME, 'config.json')
-ARCHETYPE_PROFILE_PATH = \
-    os.path.join(os.path.dirname(__file__), 'scox', 'profiles', 'archetypes')
-ANGEL_PROFILE_PATH = \
-    os.path.join(os.path.dirname(__file__), 'scox', 'profiles', 'angels')
-DEMON_PROFILE_PATH = \
-    os.path.join(os.path.dirname(__file__), 'scox', 'profiles', 'demons')
-CHARACTER_SHEET_PATH = \
-    os.path.join(os.path.dirname(__file__), 'scox', 'sheets')
+CONFIG_LOCK = CONFIG_FILE + '.lock'
+# profile categories of scox.catalog.CATEGORIES, listed without importing it
+PROFILE_CATEGORIES = {'demon': 'demon superior', 'angel': 'angel superior',
+                      'arch': 'archetype'}
 
 
 class Config:
+    """Configuration of scox-gen: list of teams and selected team.
+
+    The configuration file is only read (or created) the first time the teams
+    or the selected team are accessed, so that commands which do not need it
+    do not pay for it. It is read under a shared lock; changes are made within
+    update, under an exclusive one, so that concurrent runs do not lose each
+    other's changes.
+    """
+
     def __init__(self):
-        if os.path.exists(CONFIG_FILE):
-            # load existing config file
+        """Constructor."""
+        self.state = None
+
+    @property
+    def selected(self):
+        """Name of the selected team."""
+        return self.load()[0]
+
+    @property
+    def teams(self):
+        """Map of team names to team folders."""
+        return self.load()[1]
+
+    def load(self):
+        """Load the configuration file, creating it if needed.
+
+        Returns: a list holding the name of the selected team and the map of
+        teams.
+        """
+        if self.state is None:
+            import scox.storage as storage
+            os.makedirs(SCOX_HOME, exist_ok=True)
+            with storage.locked(CONFIG_LOCK, shared=True):
+                self.state = self.read()
+            if self.state is None:
+                with self.update():
+                    pass
+        return self.state
+
+    def read(self):
+        """Read the configuration file.
+
+        Returns: the content of the file, or None if it does not exist.
+        """
+        import json
+        try:
             with open(CONFIG_FILE, mode='r') as c:
-                state = json.load(c)
-                self.selected = state[0]
-                self.teams = state[1]
-        else:
-            # create a new empty 'default' folder
-            fd = os.path.join(SCOX_HOME, 'default')
-            os.makedirs(fd)
-            self.selected = 'default'
-            self.teams = {'default': os.path.join(SCOX_HOME, 'default')}
-            # create a new config file
-            with open(CONFIG_FILE, mode='w') as c:
-                json.dump([self.selected, self.teams], c)
+                return json.load(c)
+        except FileNotFoundError:
+            return None
+
+    def save(self, selected=None):
+        """Write the configuration file. Should only be called within update.
+
+        Arguments:
+        selected -- Name of the team to select (default: keep the current
+            selection).
+        """
+        import json
+        import scox.storage as storage
+        if selected is not None:
+            self.state[0] = selected
+        with storage.atomic_write(CONFIG_FILE, 'w') as c:
+            json.dump(self.state, c)
+
+    @contextlib.contextmanager
+    def update(self):
+        """Lock the configuration file for a change.
+
+        The file is re-read (or created) once the exclusive lock is taken, and
+        the lock is held until the end of the with block, in which the teams
+        can be changed and saved.
+        """
+        import scox.storage as storage
+        os.makedirs(SCOX_HOME, exist_ok=True)
+        with storage.locked(CONFIG_LOCK):
+            self.state = self.read()
+            if self.state is None:
+                # create a new empty 'default' folder
+                fd = os.path.join(SCOX_HOME, 'default')
+                os.makedirs(fd, exist_ok=True)
+                self.state = ['default', {'default': fd}]
+                # create a new config file
+                self.save()
+            yield self
 
 
 @click.group()
+@click.option('--profile', 'profile', is_flag=True,
+              help='Print the time spent in each stage of the command '
+                   '(profile loading, drawing, pickling, exports...).')
+@click.option('--profile-dump', type=click.Path(dir_okay=False),
+              help='Also run cProfile and write its statistics to this file.')
 @click.pass_context
-def scx(ctx):
+def scx(ctx, profile, profile_dump):
     """A character generator for INS-MV 4."""
     ctx.obj = Config()
+    if profile or profile_dump is not None:
+        import scox.timing as timing
+        ctx.call_on_close(
+            lambda: click.echo(timing.format_report(), err=True))
+        ctx.with_resource(timing.profiled(profile_dump))
 
 
 @scx.command()
 def test():
     """Test every combination of profile / archetype."""
-    angel_ls = get_profile_list('angel')
-    demon_ls = get_profile_list('demon')
-    arch_ls = get_profile_list('arch')
+    import scox.catalog as catalog
+    angel_ls = catalog.get_profile_list('angel')
+    demon_ls = catalog.get_profile_list('demon')
+    arch_ls = catalog.get_profile_list('arch')
     for a in angel_ls:
         for p in arch_ls:
             try:
@@ -71,17 +139,73 @@ def test():
                 print('Exception caught for: ' + d + ', ' + p)
 
 
+@scx.group()
+def profiles():
+    """Commands for listing and compiling profiles."""
+    pass
+
+
+@profiles.command()
+@click.option('--check', is_flag=True,
+              help='Only validate the profile archives.')
+def compile(check):
+    """Validate every profile archive and compile them for fast loading.
+
+    All errors are reported at once; nothing is written if there is any."""
+    import scox.compiler as cmp
+    compiled, errors = cmp.compile_profiles()
+    for e in errors:
+        print(e)
+    if len(errors) > 0:
+        print(str(len(errors)) + " error(s) found.")
+        raise SystemExit(1)
+    print(str(len(compiled)) + " profile archive(s) validated.")
+    if not check:
+        cmp.write_compiled(compiled)
+
+
+def profile_lister(category):
+    """Return a command listing the profiles of a category."""
+    def ls():
+        import scox.catalog as catalog
+        profile_ls = catalog.get_profile_list(category)
+        it = iter(profile_ls)
+        for i in it:
+            try:
+                print('{:<30}{}'.format(i, next(it)))
+            except StopIteration:
+                print('{:<30}'.format(i))
+    ls.__doc__ = ("Display the list of all available " +
+                  PROFILE_CATEGORIES[category] + " profiles.")
+    return ls
+
+
+for c in PROFILE_CATEGORIES:
+    profiles.command(name=c)(profile_lister(c))
+
+
 @scx.command()
-@click.argument('category', type=click.Choice(['demon', 'angel', 'arch']))
-def profiles(category):
-    """Display the list of all available profiles for a given category."""
-    profile_ls = get_profile_list(category)
-    it = iter(profile_ls)
-    for i in it:
-        try:
-            print('{:<30}{}'.format(i, next(it)))
-        except StopIteration:
-            print('{:<30}'.format(i))
+@click.option('--host', default='127.0.0.1', help='Address to listen on.')
+@click.option('--port', default=8000, help='Port to listen on (0 for any '
+                                           'free port).')
+@click.option('--max-concurrency', default=4,
+              help='Maximum number of requests handled at once.')
+@click.option('--queue-timeout', default=5.0,
+              help='Seconds a request may wait for a free slot before being '
+                   'rejected.')
+def serve(host, port, max_concurrency, queue_timeout):
+    """Run an HTTP server generating and rendering characters."""
+    import scox.server as server
+    httpd = server.GenerationServer((host, port), max_concurrency,
+                                    queue_timeout)
+    print("Serving on http://" + host + ":" + str(httpd.server_address[1]) +
+          "/ (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
 
 
 @scx.group()
@@ -97,16 +221,22 @@ def team():
               type=click.Path(file_okay=False, writable=True),
               default=SCOX_HOME, help='Where the team folder should be '
                                       'located.')
+@click.option('--sharded', is_flag=True,
+              help='Spread the characters over subfolders, for teams of '
+                   'many thousands of characters.')
 @click.pass_obj
-def create(cfg, name, location):
+def create(cfg, name, location, sharded):
     """Create a new team and select it."""
+    import scox.team as tm
     # new team folder is created
     new_dir = os.path.join(location, name)
     os.makedirs(new_dir)
+    if sharded:
+        tm.set_layout(new_dir, 'sharded')
     # config file is updated, new team is selected
-    cfg.teams[name] = new_dir
-    with open(CONFIG_FILE, mode='w') as c:
-        json.dump([name, cfg.teams], c)
+    with cfg.update():
+        cfg.teams[name] = new_dir
+        cfg.save(name)
 
 
 @team.command()
@@ -115,7 +245,11 @@ def create(cfg, name, location):
 @click.pass_obj
 def delete(cfg, name):
     """Delete an existing team."""
-    if name in cfg.teams:
+    import shutil
+    with cfg.update():
+        if name not in cfg.teams:
+            print(name + ' does not exist in current list of teams.')
+            return
         location = cfg.teams.pop(name)
         try:
             shutil.rmtree(location)
@@ -131,38 +265,159 @@ def delete(cfg, name):
         else:
             active = cfg.selected
         print("Selected team: " + str(active))
-        with open(CONFIG_FILE, mode='w') as c:
-            json.dump([active, cfg.teams], c)
-    else:
-        print(name + ' does not exist in current list of teams.')
+        cfg.save(active)
 
 
 @team.command()
-@click.option('--format', type=click.Choice(['svg', 'txt']),
-              help='Format of the exported file(s).', default='svg')
+@click.option('--format', default='svg',
+              help='Comma-separated list of formats of the exported file(s): '
+                   'one SVG or JSON file per character, and a single TXT, '
+                   'JSONL, CSV or HTML file for the whole team. The HTML '
+                   'file is a print bundle: one sheet per page, with each '
+                   'empty sheet embedded once.')
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True),
+              help="Path to the single file in which the whole team is "
+                   "exported, when one of the TXT, JSONL, CSV and HTML formats "
+                   "is requested ('-' for the standard output). Default: "
+                   "'<team>.<format>' in the team folder.")
+@click.option('--archive', type=click.Path(dir_okay=False, allow_dash=True),
+              help="Path to a ZIP file in which all the exported files are "
+                   "written instead of the team folder ('-' for the standard "
+                   "output).")
+@click.option('--link-sheets', is_flag=True,
+              help='In an archive, link the SVG files to the empty character '
+                   'sheets, stored once, instead of embedding the sheet in '
+                   'each of them.')
 @click.pass_obj
-def export(cfg, format):
-    """Export all the character's profiles in the selected team as SVG or
-    TXT files."""
-    ignored = 0
-    for i in os.listdir(cfg.teams[cfg.selected]):
-        file_path = os.path.join(cfg.teams[cfg.selected], i)
-        try:
-            profile = srl.load_from_pickle(file_path)
-            if format == 'svg':
-                sheet = 'INS.png' if profile.get_nature() == 'Demon'\
-                    else 'MV.png'
-                sheet_path = os.path.join(CHARACTER_SHEET_PATH, sheet)
-                out_path = os.path.join(cfg.teams[cfg.selected],
-                                        profile.get_name() + '.svg')
-                svg.export_as_svg(profile, out_path, sheet_path)
-            else:
-                pass
-        except Exception:
-            ignored += 1
-    if ignored > 0:
-        print(str(ignored) + " file(s) could not be loaded in selected team "
-                             "folder.")
+def export(cfg, format, output, archive, link_sheets):
+    """Export all the character's profiles in the selected team, loading each
+    of them only once whatever the number of requested formats."""
+    import scox.export.render as rdr
+    import scox.export.serialize as srl
+    format = parse_formats(format, rdr.TEAM_FORMATS)
+    folder = cfg.teams[cfg.selected]
+    if archive is not None or link_sheets:
+        if archive is None:
+            raise click.BadParameter('only applies to archives.',
+                                     param_hint="'--link-sheets'")
+        if output is not None:
+            raise click.BadParameter('cannot be used with an archive.',
+                                     param_hint="'--output'")
+        failures = []
+        with click.open_file(archive, mode='wb', atomic=True) as f:
+            count, errors = rdr.export_archive(
+                lambda: srl.iter_from_folder(folder, failures), format, f,
+                cfg.selected, link_sheets=link_sheets)
+        # the team is read once per pass
+        report_export(sorted(set(failures)), errors)
+        return
+    streamed = [f for f in format if f in rdr.STREAMED_FORMATS]
+    if output is not None and len(streamed) != 1:
+        raise click.BadParameter('exactly one of the TXT, JSONL, CSV and '
+                                 'HTML formats must be requested.',
+                                 param_hint="'--output'")
+    failures = []
+    with contextlib.ExitStack() as stack:
+        streams = {}
+        for f in streamed:
+            path = output if output is not None else\
+                os.path.join(folder, cfg.selected + '.' + f)
+            streams[f] = stack.enter_context(
+                click.open_file(path, mode='w', encoding='utf-8',
+                                atomic=True))
+        count, errors = rdr.export_team(
+            srl.iter_from_folder(folder, failures), format, folder, streams)
+    report_export(failures, errors)
+
+
+@team.command()
+@click.option('--threshold', default=4,
+              help='Maximum distance between similar characters, as the sum '
+                   'of the differences of their attribute, skill and power '
+                   'ranks, counted in half ranks.')
+@click.option('--method', type=click.Choice(['auto', 'exact', 'bucketed']),
+              default='auto',
+              help='Search method: exact, or bucketed for a faster search '
+                   'which may miss a few similar pairs. By default, the exact '
+                   'search is used for teams of up to 5000 characters.')
+@click.pass_obj
+def dupes(cfg, threshold, method):
+    """List the clusters of overly similar characters in the selected team."""
+    import scox.query as query
+    import scox.similarity as sim
+    failures = []
+    index = query.load_index(cfg.teams[cfg.selected], failures)
+    clusters = sim.find_duplicates(index, threshold, method)
+    for i, c in enumerate(clusters):
+        print(str(i + 1) + ". " + ", ".join(
+            index.get_value('name', r) + " (" +
+            index.get_value('superior', r) + ")" for r in c))
+    print(str(len(clusters)) + " cluster(s) of similar characters found.")
+    if len(failures) > 0:
+        print(str(len(failures)) + " file(s) could not be loaded in selected "
+                                   "team folder.")
+
+
+@team.command(name='import')
+@click.argument('file', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', type=click.Choice(['jsonl', 'csv']),
+              help='Format of the imported file, as written by team export '
+                   'and character batch. Default: guessed from the file '
+                   'extension.')
+@click.pass_obj
+def import_(cfg, file, format):
+    """Import characters from a JSONL or CSV file ('-' for the standard input)
+    into the selected team. Invalid records are reported and skipped;
+    characters of the same name are replaced."""
+    import io
+    import sys
+    import time
+    import scox.importer as imp
+    if format is None:
+        format = os.path.splitext(file)[1][1:].lower()
+        if format not in imp.IMPORT_FORMATS:
+            raise click.BadParameter('format cannot be guessed from the file '
+                                     'name.', param_hint="'--format'")
+    rejects = []
+    start = time.perf_counter()
+    try:
+        # newline='' lets the csv module handle line breaks within fields
+        if file == '-':
+            f = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8',
+                                 newline='')
+        else:
+            f = open(file, encoding='utf-8', newline='')
+        with f:
+            count = imp.import_team(f, format, cfg.teams[cfg.selected],
+                                    rejects)
+    except (OSError, ValueError) as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - start
+    for n, msg in rejects[:20]:
+        print("line " + str(n) + ": " + msg)
+    if len(rejects) > 20:
+        print("... and " + str(len(rejects) - 20) + " more.")
+    print(str(count) + " character(s) imported in team '" + cfg.selected +
+          "' in {:.1f} s ({:.0f} rows/s), ".format(
+              elapsed, (count + len(rejects)) / max(elapsed, 1e-9)) +
+          str(len(rejects)) + " rejected.")
+
+
+@team.command()
+@click.argument('new_layout', type=click.Choice(['flat', 'sharded']),
+                required=False)
+@click.pass_obj
+def layout(cfg, new_layout):
+    """Display the layout of the selected team folder, or migrate it to a new
+    layout: 'flat' (one folder) or 'sharded' (subfolders)."""
+    import scox.team as tm
+    folder = cfg.teams[cfg.selected]
+    if new_layout is None:
+        print(tm.get_layout(folder))
+        return
+    moved = tm.migrate(folder, new_layout)
+    print(str(moved) + " character(s) moved. Layout of team '" +
+          cfg.selected + "': " + new_layout + ".")
 
 
 @team.command()
@@ -173,16 +428,46 @@ def ls(cfg):
         print(k + " (" + cfg.teams[k] + ")")
 
 
+@team.command()
+@click.option('--fill', nargs=3, type=click.STRING, multiple=True,
+              metavar='NATURE SUPERIOR ARCHETYPE',
+              help='Fill the reservoir of a combination before displaying '
+                   'the statistics. Can be repeated.')
+@click.option('--size', default=5,
+              help='Number of characters kept per combination.')
+@click.pass_obj
+def reservoir(cfg, fill, size):
+    """Display the statistics of the reservoir of pre-generated characters of
+    the selected team."""
+    import scox.reservoir as rsv
+    pool = rsv.Reservoir(cfg.teams[cfg.selected], size)
+    for n, s, a in fill:
+        try:
+            pool.fill(n, s, a)
+        except ValueError as e:
+            print(e)
+    stats = pool.get_stats()
+    if len(stats) == 0:
+        print("The reservoir of selected team is empty.")
+        return
+    print('{:<45}{:>10}{:>7}{:>7}{:>9}'.format(
+        'Combination', 'Available', 'Hits', 'Misses', 'Refills'))
+    for k in sorted(stats):
+        st = stats[k]
+        print('{:<45}{:>10}{:>7}{:>7}{:>9}'.format(
+            k, st['available'], st['hits'], st['misses'], st['refills']))
+
+
 @team.command()
 @click.argument('name', type=click.STRING)
 @click.pass_obj
 def select(cfg, name):
     """Select an existing team."""
-    if name in cfg.teams:
-        with open(CONFIG_FILE, mode='w') as c:
-            json.dump([name, cfg.teams], c)
-    else:
-        print(name + ' does not exist in current list of teams.')
+    with cfg.update():
+        if name in cfg.teams:
+            cfg.save(name)
+        else:
+            print(name + ' does not exist in current list of teams.')
 
 
 @scx.group()
@@ -202,13 +487,112 @@ def character():
                    'profile for attributes, powers and skills applies.')
 @click.option('--archetype', default="Corrupteur", prompt='Archetype',
               help='Archetype of the character.')
+@click.option('--out', type=click.Path(dir_okay=False, allow_dash=True),
+              help="Write the character to this file ('-' for the standard "
+                   "output) instead of saving it in the selected team.")
+@click.option('--format', type=click.Choice(['jsonl', 'txt', 'csv']),
+              default='jsonl', help='Format of the file given with --out.')
 @click.pass_obj
-def create(cfg, name, nature, superior, archetype):
+def create(cfg, name, nature, superior, archetype, out, format):
     """Create a new character."""
-    new = create_character(name, nature, superior, archetype)
-    filename = name + '.pickle'
-    filename = os.path.join(cfg.teams[cfg.selected], filename)
-    srl.export_as_pickle(new, filename)
+    import scox.export.serialize as srl
+    try:
+        new = create_character(name, nature, superior, archetype)
+    except ValueError as e:
+        if out is not None:
+            raise click.ClickException(str(e))
+        print(e)
+        return
+    if out is not None:
+        import scox.export.render as rdr
+        with click.open_file(out, mode='w', encoding='utf-8') as f:
+            rdr.stream_team([new], format, f)
+    else:
+        srl.save_to_team(new, cfg.teams[cfg.selected])
+
+
+@character.command()
+@click.option('--count', default=10, help='Number of generated characters.')
+@click.option('--prefix', default='PNJ',
+              help="Prefix of the characters' names, which are numbered from "
+                   "1.")
+@click.option('--nature', type=click.Choice(['angel', 'demon']),
+              help='Nature of the characters (default: random).')
+@click.option('--superior',
+              help='Superior of the characters (default: random). Requires '
+                   '--nature.')
+@click.option('--archetype',
+              help='Archetype of the characters (default: random).')
+@click.option('--seed', type=click.INT,
+              help='Seed of the random draws, for reproducible batches.')
+@click.option('--out', type=click.Path(dir_okay=False, allow_dash=True),
+              help="Stream the characters to this file ('-' for the standard "
+                   "output), each one as soon as it is generated, instead of "
+                   "saving them in the selected team.")
+@click.option('--format', type=click.Choice(['jsonl', 'txt', 'csv']),
+              default='jsonl', help='Format of the file given with --out.')
+@click.pass_obj
+def batch(cfg, count, prefix, nature, superior, archetype, seed, out,
+          format):
+    """Generate many characters at once."""
+    import scox.generator as gen
+    if superior is not None and nature is None:
+        raise click.UsageError("'--superior' requires '--nature'.")
+    g = gen.Generator(seed)
+    try:
+        if superior is not None:
+            g.get_profile_path(nature, superior)
+        if archetype is not None:
+            g.get_profile_path('arch', archetype)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    characters = g.generate_many(count, prefix, nature, superior, archetype)
+    if out is not None:
+        import scox.export.render as rdr
+        with click.open_file(out, mode='w', encoding='utf-8') as f:
+            rdr.stream_team(characters, format, f)
+        return
+    import scox.export.serialize as srl
+    import scox.storage as storage
+    folder = cfg.teams[cfg.selected]
+    n = 0
+    with storage.Batch() as b:
+        for c in characters:
+            srl.save_to_team(c, folder, b)
+            n += 1
+    print(str(n) + " character(s) created in team '" + cfg.selected + "'.")
+
+
+@character.command()
+@click.option('--name', type=click.STRING, prompt='Name',
+              help='Name of the character.')
+@click.option('--nature', type=click.Choice(['angel', 'demon']),
+              default='demon', help='Nature of the character.')
+@click.option('--superior', default="Scox",
+              help='Hierarchical superior of the character.')
+@click.option('--archetype', default="Corrupteur",
+              help='Archetype of the character.')
+@click.option('--size', default=5,
+              help='Number of characters kept in the reservoir for this '
+                   'combination.')
+@click.option('--refill/--no-refill', default=True,
+              help='Refill the reservoir in the background afterwards.')
+@click.pass_obj
+def take(cfg, name, nature, superior, archetype, size, refill):
+    """Take a pre-generated character from the reservoir of the selected team,
+    or generate it if none is available."""
+    import scox.export.serialize as srl
+    import scox.reservoir as rsv
+    folder = cfg.teams[cfg.selected]
+    pool = rsv.Reservoir(folder, size)
+    try:
+        new = pool.take(name, nature, superior, archetype)
+    except ValueError as e:
+        print(e)
+        return
+    srl.save_to_team(new, folder)
+    if refill:
+        pool.fill_in_background(nature, superior, archetype, detach=True)
 
 
 @character.command()
@@ -217,32 +601,30 @@ def create(cfg, name, nature, superior, archetype):
 @click.pass_obj
 def delete(cfg, name):
     """Delete an existing character."""
-    filename = os.path.join(cfg.teams[cfg.selected], name + '.pickle')
-    if os.path.exists(filename):
-        os.remove(filename)
-    else:
-        print(name + " does not exist in selected team.")
+    import scox.team as tm
+    folder = cfg.teams[cfg.selected]
+    with tm.get_lock(folder) as lock, lock.hold():
+        try:
+            os.remove(tm.get_character_path(folder, name))
+        except FileNotFoundError:
+            print(name + " does not exist in selected team.")
 
 
 @character.command()
 @click.argument('name', type=click.STRING)
-@click.option('--format', type=click.Choice(['svg', 'txt']),
-              help='Format of the exported file.', default='svg')
+@click.option('--format', default='svg',
+              help='Comma-separated list of formats of the exported files '
+                   '(svg, txt, json).')
 @click.pass_obj
 def export(cfg, name, format):
-    """Export the selected character's profile as an SVG or a TXT file."""
-    chc_path = os.path.join(cfg.teams[cfg.selected], name + '.pickle')
-    if os.path.exists(chc_path):
-        profile = srl.load_from_pickle(chc_path)
-        if format == 'svg':
-            sheet = 'INS.png' if profile.get_nature() == 'Demon' else 'MV.png'
-            sheet_path = os.path.join(CHARACTER_SHEET_PATH, sheet)
-            out_path = os.path.join(cfg.teams[cfg.selected], name + '.svg')
-            svg.export_as_svg(profile, out_path, sheet_path)
-        else:
-            out_path = os.path.join(cfg.teams[cfg.selected], name + '.txt')
-            with open(out_path, 'w') as handle:
-                txt.export_as_txt(profile, handle)
+    """Export the selected character's profile as SVG, TXT and / or JSON
+    files."""
+    import scox.export.render as rdr
+    import scox.export.serialize as srl
+    format = parse_formats(format, rdr.CHARACTER_FORMATS)
+    profile = srl.load_from_team(cfg.teams[cfg.selected], name)
+    if profile is not None:
+        rdr.export_character(profile, format, cfg.teams[cfg.selected])
     else:
         print(name + " does not exist in selected team.")
 
@@ -251,32 +633,86 @@ def export(cfg, name, format):
 @click.pass_obj
 def ls(cfg):
     """Display the list of existing characters."""
-    ignored = 0
-    for i in os.listdir(cfg.teams[cfg.selected]):
-        file_path = os.path.join(cfg.teams[cfg.selected], i)
-        try:
-            c = srl.load_from_pickle(file_path)
-            clr = (Fore.RED if c.get_nature() == 'Demon' else Fore.CYAN)
-            print(clr + Style.BRIGHT + c.get_name() +
-                  Style.NORMAL + " - " + c.get_superior() +
-                  Style.RESET_ALL)
-        except Exception:
-            ignored += 1
-    if ignored > 0:
-        print(str(ignored) + " file(s) could not be loaded in selected team "
-                             "folder.")
+    import scox.export.serialize as srl
+    from colorama import Fore, Style
+    failures = []
+    for c in srl.iter_from_folder(cfg.teams[cfg.selected], failures):
+        clr = (Fore.RED if c.get_nature() == 'Demon' else Fore.CYAN)
+        print(clr + Style.BRIGHT + c.get_name() +
+              Style.NORMAL + " - " + c.get_superior() +
+              Style.RESET_ALL)
+    if len(failures) > 0:
+        print(str(len(failures)) + " file(s) could not be loaded in selected "
+                                   "team folder.")
 
 
 @character.command()
-@click.argument('name', type=click.STRING)
+@click.option('--where', multiple=True,
+              help="Condition on the characters, such as 'Combat>=4', "
+                   "'Hypnotisme', '!Hypnotisme', 'PP>10' or 'superior in "
+                   "Baal,Scox'. Ranks are given as displayed. Can be "
+                   "repeated; all conditions must hold.")
+@click.option('--sort', help="Column by which results are sorted, prefixed "
+                             "with '-' for a descending order.")
+@click.option('--limit', type=click.INT,
+              help='Maximum number of displayed characters.')
+@click.pass_obj
+def find(cfg, where, sort, limit):
+    """Find the characters of the selected team matching conditions on their
+    attributes, skills, powers and side values."""
+    import scox.query as query
+    failures = []
+    index = query.load_index(cfg.teams[cfg.selected], failures)
+    try:
+        rows = index.select(where, sort, limit)
+        columns = []
+        for c in list(where) + ([sort] if sort else []):
+            m = query.CONDITION.match(c)
+            name = m.group(1) if m else c.strip().lstrip('!')
+            col = index.get_column(name.lstrip('-'))
+            if col not in columns and col not in ('name', 'superior'):
+                columns.append(col)
+    except ValueError as e:
+        print(e)
+        return
+    for r in rows:
+        line = '{:<30}{:<20}'.format(index.get_value('name', r),
+                                     index.get_value('superior', r))
+        for col in columns:
+            line += '  ' + index.labels.get(col, col) + ' ' +\
+                str(index.get_value(col, r) or '-').strip()
+        print(line.rstrip())
+    print(str(len(rows)) + " character(s) found.")
+    if len(failures) > 0:
+        print(str(len(failures)) + " file(s) could not be loaded in selected "
+                                   "team folder.")
+
+
+@character.command()
+@click.argument('name', type=click.STRING, required=False)
+@click.option('--all', 'show_all', is_flag=True,
+              help='Display the profiles of all the characters in the '
+                   'selected team.')
 @click.pass_obj
-def show(cfg, name):
+def show(cfg, name, show_all):
     """Display the profile of an existing character."""
-    file_path = os.path.join(cfg.teams[cfg.selected], name + '.pickle')
-    if os.path.exists(file_path):
-        cli.print_cli(srl.load_from_pickle(file_path))
+    import scox.export.cli as cli
+    import scox.export.serialize as srl
+    if show_all:
+        failures = []
+        for c in srl.iter_from_folder(cfg.teams[cfg.selected], failures):
+            cli.print_cli(c)
+        if len(failures) > 0:
+            print(str(len(failures)) + " file(s) could not be loaded in "
+                                       "selected team folder.")
+    elif name is not None:
+        profile = srl.load_from_team(cfg.teams[cfg.selected], name)
+        if profile is not None:
+            cli.print_cli(profile)
+        else:
+            print(name + " does not exist in selected team.")
     else:
-        print(name + " does not exist in selected team.")
+        raise click.UsageError("Missing argument 'NAME' (or option '--all').")
 
 
 @character.group()
@@ -285,14 +721,45 @@ def edit():
     pass
 
 
+@edit.command(name='batch')
+@click.argument('mapping', type=click.File(encoding='utf-8'))
+@click.option('--dry-run', is_flag=True,
+              help='Only count the characters which would be changed.')
+@click.pass_obj
+def batch_edit(cfg, mapping, dry_run):
+    """Edit the specializations and skill varieties of the characters of the
+    selected team, as described by a JSON MAPPING file, without prompting.
+
+    The file maps the names of archetypes, superiors and characters to the
+    specialization names and varieties of their skills, for instance:
+    {"superiors": {"Baal": {"Combat": "Poings", "Langues": ["Latin"]}},
+    "characters": {"PNJ 1": {"Métier": ["Plombier"]}}}. Characters are edited
+    in a single pass; only the changed ones are written."""
+    import scox.editor as editor
+    try:
+        rules = editor.load_mapping(mapping)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    count, changed, failures, unmatched = editor.edit_team(
+        cfg.teams[cfg.selected], rules, dry_run)
+    print(str(changed) + " character(s) " +
+          ("to change" if dry_run else "changed") + " out of " + str(count) +
+          " in team '" + cfg.selected + "'.")
+    for section, name in unmatched:
+        print("No character matches " + section + ", " + name + ".")
+    if len(failures) > 0:
+        print(str(len(failures)) + " file(s) could not be loaded in selected "
+                                   "team folder.")
+
+
 @edit.command()
 @click.argument('name', type=click.STRING)
 @click.pass_obj
 def skills(cfg, name):
     """Edit the character's specializations and skill varieties."""
-    file_path = os.path.join(cfg.teams[cfg.selected], name + '.pickle')
-    if os.path.exists(file_path):
-        profile = srl.load_from_pickle(file_path)
+    import scox.export.serialize as srl
+    profile = srl.load_from_team(cfg.teams[cfg.selected], name)
+    if profile is not None:
         for p in profile.get_primary_skills().values():
             if p.is_usable() and p.is_specific():
                 new = click.prompt(
@@ -308,202 +775,128 @@ def skills(cfg, name):
                     for v in range(len(s.get_varieties())):
                         s.get_varieties()[v] = click.prompt(
                             s.get_name(), s.get_varieties()[v])
-        srl.export_as_pickle(profile, file_path)
+        srl.save_to_team(profile, cfg.teams[cfg.selected])
     else:
         print(name + " does not exist in selected team.")
 
 
-def create_character(name, nature, superior, archetype):
-    """Create a new character based on the input description.
-
-    Args:
-        name: name of the new character.
-        nature: nature of the new character ('angel' or 'demon').
-        archetype: archetype of the new character.
-        superior: superior of the new character.
-
-    Returns: a scox.character.Character instance.
-    """
-    archetype = os.path.join(ARCHETYPE_PROFILE_PATH,
-                             archetype.lower() + '.scx')
-    if nature == 'demon':
-        superior = os.path.join(DEMON_PROFILE_PATH, superior.lower() + '.scx')
-    else:
-        superior = os.path.join(ANGEL_PROFILE_PATH, superior.lower() + '.scx')
-    new = chc.Character(name, nature, archetype, superior)
-    return new
+@scx.group()
+def diag():
+    """Commands for diagnosing resource usage."""
+    pass
 
 
-def print_cli(chc_profile):
-    """Print the character's complete profile to the command line.
+@diag.command()
+@click.option('--count', default=100, help='Number of generated characters.')
+@click.option('--nature', type=click.Choice(['angel', 'demon']),
+              default='demon', help='Nature of the generated characters.')
+@click.option('--superior', default="Scox",
+              help='Superior of the generated characters.')
+@click.option('--archetype', default="Corrupteur",
+              help='Archetype of the generated characters.')
+@click.option('--format', default='txt',
+              help='Comma-separated list of export formats measured for the '
+                   'generated team.')
+@click.option('--team', 'measure_team', is_flag=True,
+              help='Also report the memory held by the characters of the '
+                   'selected team.')
+@click.pass_obj
+def memory(cfg, count, nature, superior, archetype, format, measure_team):
+    """Report the memory used by characters and teams."""
+    import scox.catalog as catalog
+    import scox.diag as dg
+    import scox.export.render as rdr
+    import scox.export.serialize as srl
+    format = parse_formats(format, rdr.TEAM_FORMATS)
+    try:
+        sup_path = catalog.get_profile_path(nature, superior)
+        arch_path = catalog.get_profile_path('arch', archetype)
+    except ValueError as e:
+        print(e)
+        return
+    sample = dg.character_memory(
+        create_character('Sample', nature, superior, archetype))
+    print("Memory per character (" + superior + ", " + archetype + ")")
+    for k in ['attributes', 'skills', 'powers', 'values', 'other', 'total']:
+        print('  {:<25}{:>12}'.format(k, dg.format_size(sample[k])))
+    if measure_team:
+        totals = dict.fromkeys(sample, 0)
+        n = 0
+        for c in srl.iter_from_folder(cfg.teams[cfg.selected]):
+            for k, v in dg.character_memory(c).items():
+                totals[k] += v
+            n += 1
+        print("Mean memory per character in team '" + cfg.selected + "' (" +
+              str(n) + " character(s))")
+        for k in ['attributes', 'skills', 'powers', 'values', 'other',
+                  'total']:
+            print('  {:<25}{:>12}'.format(
+                k, dg.format_size(totals[k] / float(max(n, 1)))))
+    res = dg.measure_team(count, nature, sup_path, arch_path, format)
+    print("Team of " + str(count) + " (tracemalloc)")
+    print('  {:<25}{:>12}'.format('allocated per character',
+                                  dg.format_size(res['per_character'])))
+    print('  {:<25}{:>12}'.format('generation peak',
+                                  dg.format_size(res['generation_peak'])))
+    print('  {:<25}{:>12}'.format('export peak (' + ','.join(format) + ')',
+                                  dg.format_size(res['export_peak'])))
+
+
+def parse_formats(formats, allowed):
+    """Parse a comma-separated list of export formats.
 
     Args:
-        chc_profile: an instance of scox.character.Character."""
-    print("\n")
-    print("\u250C\u2500\u2500 " +
-          chc_profile.get_name() +
-          " \u2500 " +
-          "Grade " +
-          str(chc_profile.get_level()) +
-          " \u2500 " +
-          chc_profile.get_superior()
-          )
-    print("\u2502")
-    print("\u251c\u2500\u2500 " + "Attributs" +
-          " \u2500\u2500\u2500\u2500\u2500"
-          "\u2500\u2500\u2500\u2500\u2500\u2500 " +
-          "Valeurs annexes")
-    print_attributes(chc_profile)
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents principaux")
-    print_skills(chc_profile.get_primary_skills())
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents exotiques")
-    print_skills(chc_profile.get_exotic_skills())
-    print("\u2502")
-    print("\u251c\u2500\u2500 " +
-          "Talents secondaires")
-    print_skills(chc_profile.get_secondary_skills())
-    print("\u2502")
-    print("\u2514\u2500\u2500 " +
-          "Pouvoirs")
-    print_powers(chc_profile.get_powers())
-    print("\n")
-
-
-def print_attributes(chc_profile):
-    """Format and print the input character's attributes and side values.
+        formats: a string such as 'svg,txt'.
+        allowed: the list of accepted formats.
 
-    Args:
-        chc_profile: an instance of scox.character.Character.
+    Returns: the list of requested formats, without duplicates.
     """
-    attributes = chc_profile.get_attributes()
-    values = chc_profile.get_side_values()
-    for a, s in zip(attributes.keys(), values.keys()):
-        attr = format_attribute(
-            attributes[a].get_name(), attributes[a].get_cli_rank(), 14)
-        side = format_attribute(s, values[s].get_cli_rank(), 14)
-        if a != 'Foi':
-            print('\u2502   \u251c\u2500\u2500 ' + attr +
-                  '    \u251c\u2500\u2500 ' + side)
-        else:
-            print('\u2502   \u2514\u2500\u2500 ' + attr +
-                  '    \u2514\u2500\u2500 ' + side)
+    parsed = []
+    for f in formats.split(','):
+        f = f.strip().lower()
+        if f not in allowed:
+            raise click.BadParameter(
+                "invalid format '" + f + "' (choose from " +
+                ", ".join(allowed) + ").", param_hint="'--format'")
+        if f not in parsed:
+            parsed.append(f)
+    return parsed
 
 
-def print_powers(power_set):
-    """Format and print a power set.
+def report_export(failures, errors):
+    """Report the characters which could not be loaded or exported.
 
     Args:
-        power_set: a dictionary of scox.value.Power instances.
+        failures: the list of team files which could not be loaded.
+        errors: the list of names of the characters which could not be
+        exported.
     """
-    powers = [p for p in power_set.keys()]
-    for p in power_set:
-        br = "\u251C"
-        if p == powers[-1]:
-            br = "\u2514"
-        print("    " + br + "\u2500\u2500 " +
-              format_attribute(p, power_set[p].get_cli_rank(), 37))
+    if len(failures) > 0:
+        print(str(len(failures)) + " file(s) could not be loaded in selected "
+                                   "team folder.")
+    if len(errors) > 0:
+        print(str(len(errors)) + " character(s) could not be exported: " +
+              ", ".join(errors))
 
 
-def print_skills(skill_set):
-    """Format and print a skill set.
-
-    Args:
-        skill_set: a dictionary of scox.value.Skill instances.
-    """
-    last = get_last_usable_skill(skill_set)
-    for s in skill_set:
-        sk = skill_set[s]
-        if sk.is_usable():
-            br = "\u251c"  # branch character
-            if s == last:
-                br = "\u2514"
-            print("\u2502   " + br + "\u2500\u2500 " +
-                  format_attribute(sk.get_name(), sk.get_cli_rank(), 37))
-            if sk.is_specific():
-                if s == last:
-                    spacing = " "
-                else:
-                    spacing = "\u2502"
-                print("\u2502   " + spacing + "   \u2514\u2500\u2500 " +
-                      format_attribute(
-                          sk.get_specialization().get_name(),
-                          sk.get_specialization().get_cli_rank(), 33)
-                      )
-            elif sk.is_multiple():
-                if s == last:
-                    spacing_m = " "
-                else:
-                    spacing_m = "\u2502"
-                for v in sk.varieties:
-                    br_m = "\u251c"  # branch character
-                    if v == sk.varieties[-1]:
-                        br_m = "\u2514"
-                    print("\u2502   " + spacing_m + "   " + br_m +
-                          "\u2500\u2500 " + v)
-
-
-def format_attribute(name, val, lng):
-    """Format a string for displaying the name and value of an attribute.
+def create_character(name, nature, superior, archetype):
+    """Create a new character based on the input description.
 
     Args:
-        name: name of the attribute to display.
-        val: value of the attribute to display.
-        lng: length of the string to be returned, in number of
-        characters. Blank space will be padded with '-' characters.
-
-    Returns: a string.
-    """
-    name += ' '
-    if val is not None:
-        val = ' ' + val
-        lng -= len(val)
-        return '{:-<{pad}.{trunc}}{}'.format(
-            name, val, pad=lng, trunc=lng)
-    else:
-        return '{:<{pad}.{trunc}}'.format(name, pad=lng, trunc=lng)
-
-
-def get_last_usable_skill(skill_dict):
-    """Return the last usable skill contained by the input dictionary.
+        name: name of the new character.
+        nature: nature of the new character ('angel' or 'demon').
+        archetype: archetype of the new character.
+        superior: superior of the new character.
 
-    Args:
-        skill_dict: an ordered dictionary with scox.value.Skill objects as
-        values.
+    Returns: a scox.character.Character instance.
 
-    Returns: the last usable skill in skill_dict.
+    Raises:
+        ValueError: if the nature, superior or archetype is unknown. Profiles
+        are checked against the catalog before any archive is opened.
     """
-    usable = []
-    for s in skill_dict.keys():
-        if skill_dict[s].is_usable():
-            usable.append(s)
-    if len(usable) > 0:
-        return usable[-1]
-    else:
-        return None
-
-
-def get_profile_list(profile_type):
-    """Return the requested list of available profiles.
+    import scox.generator as gen
+    return gen.Generator().generate(name, nature, superior, archetype)
 
-    Args:
-        profile_type: a string value in 'angel', 'demon' or 'arch'.
 
-    Returns: the alphabetically ordered list of profiles corresponding to the
-    input profile_type.
-    """
-    if profile_type == 'demon':
-        folder = DEMON_PROFILE_PATH
-    elif profile_type == 'angel':
-        folder = ANGEL_PROFILE_PATH
-    else:
-        folder = ARCHETYPE_PROFILE_PATH
-    profile_list = []
-    for f in os.listdir(folder):
-        if f.endswith('.scx'):
-            profile_list.append(f.split('.')[0].title())
-    profile_list.sort()
-    return profile_list
+if __name__ == '__main__':
+    scx()
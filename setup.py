@@ -13,9 +13,12 @@ setup(
     license='BSD 3-Clause',
     py_modules=['scx'],
     packages=['scox', 'scox.export'],
-    package_data={'scox': ['profiles/demons/*.scx',
+    package_data={'scox': ['profiles/catalog.json',
+                           'profiles/compiled/*/*.pickle',
+                           'profiles/demons/*.scx',
                            'profiles/angels/*.scx',
                            'profiles/archetypes/*.scx',
+                           'schema.json',
                            'sheets/*.png']},
     install_requires=['Click',
                       'colorama',